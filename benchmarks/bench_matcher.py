@@ -0,0 +1,97 @@
+"""Micro-benchmark: fuzzy batch scoring (scoring.py) vs. the original exact substring loop.
+
+Both match each search batch of SEARCH_BATCH_SIZE tracks against its own
+SEARCH_MAX_RESULTS results, as the search path does.
+Run from the repository root:  python benchmarks/bench_matcher.py --tracks 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SEARCH_BATCH_SIZE, SEARCH_MAX_RESULTS  # noqa: E402
+from scoring import score_matrix, select_matches  # noqa: E402
+from track import Track  # noqa: E402
+
+WORDS = [
+    "love", "night", "heart", "fire", "rain", "dream", "gold", "river", "summer", "shadow",
+    "light", "wild", "blue", "city", "ghost", "dance", "echo", "stone", "silver", "storm",
+    "ocean", "midnight", "paper", "crystal", "velvet", "neon", "honey", "thunder", "glass", "tiger",
+]
+
+
+def make_tracks(count, rng):
+    """Generates synthetic Track records."""
+    tracks = []
+    for i in range(count):
+        name = " ".join(rng.sample(WORDS, rng.randint(1, 3))).title() + f" {i}"
+        artist = f"{rng.choice(WORDS).title()} Band {i % 997}"
+        tracks.append(Track(f"id{i}", name, artist, f"Album {i % 311}", None, None))
+    return tracks
+
+
+def make_videos(tracks, count, rng):
+    """Generates search-result style videos, most of them matching some track."""
+    videos = []
+    for i in range(count):
+        if rng.random() < 0.8:
+            track = rng.choice(tracks)
+            title = f"{track.artist} - {track.name} (Official Video)"
+            channel = f"{track.artist} - Topic"
+        else:
+            title = f"{rng.choice(WORDS)} compilation {i}"
+            channel = "Various"
+        videos.append({"id": {"videoId": f"vid{i}"}, "snippet": {"title": title, "channelTitle": channel}})
+    return videos
+
+
+def legacy_match(tracks, videos):
+    """The original O(videos x tracks) substring matcher."""
+    results = {}
+    for video in videos:
+        video_title = video["snippet"]["title"].lower()
+        video_id = video["id"]["videoId"]
+        for track in tracks:
+            if track.name.lower() in video_title and track.artist.lower() in video_title:
+                results.setdefault(track.key, video_id)
+    return results
+
+
+def scored_match(tracks, videos):
+    """Matches with one score matrix for the whole batch, as the search path does."""
+    results = {}
+    scores = score_matrix(tracks, videos)
+    for track_index, video_index, _ in select_matches(tracks, videos, scores):
+        results[tracks[track_index].key] = videos[video_index]["id"]["videoId"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tracks = make_tracks(args.tracks, rng)
+    batches = [tracks[start:start + SEARCH_BATCH_SIZE] for start in range(0, len(tracks), SEARCH_BATCH_SIZE)]
+    batches = [(batch, make_videos(batch, SEARCH_MAX_RESULTS, rng)) for batch in batches]
+
+    timings = {}
+    for label, fn in (("legacy loop", legacy_match), ("score matrix", scored_match)):
+        start = time.perf_counter()
+        matched = {}
+        for batch, videos in batches:
+            matched.update(fn(batch, videos))
+        timings[label] = time.perf_counter() - start
+        print(f"{label:>12}: {timings[label] * 1000:9.1f} ms  ({len(matched)} tracks matched)")
+
+    print(f"{'speedup':>12}: {timings['legacy loop'] / timings['score matrix']:9.1f}x "
+          f"({len(batches)} batches of {SEARCH_BATCH_SIZE} tracks x {SEARCH_MAX_RESULTS} videos)")
+
+
+if __name__ == "__main__":
+    main()
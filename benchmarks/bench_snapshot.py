@@ -0,0 +1,82 @@
+"""Library snapshot benchmark: full fetch vs. incremental refresh vs. offline reads.
+
+Builds a synthetic library in benchmarks/fake_services.py and measures
+fetching every playlist from the Spotify stand-in, writing the snapshot,
+refreshing it when nothing and when one playlist changed, and reading every
+track back through the memory-mapped file.
+
+Run from the repository root:  python benchmarks/bench_snapshot.py --size 100000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_services import FakeServices, make_library  # noqa: E402
+
+
+def _timed(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args)
+        return result, time.perf_counter() - start
+
+
+def _read_all(library):
+    return sum(1 for playlist in library.playlists() for _ in library.playlist_tracks(playlist['id']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", type=int, default=100000, help="Library size in playlist entries")
+    parser.add_argument("--playlist-size", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every fake API call")
+    args = parser.parse_args()
+
+    from rate_limiter import spotify_limiter
+    from library_snapshot import LibrarySnapshot, refresh_snapshot
+
+    spotify_limiter.rate = spotify_limiter.max_rate = spotify_limiter.burst = spotify_limiter._tokens = 10000.0
+    tracks, playlists = make_library(args.size, playlist_size=args.playlist_size)
+    services = FakeServices(tracks, playlists, latency=args.latency).start()
+    sp = services.spotify_client()
+    path = os.path.join(tempfile.mkdtemp(), "library.snap")
+    results = []
+
+    def measure(label, func, *func_args):
+        before = services.stats()["calls"].get("spotify.playlist_items", 0)
+        result, seconds = _timed(func, *func_args)
+        pages = services.stats()["calls"].get("spotify.playlist_items", 0) - before
+        results.append((label, seconds, pages))
+        return result
+
+    try:
+        library = measure("first snapshot (fetch all)", refresh_snapshot, sp, path)
+        library.close()
+        library = measure("refresh, nothing changed", refresh_snapshot, sp, path)
+        library.close()
+        first = next(iter(playlists.values()))
+        first["track_ids"] = first["track_ids"][1:]
+        first["version"] = 1
+        library = measure("refresh, one playlist changed", refresh_snapshot, sp, path)
+        library.close()
+        library = measure("open snapshot", LibrarySnapshot, path)
+        count = measure("read every track (mmap)", _read_all, library)
+        library.close()
+    finally:
+        services.stop()
+
+    print(f"{args.size} playlist entries, {len(tracks)} unique tracks, {len(playlists)} playlists; "
+          f"snapshot is {os.path.getsize(path) / 1024 / 1024:.1f} MB, read back {count} entries.")
+    print(f"{'step':<32}{'seconds':>10}{'Spotify pages':>15}")
+    for label, seconds, pages in results:
+        print(f"{label:<32}{seconds:>10.3f}{pages:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Import-time budget check for the CLI subcommands.
+
+Each subcommand imports its client libraries lazily. This script imports
+what each subcommand loads in a fresh interpreter under ``python -X
+importtime``, reports the cumulative import cost (less the bare interpreter
+baseline), and exits non-zero if a budget is exceeded or a subcommand loads
+a library it should not need.
+
+Run from the repository root:  python benchmarks/bench_startup.py
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules each subcommand imports, in the order main.py imports them. The
+# pandas track catalog is only loaded once there are catalog files or cached
+# matches to index, so it is not part of any command's startup.
+COMMANDS = {
+    "--help": ["main"],
+    "list": ["main", "spotify_api"],
+    "plan": ["main", "spotify_api", "library_snapshot", "match_cache", "journal", "metrics", "planner", "quota"],
+    "transfer": ["main", "spotify_api", "library_snapshot", "match_cache", "journal", "metrics", "planner", "quota",
+                 "youtube_api", "pipeline", "rate_limiter"],
+}
+
+# Libraries a subcommand must not load at all.
+FORBIDDEN = {
+    "--help": ["spotipy", "googleapiclient", "google_auth_oauthlib", "sqlalchemy", "numpy", "pandas"],
+    "list": ["googleapiclient", "google_auth_oauthlib", "sqlalchemy", "numpy", "pandas"],
+    "plan": ["googleapiclient", "google_auth_oauthlib", "numpy", "pandas"],
+    # The browser OAuth flow is only imported when no saved credentials exist.
+    "transfer": ["google_auth_oauthlib", "pandas"],
+}
+
+# Import-time budgets in milliseconds, above the bare interpreter.
+BUDGETS_MS = {
+    "--help": 50,
+    "list": 400,
+    "plan": 700,
+    "transfer": 1000,
+}
+
+_IMPORT_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S.*)$")
+
+
+def import_times(stderr):
+    """Returns (cumulative top-level import microseconds, imported module names) from -X importtime output."""
+    total = 0
+    modules = set()
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            modules.add(match.group(3))
+            if not match.group(2):  # Top-level imports only; nested ones are in their parent's cumulative time.
+                total += int(match.group(1))
+    return total, modules
+
+
+def measure(modules):
+    """Returns (cumulative top-level import microseconds, loaded module names) for a fresh interpreter."""
+    code = "import sys\n"
+    if modules:
+        code += f"import {', '.join(modules)}\n"
+    code += "print('\\n'.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return import_times(result.stderr)[0], set(result.stdout.split())
+
+
+def best_of(modules, runs):
+    results = [measure(modules) for _ in range(runs)]
+    return min(total for total, _ in results), results[0][1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=3, help="Measurements per command; the fastest counts")
+    args = parser.parse_args()
+
+    baseline, _ = best_of([], args.runs)
+    failures = []
+    print(f"{'command':<10}{'import ms':>10}{'budget ms':>11}  heavy libraries loaded")
+    for command, modules in COMMANDS.items():
+        total, loaded = best_of(modules, args.runs)
+        cost_ms = max(0, total - baseline) / 1000
+        heavy = [lib for lib in ("spotipy", "googleapiclient", "google_auth_oauthlib", "sqlalchemy", "numpy",
+                                "pandas") if lib in loaded]
+        print(f"{command:<10}{cost_ms:>10.0f}{BUDGETS_MS[command]:>11}  {', '.join(heavy) or '-'}")
+        if cost_ms > BUDGETS_MS[command]:
+            failures.append(f"'{command}' imports take {cost_ms:.0f} ms (budget {BUDGETS_MS[command]} ms)")
+        for lib in FORBIDDEN[command]:
+            if lib in loaded:
+                failures.append(f"'{command}' loads {lib}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""End-to-end throughput benchmark against local Spotify/YouTube stand-ins.
+
+Runs the transfer pipeline (what main.main() does after authenticating),
+search_multiple_tracks_on_youtube and bulk_add_tracks_to_youtube_playlist
+against benchmarks/fake_services.py, with no accounts and no quota. Each
+(size, scenario) runs in a fresh process so peak RSS is its own.
+
+Run from the repository root:
+    python benchmarks/bench_transfer.py --sizes 1000 10000
+    python benchmarks/bench_transfer.py --sizes 100000 --scenarios transfer --latency 0.02 --throttle-rate 0.01
+
+The rate limiters are opened up (``--rate``) so the numbers measure the
+code rather than the configured request rates; pass ``--rate 0`` to keep
+the limits from config.py.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_services import FakeServices, make_library  # noqa: E402
+
+SCENARIOS = ("transfer", "search", "insert")
+DEFAULT_SIZES = (1000, 10000)
+
+
+def _open_limiters(rate):
+    """Raises both rate limiters so request pacing doesn't dominate the timing."""
+    from rate_limiter import youtube_limiter, spotify_limiter
+    for limiter in (youtube_limiter, spotify_limiter):
+        limiter.rate = limiter.max_rate = float(rate)
+        limiter.burst = limiter._tokens = float(rate)
+
+
+def _transfer(services, workdir):
+    from match_cache import MatchCache
+    from journal import TransferJournal
+    from pipeline import run_pipeline
+    from spotify_api import get_spotify_playlists
+
+    sp = services.spotify_client()
+    youtube = services.youtube_client()
+    cache = MatchCache(os.path.join(workdir, "cache.db"))
+    journal = TransferJournal(os.path.join(workdir, "journal.db"))
+    try:
+        playlists = get_spotify_playlists(sp)
+        asyncio.run(run_pipeline(sp, youtube, playlists, cache=cache, journal=journal))
+    finally:
+        cache.close()
+        journal.close()
+    return sum(len(playlist) for playlist in services.youtube_playlists.values())
+
+
+def _search(services, workdir):
+    from track import Track
+    from youtube_api import search_multiple_tracks_on_youtube
+
+    youtube = services.youtube_client()
+    tracks = (Track.from_spotify(track) for track in services.tracks.values())
+    return len(search_multiple_tracks_on_youtube(youtube, tracks))
+
+
+def _insert(services, workdir):
+    from youtube_api import create_youtube_playlist, bulk_add_tracks_to_youtube_playlist
+
+    youtube = services.youtube_client()
+    playlist_id = create_youtube_playlist(youtube, "Benchmark")
+    video_ids = [f"v-{track_id}" for track_id in services.tracks]
+    return bulk_add_tracks_to_youtube_playlist(youtube, playlist_id, video_ids)
+
+
+def run_scenario(scenario, size, options):
+    """Runs one scenario in the current process and returns its measurements."""
+    if options["rate"]:
+        _open_limiters(options["rate"])
+    tracks, playlists = make_library(size, playlist_size=options["playlist_size"],
+                                     overlap=options["overlap"], seed=options["seed"])
+    # The search and insert scenarios work on unique tracks only.
+    track_count = size if scenario == "transfer" else len(tracks)
+    services = FakeServices(tracks, playlists, latency=options["latency"],
+                            error_rate=options["error_rate"], throttle_rate=options["throttle_rate"],
+                            retry_after=options["retry_after"], miss_rate=options["miss_rate"],
+                            crowding=options["crowding"],
+                            seed=options["seed"]).start()
+    runner = {"transfer": _transfer, "search": _search, "insert": _insert}[scenario]
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            log = io.StringIO() if options["quiet"] else sys.stdout
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(log):
+                outcome = runner(services, workdir)
+            elapsed = time.perf_counter() - start
+    finally:
+        services.stop()
+
+    stats = services.stats()
+    return {
+        "scenario": scenario,
+        "size": size,
+        "tracks": track_count,
+        "outcome": outcome,
+        "seconds": round(elapsed, 3),
+        "tracks_per_sec": round(track_count / elapsed, 1) if elapsed else None,
+        "api_calls_per_track": round(stats["api_calls"] / track_count, 3),
+        "http_requests_per_track": round(stats["http_requests"] / track_count, 3),
+        "quota_units_per_track": round(stats["quota_units"] / track_count, 2),
+        # ru_maxrss is kilobytes on Linux and bytes on macOS.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+        "calls": stats["calls"],
+    }
+
+
+def _child(scenario, size, options, results):
+    results.put(run_scenario(scenario, size, options))
+
+
+def run_isolated(scenario, size, options):
+    """Runs one scenario in a fresh process so its peak RSS is measured on its own."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_child, args=(scenario, size, options, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def print_report(results):
+    header = f"{'scenario':<10}{'tracks':>9}{'secs':>9}{'tracks/s':>10}{'calls/trk':>11}{'http/trk':>10}{'quota/trk':>11}{'RSS MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['scenario']:<10}{r['tracks']:>9}{r['seconds']:>9.2f}{r['tracks_per_sec']:>10.1f}"
+              f"{r['api_calls_per_track']:>11.3f}{r['http_requests_per_track']:>10.3f}"
+              f"{r['quota_units_per_track']:>11.2f}{r['peak_rss_mb']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Library sizes in playlist entries (e.g. 1000 10000 100000)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--playlist-size", type=int, default=200)
+    parser.add_argument("--overlap", type=float, default=0.3, help="Share of entries repeating another track")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests failing with 429")
+    parser.add_argument("--retry-after", type=int, default=0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--miss-rate", type=float, default=0.1, help="Share of tracks search never finds")
+    parser.add_argument("--crowding", type=float, default=0.0,
+                        help="Extra miss rate of a track in a fully packed search query")
+    parser.add_argument("--rate", type=float, default=10000.0, help="Requests/sec for both limiters (0 keeps config)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verbose", action="store_true", help="Show the transfer's own output")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    options = {
+        "playlist_size": args.playlist_size, "overlap": args.overlap, "latency": args.latency,
+        "error_rate": args.error_rate, "throttle_rate": args.throttle_rate,
+        "retry_after": args.retry_after, "miss_rate": args.miss_rate, "crowding": args.crowding,
+        "rate": args.rate,
+        "seed": args.seed, "quiet": not args.verbose,
+    }
+    results = []
+    for size in args.sizes:
+        print(f"\n== {size} playlist entries ==")
+        size_results = [run_isolated(scenario, size, options) for scenario in args.scenarios]
+        print_report(size_results)
+        results.extend(size_results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"options": options, "results": results}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
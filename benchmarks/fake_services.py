@@ -0,0 +1,402 @@
+"""Local stand-ins for the Spotify Web API and YouTube Data API used by the benchmarks.
+
+One threaded HTTP server answers both APIs from a synthetic library:
+
+  Spotify  GET  /v1/me, /v1/me/playlists, /v1/playlists/{id}/tracks
+  YouTube  GET  /youtube/v3/search, /youtube/v3/videos, /youtube/v3/playlistItems
+           POST /youtube/v3/playlists, /youtube/v3/playlistItems, /batch
+
+Every request can be delayed (``latency``), fail with a 503 (``error_rate``)
+or be throttled with a 429 and Retry-After (``throttle_rate``); batch
+sub-requests fail individually. Tests can also script exact failures
+through ``failures``. The server counts API calls and YouTube quota units
+so the harness can report cost per track.
+"""
+import email
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# YouTube Data API quota cost per call.
+QUOTA_COSTS = {
+    "search.list": 100,
+    "videos.list": 1,
+    "playlists.insert": 50,
+    "playlistItems.insert": 50,
+    "playlistItems.list": 1,
+}
+
+WORDS = [
+    "love", "night", "heart", "fire", "rain", "dream", "gold", "river", "summer", "shadow",
+    "light", "wild", "blue", "city", "ghost", "dance", "echo", "stone", "silver", "storm",
+    "ocean", "midnight", "paper", "crystal", "velvet", "neon", "honey", "thunder", "glass", "tiger",
+]
+
+_QUOTED_PAIR = re.compile(r'"([^"]*)" "([^"]*)"')
+
+# HTTP status YouTube answers each scripted failure reason with.
+FAILURE_STATUS = {
+    "backendError": 503,
+    "rateLimitExceeded": 403,
+    "quotaExceeded": 403,
+    "videoNotFound": 404,
+    "playlistNotFound": 404,
+}
+
+
+def make_library(track_count, playlist_size=200, overlap=0.5, seed=7):
+    """Generates a synthetic library of ``track_count`` playlist entries.
+
+    ``overlap`` is the share of entries that repeat a track already used in
+    another playlist, so the number of unique tracks is about
+    ``track_count * (1 - overlap)``. Returns ``(tracks, playlists)`` where
+    tracks maps track id to a Spotify-style track object and playlists maps
+    playlist id to ``{"name", "track_ids"}``. Set a playlist's ``version``
+    after editing it to change its snapshot_id.
+    """
+    rng = random.Random(seed)
+    unique_count = max(1, int(track_count * (1 - overlap)))
+    tracks = {}
+    for i in range(unique_count):
+        track_id = f"trk{i:07d}"
+        tracks[track_id] = {
+            "id": track_id,
+            "name": " ".join(rng.sample(WORDS, rng.randint(1, 3))).title() + f" {i}",
+            "artists": [{"name": f"{rng.choice(WORDS).title()} Collective {i % 1499}"}],
+            "album": {"name": f"Album {i % 509}"},
+            "external_ids": {"isrc": f"BENCH{i:07d}"},
+            "duration_ms": rng.randint(120, 360) * 1000,
+        }
+
+    track_ids = list(tracks)
+    # Every unique track appears once; the remaining entries repeat random tracks.
+    entries = track_ids + [rng.choice(track_ids) for _ in range(track_count - unique_count)]
+    rng.shuffle(entries)
+    playlists = {}
+    for number, start in enumerate(range(0, len(entries), playlist_size)):
+        playlists[f"pl{number:05d}"] = {
+            "name": f"Bench Playlist {number}",
+            "track_ids": entries[start:start + playlist_size],
+        }
+    return tracks, playlists
+
+
+class FakeServices:
+    """Threaded local HTTP server standing in for both APIs."""
+
+    def __init__(self, tracks, playlists, latency=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=0, miss_rate=0.1, crowding=0.0, seed=11):
+        self.tracks = tracks
+        self.playlists = playlists
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.miss_rate = miss_rate
+        # Extra miss chance per track of a fully (50-track) packed query; packed
+        # terms crowd each other out of real search results.
+        self.crowding = crowding
+        self.by_name_artist = {
+            (track["name"], track["artists"][0]["name"]): track for track in tracks.values()
+        }
+        self.saved_ids = list(tracks)[::-1]  # Liked Songs, newest first; top tracks are the first 50
+        self.youtube_playlists = {}
+        # Scripted failures: "playlistItems.list" or "playlistItems.insert:<videoId>" -> reasons
+        # returned, one per call, by the next calls before they succeed again.
+        self.failures = {}
+        self.insert_requests = Counter()  # videoId -> playlistItems.insert requests received for it
+        self.calls = Counter()
+        self.http_requests = 0
+        self.quota_units = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def spotify_client(self):
+        """Returns a spotipy client that talks to this server."""
+        import spotipy
+        from spotify_api import _build_requests_session
+        sp = spotipy.Spotify(auth="bench-token", requests_session=_build_requests_session())
+        sp.prefix = f"{self.base_url}/v1/"
+        return sp
+
+    def youtube_client(self):
+        """Returns a googleapiclient YouTube client that talks to this server."""
+        import googleapiclient.discovery
+        import googleapiclient.discovery_cache
+        import httplib2
+        path = os.path.join(os.path.dirname(googleapiclient.discovery_cache.__file__),
+                            "documents", "youtube.v3.json")
+        with open(path) as f:
+            document = json.load(f)
+        # rootUrl is used for both method calls and the batch endpoint.
+        document["rootUrl"] = f"{self.base_url}/"
+        return googleapiclient.discovery.build_from_document(document, http=httplib2.Http())
+
+    def _record(self, endpoint, count=1):
+        with self._lock:
+            self.calls[endpoint] += count
+            self.quota_units += QUOTA_COSTS.get(endpoint, 0) * count
+
+    def _roll(self):
+        """Returns 429, 503 or None for an injected failure."""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def _scripted(self, key):
+        """Returns ``(status, body)`` for the next scripted failure of key, if any."""
+        with self._lock:
+            reasons = self.failures.get(key)
+            if not reasons:
+                return None
+            reason = reasons.pop(0)
+        status = FAILURE_STATUS[reason]
+        return status, {"error": {"code": status, "message": f"Scripted {reason}", "errors": [{"reason": reason}]}}
+
+    def stats(self):
+        """Returns call counts, HTTP round trips and quota units so far."""
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "api_calls": sum(self.calls.values()),
+                "http_requests": self.http_requests,
+                "quota_units": self.quota_units,
+            }
+
+    # --- Spotify -----------------------------------------------------------
+
+    def _spotify(self, path, query):
+        if path == "/v1/me":
+            self._record("spotify.me")
+            return 200, {"id": "bench", "display_name": "Benchmark User"}
+
+        if path == "/v1/me/playlists":
+            self._record("spotify.playlists")
+            offset, limit = int(query.get("offset", 0)), int(query.get("limit", 50))
+            ids = list(self.playlists)
+            items = [
+                {"id": pid, "name": self.playlists[pid]["name"], "snapshot_id": f"snap-{pid}-{self.playlists[pid].get('version', 0)}",
+                 "tracks": {"total": len(self.playlists[pid]["track_ids"])}}
+                for pid in ids[offset:offset + limit]
+            ]
+            next_url = None
+            if offset + limit < len(ids):
+                next_url = f"{self.base_url}/v1/me/playlists?offset={offset + limit}&limit={limit}"
+            return 200, {"items": items, "next": next_url, "total": len(ids)}
+
+        if path in ("/v1/me/tracks", "/v1/me/top/tracks"):
+            top = path == "/v1/me/top/tracks"
+            self._record("spotify.top_tracks" if top else "spotify.saved_tracks")
+            track_ids = self.saved_ids[:50] if top else self.saved_ids
+            offset, limit = int(query.get("offset", 0)), int(query.get("limit", 20))
+            page = [self.tracks[tid] for tid in track_ids[offset:offset + limit]]
+            items = page if top else [{"added_at": "2024-01-01T00:00:00Z", "track": track} for track in page]
+            return 200, {"items": items, "total": len(track_ids)}
+
+        match = re.match(r"^/v1/playlists/([^/]+)/tracks$", path)
+        if match and match.group(1) in self.playlists:
+            self._record("spotify.playlist_items")
+            track_ids = self.playlists[match.group(1)]["track_ids"]
+            offset, limit = int(query.get("offset", 0)), int(query.get("limit", 100))
+            items = [{"track": self.tracks[tid]} for tid in track_ids[offset:offset + limit]]
+            return 200, {"items": items, "total": len(track_ids)}
+        return 404, {"error": {"status": 404, "message": "Not found"}}
+
+    # --- YouTube -----------------------------------------------------------
+
+    def _video_for(self, track):
+        return {
+            "kind": "youtube#searchResult",
+            "id": {"kind": "youtube#video", "videoId": f"v-{track['id']}"},
+            "snippet": {
+                "title": f"{track['artists'][0]['name']} - {track['name']} (Official Audio)",
+                "channelTitle": f"{track['artists'][0]['name']} - Topic",
+            },
+        }
+
+    def _youtube_get(self, path, query):
+        if path == "/youtube/v3/search":
+            self._record("search.list")
+            max_results = int(query.get("maxResults", 5))
+            items = []
+            pairs = _QUOTED_PAIR.findall(query.get("q", ""))
+            miss_rate = self.miss_rate + self.crowding * (len(pairs) - 1) / 49
+            for name, artist in pairs:
+                track = self.by_name_artist.get((name, artist))
+                with self._lock:
+                    missed = self._rng.random() < miss_rate
+                if track and not missed:
+                    items.append(self._video_for(track))
+            return 200, {"items": items[:max_results]}
+
+        if path == "/youtube/v3/videos":
+            self._record("videos.list")
+            items = []
+            for video_id in query.get("id", "").split(","):
+                track = self.tracks.get(video_id[2:])
+                if track:
+                    seconds = track["duration_ms"] // 1000
+                    items.append({"id": video_id, "contentDetails": {"duration": f"PT{seconds // 60}M{seconds % 60}S"}})
+            return 200, {"items": items}
+
+        if path == "/youtube/v3/playlistItems":
+            self._record("playlistItems.list")
+            scripted = self._scripted("playlistItems.list")
+            if scripted:
+                return scripted
+            if query.get("playlistId") not in self.youtube_playlists:
+                return 404, {"error": {"code": 404, "message": "Playlist not found",
+                                       "errors": [{"reason": "playlistNotFound"}]}}
+            video_ids = self.youtube_playlists[query.get("playlistId")]
+            start = int(query.get("pageToken") or 0)
+            page = video_ids[start:start + 50]
+            body = {"items": [{"contentDetails": {"videoId": video_id}} for video_id in page]}
+            if start + 50 < len(video_ids):
+                body["nextPageToken"] = str(start + 50)
+            return 200, body
+        return 404, {"error": {"code": 404, "message": "Not found"}}
+
+    def _youtube_post(self, path, body):
+        if path == "/youtube/v3/playlists":
+            self._record("playlists.insert")
+            with self._lock:
+                # Numbered by calls, so a playlist deleted by a test never has its ID reused.
+                playlist_id = f"YTPL{self.calls['playlists.insert'] - 1:05d}"
+                self.youtube_playlists[playlist_id] = []
+            return 200, {"id": playlist_id, "snippet": body.get("snippet", {})}
+
+        if path == "/youtube/v3/playlistItems":
+            self._record("playlistItems.insert")
+            snippet = body.get("snippet", {})
+            video_id = snippet.get("resourceId", {}).get("videoId")
+            with self._lock:
+                self.insert_requests[video_id] += 1
+            scripted = self._scripted(f"playlistItems.insert:{video_id}")
+            if scripted:
+                return scripted
+            with self._lock:
+                self.youtube_playlists.setdefault(snippet.get("playlistId"), []).append(
+                    snippet.get("resourceId", {}).get("videoId"))
+            return 200, {"id": f"item-{self._rng.random()}", "snippet": snippet}
+        return 404, {"error": {"code": 404, "message": "Not found"}}
+
+    def _batch(self, content_type, raw_body):
+        """Answers a multipart/mixed batch, failing sub-requests individually."""
+        message = email.message_from_bytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + raw_body)
+        boundary = "bench_batch_boundary"
+        parts = []
+        for part in message.get_payload():
+            payload = part.get_payload()
+            head, _, body = payload.replace("\r\n", "\n").partition("\n\n")
+            request_line = head.split("\n", 1)[0]
+            path = urllib.parse.urlparse(request_line.split(" ")[1]).path
+            failure = self._roll()
+            if failure:
+                status = failure
+                response = {"error": {"code": failure, "message": "Injected failure",
+                                      "errors": [{"reason": "backendError" if failure == 503 else "rateLimitExceeded"}]}}
+            else:
+                status, response = self._youtube_post(path, json.loads(body or "{}"))
+            reason = {200: "OK", 403: "Forbidden", 404: "Not Found", 429: "Too Many Requests",
+                      503: "Service Unavailable"}[status]
+            content_id = part["Content-ID"].replace("<", "<response-", 1)
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n"
+                f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n\r\n{json.dumps(response)}\r\n"
+            )
+        parts.append(f"--{boundary}--\r\n")
+        return f"multipart/mixed; boundary={boundary}", "".join(parts).encode()
+
+    # --- HTTP plumbing -----------------------------------------------------
+
+    def _handler_class(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type="application/json", headers=None):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method):
+                url = urllib.parse.urlparse(self.path)
+                query = dict(urllib.parse.parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length) if length else b""
+                if self.headers.get("X-HTTP-Method-Override") == "GET":
+                    # googleapiclient sends over-long GET URLs (packed searches) as form POSTs.
+                    method = "GET"
+                    query.update(urllib.parse.parse_qsl(raw_body.decode()))
+                with services._lock:
+                    services.http_requests += 1
+                if services.latency:
+                    time.sleep(services.latency)
+
+                # Whole-request failures; batches inject failures per sub-request instead.
+                failure = None if url.path == "/batch" else services._roll()
+                if failure == 429:
+                    self._send(429, {"error": {"code": 429, "message": "Too many requests",
+                                               "errors": [{"reason": "rateLimitExceeded"}]}},
+                               headers={"Retry-After": str(services.retry_after)})
+                    return
+                if failure == 503:
+                    self._send(503, {"error": {"code": 503, "message": "Injected failure",
+                                               "errors": [{"reason": "backendError"}]}})
+                    return
+
+                if url.path.startswith("/v1/"):
+                    self._send(*services._spotify(url.path, query))
+                elif url.path == "/batch":
+                    content_type, body = services._batch(self.headers.get("Content-Type"), raw_body)
+                    self._send(200, body, content_type=content_type)
+                elif method == "GET":
+                    self._send(*services._youtube_get(url.path, query))
+                else:
+                    self._send(*services._youtube_post(url.path, json.loads(raw_body or b"{}")))
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        return Handler
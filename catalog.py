@@ -0,0 +1,158 @@
+import threading
+import pandas as pd
+from sqlalchemy import select
+from config import CATALOG_PATHS, MATCH_DURATION_TOLERANCE
+from match_cache import matches_table
+from matcher import CREDIT_NOISE
+
+REQUIRED_COLUMNS = ("name", "artist", "video_id")
+_COMBINING_MARKS = "[\u0300-\u036f]"  # What matcher._fold strips after NFKD
+
+
+def normalize_series(values):
+    """Casefolds, strips accents and featuring credits and joins word tokens, for catalog join keys.
+
+    Unlike matcher.clean_title, version qualifiers such as "(Live)",
+    "- Remix" or "- Remastered 2011" are kept: entries from the match cache
+    have no duration to tell a live take or remix from the original.
+    """
+    text = (values.fillna("").astype(str).str.casefold()
+            .str.normalize("NFKD").str.replace(_COMBINING_MARKS, "", regex=True))
+    for pattern in CREDIT_NOISE:
+        text = text.str.replace(pattern, " ", regex=True)
+    return text.str.replace(r"[\W_]+", " ", regex=True).str.strip()
+
+
+def _join_keys(names, artists):
+    """Builds (name, artist) join keys; rows without a usable name get an empty key."""
+    names = normalize_series(names)
+    keys = names + "\x1f" + normalize_series(artists)
+    return keys.where(names != "", "")
+
+
+def _read_file(path):
+    """Reads a CSV or Parquet catalog file, or returns None if it can't be used."""
+    try:
+        if path.endswith((".parquet", ".pq")):
+            frame = pd.read_parquet(path)  # Needs pyarrow or fastparquet
+        else:
+            frame = pd.read_csv(path, dtype=str)
+    except ImportError:
+        print(f"  Skipping catalog '{path}': Parquet support needs pyarrow or fastparquet installed.")
+        return None
+    except (OSError, ValueError) as e:
+        print(f"  Skipping catalog '{path}': {e}")
+        return None
+    missing = [column for column in REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        print(f"  Skipping catalog '{path}': missing column(s) {', '.join(missing)}.")
+        return None
+    return frame
+
+
+class TrackCatalog:
+    """In-memory catalog of known track -> videoId matches, joined against pending tracks.
+
+    Entries are keyed on normalized (name, primary artist), so a song already
+    matched on another album, or listed in an imported catalog, resolves
+    without a search. Matching a batch of tracks is one pandas merge; when
+    both sides have a duration the match must agree within
+    MATCH_DURATION_TOLERANCE. One catalog can be shared by threads, such
+    as the job service's concurrent jobs.
+    """
+
+    def __init__(self):
+        self._table = pd.DataFrame({
+            "key": pd.Series(dtype=str),
+            "video_id": pd.Series(dtype=str),
+            "catalog_duration_ms": pd.Series(dtype="float64"),
+        })
+        self._pending = []
+        self._lock = threading.Lock()  # Guards _pending and replacing _table, which is never changed in place
+
+    @classmethod
+    def load(cls, cache=None, paths=None):
+        """Builds a catalog from imported files (first, so they take precedence) and the match cache."""
+        catalog = cls()
+        for path in CATALOG_PATHS if paths is None else paths:
+            frame = _read_file(path)
+            if frame is not None:
+                catalog.add_frame(frame)
+                print(f"  Loaded {len(frame)} catalog entries from '{path}'.")
+        if cache:
+            catalog.add_frame(cls._cache_frame(cache))
+        catalog._compact()
+        return catalog
+
+    @staticmethod
+    def _cache_frame(cache):
+        """Returns the match cache's positive results as a name/artist/video_id frame."""
+        query = select(matches_table.c.track_key, matches_table.c.video_id).where(
+            matches_table.c.video_id.is_not(None))
+        with cache.engine.connect() as conn:
+            frame = pd.read_sql(query, conn)
+        if frame.empty:
+            return pd.DataFrame(columns=list(REQUIRED_COLUMNS))
+        # Cache keys are "name\x1fartist\x1falbum".
+        parts = frame["track_key"].str.split("\x1f", n=2, expand=True)
+        return pd.DataFrame({"name": parts[0], "artist": parts[1], "video_id": frame["video_id"]})
+
+    def add_frame(self, frame):
+        """Adds entries from a frame with name, artist, video_id and optional duration_ms columns."""
+        if frame.empty:
+            return
+        if "duration_ms" in frame.columns:
+            durations = frame["duration_ms"]
+        else:
+            durations = pd.Series(index=frame.index, dtype="float64")
+        entries = pd.DataFrame({
+            "key": _join_keys(frame["name"], frame["artist"]),
+            "video_id": frame["video_id"].astype(str),
+            "catalog_duration_ms": pd.to_numeric(durations, errors="coerce"),
+        })
+        entries = entries[(entries["key"] != "") & frame["video_id"].notna().to_numpy()]
+        with self._lock:
+            self._pending.append(entries)
+
+    def add(self, matches):
+        """Adds ``(track, video_id)`` matches found during this run."""
+        matches = list(matches)
+        if matches:
+            self.add_frame(pd.DataFrame({
+                "name": [track.name for track, _ in matches],
+                "artist": [track.artist for track, _ in matches],
+                "video_id": [video_id for _, video_id in matches],
+                "duration_ms": [track.duration_ms for track, _ in matches],
+            }))
+
+    def _compact(self):
+        """Merges pending additions into the table and returns it; the first entry for a key wins."""
+        with self._lock:
+            if self._pending:
+                table = pd.concat([self._table] + self._pending, ignore_index=True)
+                self._table = table.drop_duplicates("key", keep="first")
+                self._pending = []
+            return self._table
+
+    def __len__(self):
+        return len(self._compact())
+
+    def match(self, tracks):
+        """Returns ``{track.key: video_id}`` for the tracks the catalog can resolve."""
+        tracks = list(tracks)
+        table = self._compact()
+        if not tracks or table.empty:
+            return {}
+        pending = pd.DataFrame({
+            "track_key": [track.key for track in tracks],
+            "name": [track.name for track in tracks],
+            "artist": [track.artist for track in tracks],
+            "duration_ms": pd.to_numeric(pd.Series([track.duration_ms for track in tracks]), errors="coerce"),
+        })
+        pending["key"] = _join_keys(pending["name"], pending["artist"])
+        merged = pending[pending["key"] != ""].merge(table, on="key", how="inner")
+
+        gap = (merged["duration_ms"] - merged["catalog_duration_ms"]).abs()
+        agrees = gap.isna() | (gap <= MATCH_DURATION_TOLERANCE * 1000)
+        merged = merged[agrees]
+        return dict(zip(merged["track_key"], merged["video_id"]))
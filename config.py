@@ -8,11 +8,106 @@ load_dotenv()
 SPOTIPY_CLIENT_ID = os.getenv('SPOTIPY_CLIENT_ID')
 SPOTIPY_CLIENT_SECRET = os.getenv('SPOTIPY_CLIENT_SECRET')
 SPOTIPY_REDIRECT_URI = os.getenv('SPOTIPY_REDIRECT_URI')
+SPOTIFY_TOKEN_FILE = os.getenv('SONGSHIFT_SPOTIFY_TOKEN', '.spotify_token_cache')  # Saved refreshable token
 
 # YouTube Configuration
 GOOGLE_CLIENT_SECRET_FILE = 'client_secret.json'
+GOOGLE_TOKEN_FILE = os.getenv('SONGSHIFT_GOOGLE_TOKEN', 'google_token.json')  # Saved refreshable credentials
 YOUTUBE_SCOPES = ["https://www.googleapis.com/auth/youtube.force-ssl"]
+YOUTUBE_PAGE_SIZE = 50  # Maximum page size for playlist items
 
 # Batch Processing Configuration
-SEARCH_BATCH_SIZE = 50
-UPLOAD_BATCH_SIZE = 50 
\ No newline at end of file
+SEARCH_BATCH_SIZE = 50  # Most tracks OR-packed into one search query
+UPLOAD_BATCH_SIZE = 50
+SEARCH_WORKERS = int(os.getenv('SONGSHIFT_SEARCH_WORKERS', 8))  # Search batches in flight at once
+SEARCH_MAX_RESULTS = 50  # Results requested per search; a search costs the same however many it returns
+SEARCH_MIN_PACK_SIZE = 3  # Smallest pack the adaptive packer tries for first-pass searches
+SEARCH_PACK_PROBE_INTERVAL = 8  # Batches between re-measuring a neighbouring pack size
+# Tracks per query when re-searching first-pass misses; 1 sends one precise query per track, 0 disables.
+SEARCH_FALLBACK_PACK_SIZE = int(os.getenv('SONGSHIFT_FALLBACK_PACK_SIZE', 5))
+
+# Match Cache Configuration
+MATCH_CACHE_PATH = os.getenv('SONGSHIFT_MATCH_CACHE', 'songshift_cache.db')
+MATCH_CACHE_NEGATIVE_TTL = 7 * 24 * 60 * 60  # Re-search "not found" tracks after a week
+MATCH_CACHE_MAX_AGE = 180 * 24 * 60 * 60
+MATCH_CACHE_MAX_ENTRIES = 200000
+
+# Pipeline Configuration
+PIPELINE_QUEUE_SIZE = 4  # Chunks buffered between the fetch, search and insert stages
+PIPELINE_CHUNK_SIZE = 500  # Tracks streamed through the pipeline per chunk
+
+# Rate Limiting Configuration (requests per second, adapted at runtime)
+YOUTUBE_RATE_LIMIT = 5.0
+YOUTUBE_RATE_BURST = 10
+SPOTIFY_RATE_LIMIT = 10.0
+SPOTIFY_RATE_BURST = 20
+RATE_LIMIT_MIN_FRACTION = 0.05  # Never throttle below 5% of the configured rate
+RATE_LIMIT_MAX_FRACTION = 4.0  # Never grow beyond 4x the configured rate
+RATE_LIMIT_INCREASE = 0.05  # Additive increase (req/s) per successful request
+RATE_LIMIT_DECREASE = 0.5  # Multiplicative decrease on 429 / rate-limit 403 / 5xx
+RATE_LIMIT_MAX_RETRIES = 5
+RATE_LIMIT_BACKOFF_BASE = 1.0  # Seconds; doubled per attempt, with full jitter
+RATE_LIMIT_BACKOFF_MAX = 60.0
+
+# Progress Journal Configuration
+JOURNAL_PATH = os.getenv('SONGSHIFT_JOURNAL', 'songshift_journal.db')
+# How long a write waits for another process's lock on a shared SQLite file, e.g. from other shards.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SONGSHIFT_SQLITE_BUSY_TIMEOUT_MS', 30000))
+
+# Spotify Pagination Configuration
+SPOTIFY_PAGE_SIZE = 100  # Maximum page size for playlist items
+SPOTIFY_PAGE_WORKERS = 8  # Concurrent page requests per playlist
+SPOTIFY_LIBRARY_PAGE_SIZE = 50  # Maximum page size for saved and top tracks
+
+# Library Source Configuration
+SPOTIFY_SOURCES = ("playlists", "saved", "top")  # Playlists, Liked Songs and Top Tracks
+# Liked Songs and Top Tracks are split into YouTube playlists of at most this many
+# tracks (5000 is the most a YouTube playlist holds).
+SOURCE_PART_SIZE = int(os.getenv('SONGSHIFT_PART_SIZE', 5000))
+TOP_TRACKS_TIME_RANGE = os.getenv('SONGSHIFT_TOP_TRACKS_RANGE', 'medium_term')  # short_term, medium_term or long_term
+
+# Match Scoring Configuration
+MATCH_SCORE_THRESHOLD = 0.8  # Minimum weighted token-set similarity for a match
+MATCH_NAME_WEIGHT = 0.6  # Weight of track-name similarity; artist similarity gets the rest
+MATCH_DURATION_TOLERANCE = 30  # Seconds a video may differ from the Spotify duration
+
+# Metrics Configuration
+METRICS_JSON_PATH = os.getenv('SONGSHIFT_METRICS_JSON')  # Run report written here if set
+METRICS_PROM_PATH = os.getenv('SONGSHIFT_METRICS_PROM')  # Prometheus textfile written here if set
+METRICS_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+YOUTUBE_QUOTA_COSTS = {  # YouTube Data API units charged per request
+    "search.list": 100,
+    "videos.list": 1,
+    "playlists.insert": 50,
+    "playlistItems.insert": 50,
+    "playlistItems.list": 1,
+}
+
+# Quota Planning Configuration
+YOUTUBE_DAILY_QUOTA = int(os.getenv('SONGSHIFT_DAILY_QUOTA', 10000))  # Units per day; resets at midnight Pacific
+QUOTA_TIMEZONE = 'America/Los_Angeles'
+PLAN_MATCH_RATE = 0.9  # Share of searched tracks the planner expects to match and insert
+
+# Job Service Configuration
+SERVICE_DATA_DIR = os.getenv('SONGSHIFT_SERVICE_DATA', 'songshift_service')  # Job database and per-user journals
+SERVICE_WORKERS = int(os.getenv('SONGSHIFT_SERVICE_WORKERS', 4))  # Transfers running at once across all users
+SERVICE_MAX_RUNNING_PER_USER = 1  # Transfers running at once for one user
+SERVICE_MAX_QUEUED_PER_USER = 5  # Unfinished jobs a user may have before new ones are rejected
+
+# Catalog Configuration
+# Extra CSV/Parquet catalogs of known matches (columns: name, artist, video_id[, duration_ms]),
+# separated like PATH entries. Matches from the match cache are always included.
+CATALOG_PATHS = [path for path in os.getenv('SONGSHIFT_CATALOG', '').split(os.pathsep) if path]
+
+# Library Snapshot Configuration
+# Compact memory-mapped copy of the Spotify library; refreshed per playlist by snapshot_id.
+LIBRARY_SNAPSHOT_PATH = os.getenv('SONGSHIFT_SNAPSHOT', 'spotify_library.snap')
+
+# Profiling Configuration
+PROFILE_DIR = os.getenv('SONGSHIFT_PROFILE_DIR', 'songshift_profiles')  # --profile writes a run directory here
+PROFILE_TOP_N = 25  # Allocation sites listed per stage
+PROFILE_TRACEMALLOC_FRAMES = 1  # Stack frames kept per allocation; more is slower but shows callers
+
+# Sharding Configuration
+SHARD_COUNT = int(os.getenv('SONGSHIFT_SHARDS', 1))  # Worker processes a transfer is split over; 1 runs in-process
+SHARD_LOG_DIR = os.getenv('SONGSHIFT_SHARD_LOGS', 'songshift_shards')  # Each shard process logs here
@@ -0,0 +1,110 @@
+import time
+from sqlalchemy import Column, Float, MetaData, String, Table, create_engine, event, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from config import JOURNAL_PATH
+from journal import QuotaLedger, enable_wal, quota_table
+from quota import QuotaBudget, quota_day
+
+metadata = MetaData()
+
+# One token bucket per rate-limited service, refilled lazily on every take.
+rate_buckets_table = Table(
+    "rate_buckets",
+    metadata,
+    Column("name", String, primary_key=True),
+    Column("tokens", Float, nullable=False),
+    Column("updated", Float, nullable=False),  # Wall-clock time, as the processes share no monotonic clock
+)
+
+
+class QuotaCoordinator(QuotaLedger):
+    """SQLite ledger through which several processes share one quota budget and rate limits.
+
+    Every reservation is a single conditional UPSERT or UPDATE, which SQLite
+    applies atomically, so concurrent shards can never spend more than the
+    budget between them. Quota is kept in the journal's quota_usage table
+    (the coordinator opens the journal file by default), so sharded and
+    single-process runs on the same day count against the same total.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or JOURNAL_PATH
+        self.engine = create_engine(f"sqlite:///{self.path}")
+        event.listen(self.engine, "connect", enable_wal)
+        quota_table.create(self.engine, checkfirst=True)
+        metadata.create_all(self.engine)
+
+    def reserve_quota(self, day, units, daily_quota):
+        """Charges units if they fit in the day's quota and returns None; otherwise returns the units spent.
+
+        As with QuotaBudget, a call larger than the whole budget still goes
+        out on a fresh day.
+        """
+        stmt = sqlite_insert(quota_table).values(day=day, units=units)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[quota_table.c.day],
+            set_={"units": quota_table.c.units + stmt.excluded.units},
+            where=(quota_table.c.units + stmt.excluded.units <= daily_quota) | (quota_table.c.units == 0),
+        )
+        with self.engine.begin() as conn:
+            if conn.execute(stmt).rowcount:
+                return None
+        return self.get_quota_used(day)
+
+    def exhaust_quota(self, day, daily_quota):
+        """Marks the day's quota as spent, e.g. after the API answered quotaExceeded."""
+        stmt = sqlite_insert(quota_table).values(day=day, units=daily_quota)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[quota_table.c.day],
+            set_={"units": func.max(quota_table.c.units, stmt.excluded.units)},
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+    def take_tokens(self, name, tokens, rate, burst):
+        """Takes tokens from a shared token bucket; returns 0 if taken, else the seconds to wait.
+
+        ``rate`` and ``burst`` are the calling RateLimiter's current values.
+        As in RateLimiter.acquire, a request larger than the burst size is let
+        through once the bucket is full and leaves it in debt.
+        """
+        now = time.time()
+        needed = min(tokens, burst)
+        refilled = func.min(burst, rate_buckets_table.c.tokens + (now - rate_buckets_table.c.updated) * rate)
+        with self.engine.begin() as conn:
+            conn.execute(sqlite_insert(rate_buckets_table).values(name=name, tokens=burst, updated=now)
+                         .on_conflict_do_nothing())
+            taken = conn.execute(
+                update(rate_buckets_table)
+                .where(rate_buckets_table.c.name == name, refilled >= needed)
+                .values(tokens=refilled - tokens, updated=now)
+            ).rowcount
+            if taken:
+                return 0
+            available = conn.execute(select(refilled).where(rate_buckets_table.c.name == name)).scalar()
+        return max(0.001, (needed - available) / rate)
+
+    def close(self):
+        """Releases the database connection pool."""
+        self.engine.dispose()
+
+
+class SharedQuotaBudget(QuotaBudget):
+    """QuotaBudget whose units are reserved in a QuotaCoordinator shared with other processes.
+
+    Nothing is cached in the process: every reservation and every read of
+    ``used`` goes to the ledger, so each shard sees what the others spent.
+    """
+
+    def __init__(self, coordinator, daily_quota=None):
+        super().__init__(daily_quota, coordinator)
+
+    def _roll(self):
+        self._day = quota_day()
+        self._used = self.journal.get_quota_used(self._day)
+
+    def _try_charge(self, units):
+        return self.journal.reserve_quota(quota_day(), units, self.daily_quota)
+
+    def exhaust(self):
+        self.journal.exhaust_quota(quota_day(), self.daily_quota)
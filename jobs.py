@@ -0,0 +1,290 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from sqlalchemy import (
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    event,
+    select,
+    update,
+)
+from config import (
+    SERVICE_DATA_DIR,
+    SERVICE_WORKERS,
+    SERVICE_MAX_RUNNING_PER_USER,
+    SERVICE_MAX_QUEUED_PER_USER
+)
+from journal import QuotaLedger, TransferJournal, enable_wal, quota_table
+from library_snapshot import refresh_snapshot
+from metrics import Metrics
+from pipeline import run_pipeline
+from planner import order_playlists
+from spotify_api import get_spotify_playlists, get_spotify_sources, spotify_from_token
+from youtube_api import youtube_from_credentials
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+metadata = MetaData()
+
+jobs_table = Table(
+    "jobs",
+    metadata,
+    Column("id", String, primary_key=True),
+    Column("user_id", String, nullable=False, index=True),
+    Column("state", String, nullable=False),
+    Column("mode", String, nullable=False),
+    Column("playlists", String, nullable=True),  # JSON list of requested playlist names/IDs
+    Column("tracks_done", Integer, nullable=False, default=0),
+    Column("tracks_total", Integer, nullable=False, default=0),
+    Column("error", String, nullable=True),
+    Column("created_at", Float, nullable=False),
+    Column("started_at", Float, nullable=True),
+    Column("finished_at", Float, nullable=True),
+)
+
+
+class JobStore(QuotaLedger):
+    """SQLite-backed state and progress of transfer jobs.
+
+    Credentials are never written here; they only live in memory while a job
+    is queued or running. It also records the YouTube quota spent, which is
+    charged to the service's Google project and shared by every user.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(SERVICE_DATA_DIR, "jobs.db")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.engine = create_engine(f"sqlite:///{self.path}")
+        event.listen(self.engine, "connect", enable_wal)
+        metadata.create_all(self.engine)
+        quota_table.create(self.engine, checkfirst=True)
+
+    def create_job(self, user_id, mode, playlists=None):
+        """Records a new queued job and returns its ID."""
+        job_id = uuid.uuid4().hex
+        with self.engine.begin() as conn:
+            conn.execute(jobs_table.insert().values(
+                id=job_id, user_id=user_id, state=QUEUED, mode=mode,
+                playlists=json.dumps(playlists) if playlists else None,
+                tracks_done=0, tracks_total=0, created_at=time.time(),
+            ))
+        return job_id
+
+    def get_job(self, job_id):
+        """Returns a job as a dict, or None."""
+        with self.engine.connect() as conn:
+            row = conn.execute(select(jobs_table).where(jobs_table.c.id == job_id)).mappings().first()
+        return _job_dict(row) if row else None
+
+    def list_jobs(self, user_id):
+        """Returns a user's jobs, newest first."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(jobs_table).where(jobs_table.c.user_id == user_id)
+                .order_by(jobs_table.c.created_at.desc())
+            ).mappings().all()
+        return [_job_dict(row) for row in rows]
+
+    def _update(self, job_id, **values):
+        with self.engine.begin() as conn:
+            conn.execute(update(jobs_table).where(jobs_table.c.id == job_id).values(**values))
+
+    def mark_running(self, job_id):
+        self._update(job_id, state=RUNNING, started_at=time.time())
+
+    def update_progress(self, job_id, done, total):
+        self._update(job_id, tracks_done=done, tracks_total=total)
+
+    def mark_finished(self, job_id, error=None):
+        self._update(job_id, state=FAILED if error else SUCCEEDED, error=error, finished_at=time.time())
+
+    def fail_interrupted(self):
+        """Fails jobs left queued or running by a previous process; their credentials are gone."""
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(jobs_table).where(jobs_table.c.state.in_([QUEUED, RUNNING]))
+                .values(state=FAILED, error="Interrupted by a service restart; submit the job again with mode 'resume'.",
+                        finished_at=time.time())
+            )
+        return result.rowcount
+
+    def close(self):
+        self.engine.dispose()
+
+
+def _job_dict(row):
+    job = dict(row)
+    job["playlists"] = json.loads(job["playlists"]) if job["playlists"] else None
+    total = job["tracks_total"]
+    job["percent"] = round(100.0 * job["tracks_done"] / total, 1) if total else None
+    return job
+
+
+class _JobProgress(Metrics):
+    """Per-job progress tracker that also stores progress in the job store."""
+
+    def __init__(self, store, job_id):
+        super().__init__()
+        self.store = store
+        self.job_id = job_id
+
+    def start_progress(self, total_tracks):
+        super().start_progress(total_tracks)
+        self.store.update_progress(self.job_id, 0, total_tracks)
+
+    def skip_progress(self, tracks):
+        super().skip_progress(tracks)
+        self.store.update_progress(self.job_id, self.done_tracks, self.total_tracks)
+
+    def advance(self, tracks):
+        super().advance(tracks)
+        self.store.update_progress(self.job_id, self.done_tracks, self.total_tracks)
+
+    def progress_line(self):
+        return f"[job {self.job_id[:8]}] {super().progress_line()}"
+
+
+def _safe_name(user_id):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)
+
+
+class JobRunner:
+    """Bounded worker pool running queued transfer jobs.
+
+    At most ``workers`` jobs run at once overall and at most
+    ``max_running_per_user`` per user; a user's further jobs wait in the
+    queue without blocking other users. Every job uses the shared match
+    cache and track catalog and its user's own progress journal. With
+    ``snapshots``, each user also gets a library snapshot, so a repeat job
+    only re-reads changed playlists; without, tracks are streamed from
+    Spotify as the transfer goes.
+    """
+
+    def __init__(self, store, cache=None, workers=None, max_running_per_user=None,
+                 max_queued_per_user=None, data_dir=None, catalog=None, snapshots=False):
+        self.store = store
+        self.cache = cache
+        self.catalog = catalog
+        self.snapshots = snapshots
+        self.workers = workers or SERVICE_WORKERS
+        self.max_running_per_user = max_running_per_user or SERVICE_MAX_RUNNING_PER_USER
+        self.max_queued_per_user = max_queued_per_user or SERVICE_MAX_QUEUED_PER_USER
+        self.data_dir = data_dir or SERVICE_DATA_DIR
+        self._queue = deque()  # (job_id, user_id, request) in submission order
+        self._running = {}  # user_id -> running job count
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        interrupted = self.store.fail_interrupted()
+        if interrupted:
+            print(f"Marked {interrupted} jobs from a previous run as failed.")
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"transfer-worker-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def active_jobs(self, user_id):
+        """Returns how many of a user's jobs are queued or running."""
+        with self._condition:
+            queued = sum(1 for _, queued_user, _ in self._queue if queued_user == user_id)
+            return queued + self._running.get(user_id, 0)
+
+    def submit(self, user_id, request):
+        """Queues a job and returns its ID, or None if the user has too many unfinished jobs.
+
+        ``request`` holds the job's ``spotify_token``, ``google_credentials``,
+        ``mode``, optional ``playlists`` (names or IDs, in priority order) and
+        optional ``sources`` (see main.main; by default only playlists).
+        """
+        with self._condition:
+            if self.active_jobs(user_id) >= self.max_queued_per_user:
+                return None
+            job_id = self.store.create_job(user_id, request["mode"], request.get("playlists"))
+            self._queue.append((job_id, user_id, request))
+            self._condition.notify()
+        return job_id
+
+    def _next_job(self):
+        """Blocks until a job whose user is under the running limit is queued, and claims it."""
+        with self._condition:
+            while True:
+                if self._stopping:
+                    return None
+                for item in self._queue:
+                    user_id = item[1]
+                    if self._running.get(user_id, 0) < self.max_running_per_user:
+                        self._queue.remove(item)
+                        self._running[user_id] = self._running.get(user_id, 0) + 1
+                        return item
+                self._condition.wait()
+
+    def _release(self, user_id):
+        with self._condition:
+            self._running[user_id] -= 1
+            if not self._running[user_id]:
+                del self._running[user_id]
+            self._condition.notify_all()
+
+    def _work(self):
+        while (item := self._next_job()) is not None:
+            job_id, user_id, request = item
+            try:
+                self.store.mark_running(job_id)
+                self.run_job(job_id, user_id, request)
+                self.store.mark_finished(job_id)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                self.store.mark_finished(job_id, error=str(e))
+            finally:
+                self._release(user_id)
+
+    def run_job(self, job_id, user_id, request):
+        """Runs one transfer with the user's credentials, reusing the CLI's pipeline."""
+        sp = spotify_from_token(request["spotify_token"])
+        youtube = youtube_from_credentials(request["google_credentials"])
+        mode = request["mode"]
+
+        sources = request.get("sources") or ["playlists"]
+        library = None
+        if "playlists" in sources and self.snapshots:
+            library = refresh_snapshot(sp, os.path.join(self.data_dir, f"library-{_safe_name(user_id)}.snap"))
+        journal = TransferJournal(os.path.join(self.data_dir, f"journal-{_safe_name(user_id)}.db"))
+        try:
+            playlists = []
+            if "playlists" in sources:
+                playlists = library.playlists() if library else get_spotify_playlists(sp)
+            playlists += get_spotify_sources(sp, [source for source in sources if source != "playlists"])
+            wanted = request.get("playlists")
+            if wanted:
+                playlists = [p for p in order_playlists(playlists, wanted) if p['id'] in wanted or p['name'] in wanted]
+            if not playlists:
+                raise ValueError("No matching Spotify playlists found.")
+            if mode == "transfer":
+                journal.reset()
+            asyncio.run(run_pipeline(sp, youtube, playlists, cache=self.cache, journal=journal, mode=mode,
+                                     progress=_JobProgress(self.store, job_id), catalog=self.catalog,
+                                     library=library))
+        finally:
+            journal.close()
+            if library:
+                library.close()
@@ -0,0 +1,226 @@
+import time
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    delete,
+    event,
+    inspect,
+    text,
+    select,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from config import JOURNAL_PATH, SQLITE_BUSY_TIMEOUT_MS
+
+metadata = MetaData()
+
+playlists_table = Table(
+    "playlists",
+    metadata,
+    Column("spotify_playlist_id", String, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("youtube_playlist_id", String, nullable=False),
+    Column("completed", Boolean, nullable=False, default=False),
+    Column("snapshot_id", String, nullable=True),
+    Column("updated_at", Float, nullable=False),
+)
+
+# Only positive matches are journaled; misses are left to the match cache.
+matches_table = Table(
+    "matches",
+    metadata,
+    Column("spotify_playlist_id", String, primary_key=True),
+    Column("track_key", String, primary_key=True),
+    Column("video_id", String, nullable=False),
+)
+
+inserts_table = Table(
+    "inserts",
+    metadata,
+    Column("spotify_playlist_id", String, primary_key=True),
+    Column("position", Integer, primary_key=True),
+    Column("video_id", String, nullable=False),
+)
+
+# YouTube quota charged per Pacific-time day. Kept across reset(): the quota
+# belongs to the Google project, not to a single transfer.
+quota_table = Table(
+    "quota_usage",
+    metadata,
+    Column("day", String, primary_key=True),
+    Column("units", Integer, nullable=False),
+)
+
+
+def enable_wal(dbapi_connection, connection_record):
+    """Puts every SQLite connection in WAL mode with fully synchronous commits.
+
+    Writers from other threads or processes are waited for up to
+    SQLITE_BUSY_TIMEOUT_MS rather than failing with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=FULL")
+    cursor.close()
+
+
+def is_up_to_date(state, mode, sp_playlist):
+    """Returns True if a playlist's journaled state means it needs no work in the given mode."""
+    if not state or not state['completed']:
+        return False
+    if mode == "resume":
+        return True
+    snapshot_id = sp_playlist.get('snapshot_id')
+    return mode == "sync" and snapshot_id is not None and state['snapshot_id'] == snapshot_id
+
+
+class QuotaLedger:
+    """Daily YouTube quota spending kept in a quota_usage table, for classes with an ``engine``.
+
+    Used as the ``journal`` of a QuotaBudget.
+    """
+
+    def get_quota_used(self, day):
+        """Returns the YouTube quota units recorded as spent on a quota day."""
+        with self.engine.connect() as conn:
+            units = conn.execute(select(quota_table.c.units).where(quota_table.c.day == day)).scalar()
+        return units or 0
+
+    def add_quota_used(self, day, units):
+        """Adds units to the quota spent on a quota day."""
+        stmt = sqlite_insert(quota_table).values(day=day, units=units)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[quota_table.c.day],
+            set_={"units": quota_table.c.units + stmt.excluded.units},
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+
+class TransferJournal(QuotaLedger):
+    """Append-only SQLite record of transfer progress, used to resume a crashed run.
+
+    Each write is its own committed transaction, so after a crash the journal
+    holds every playlist creation, search result and confirmed insert that
+    happened before it.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or JOURNAL_PATH
+        self.engine = create_engine(f"sqlite:///{self.path}")
+        event.listen(self.engine, "connect", enable_wal)
+        metadata.create_all(self.engine)
+        self._migrate()
+
+    def _migrate(self):
+        """Adds columns introduced after a journal file was first created."""
+        columns = {column["name"] for column in inspect(self.engine).get_columns("playlists")}
+        if "snapshot_id" not in columns:
+            with self.engine.begin() as conn:
+                conn.execute(text("ALTER TABLE playlists ADD COLUMN snapshot_id VARCHAR"))
+
+    def reset(self):
+        """Forgets all recorded progress and playlist mappings (used when starting a fresh transfer)."""
+        with self.engine.begin() as conn:
+            for table in (inserts_table, matches_table, playlists_table):
+                conn.execute(delete(table))
+
+    def get_playlist(self, spotify_playlist_id):
+        """Returns the recorded state of a playlist as a dict, or None."""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(playlists_table).where(playlists_table.c.spotify_playlist_id == spotify_playlist_id)
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def record_playlist(self, spotify_playlist_id, name, youtube_playlist_id):
+        """Records the YouTube playlist created for a Spotify playlist."""
+        stmt = sqlite_insert(playlists_table).values(
+            spotify_playlist_id=spotify_playlist_id,
+            name=name,
+            youtube_playlist_id=youtube_playlist_id,
+            completed=False,
+            updated_at=time.time(),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[playlists_table.c.spotify_playlist_id],
+            set_={
+                "name": stmt.excluded.name,
+                "youtube_playlist_id": stmt.excluded.youtube_playlist_id,
+                "completed": False,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt)
+
+    def mark_completed(self, spotify_playlist_id, snapshot_id=None):
+        """Marks a playlist as fully transferred as of the given Spotify snapshot_id."""
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(playlists_table)
+                .where(playlists_table.c.spotify_playlist_id == spotify_playlist_id)
+                .values(completed=True, snapshot_id=snapshot_id, updated_at=time.time())
+            )
+
+    def get_matches(self, spotify_playlist_id):
+        """Returns ``{track_key: video_id}`` for every track already matched in a playlist."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(matches_table.c.track_key, matches_table.c.video_id)
+                .where(matches_table.c.spotify_playlist_id == spotify_playlist_id)
+            )
+            return {track_key: video_id for track_key, video_id in rows}
+
+    def record_matches(self, spotify_playlist_id, matches):
+        """Records ``(track_key, video_id)`` matches for a playlist."""
+        rows = [
+            {"spotify_playlist_id": spotify_playlist_id, "track_key": track_key, "video_id": video_id}
+            for track_key, video_id in matches
+        ]
+        if not rows:
+            return
+        stmt = sqlite_insert(matches_table).on_conflict_do_nothing()
+        with self.engine.begin() as conn:
+            conn.execute(stmt, rows)
+
+    def get_inserted_positions(self, spotify_playlist_id):
+        """Returns the set of playlist positions whose insert was confirmed."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(inserts_table.c.position)
+                .where(inserts_table.c.spotify_playlist_id == spotify_playlist_id)
+            )
+            return {position for (position,) in rows}
+
+    def get_inserts(self, spotify_playlist_id):
+        """Returns ``{position: video_id}`` for every confirmed insert in a playlist."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(inserts_table.c.position, inserts_table.c.video_id)
+                .where(inserts_table.c.spotify_playlist_id == spotify_playlist_id)
+            )
+            return {position: video_id for position, video_id in rows}
+
+    def record_inserts(self, spotify_playlist_id, inserted):
+        """Records confirmed ``(position, video_id)`` inserts for a playlist."""
+        rows = [
+            {"spotify_playlist_id": spotify_playlist_id, "position": position, "video_id": video_id}
+            for position, video_id in inserted
+        ]
+        if not rows:
+            return
+        stmt = sqlite_insert(inserts_table).on_conflict_do_nothing()
+        with self.engine.begin() as conn:
+            conn.execute(stmt, rows)
+
+    def close(self):
+        """Releases the database connection pool."""
+        self.engine.dispose()
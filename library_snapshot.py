@@ -0,0 +1,238 @@
+import mmap
+import os
+import struct
+from array import array
+from config import LIBRARY_SNAPSHOT_PATH
+from spotify_api import get_spotify_playlists, get_spotify_playlist_tracks
+from track import Track
+
+# File layout, every section 8-byte aligned, integers in the writer's native byte order:
+#   header    MAGIC, VERSION, BYTE_ORDER_MARK, counts, then the section offsets
+#   strings   uint32 offsets[n_strings + 1] into a UTF-8 blob; every string stored once
+#   tracks    int32 columns (id, name, artist, album, isrc, duration_ms) of n_tracks
+#             values each; string columns hold string indices, -1 stands for None
+#   playlists int32 columns (id, name, snapshot_id, total) of n_playlists values each
+#   items     uint32 offsets[n_playlists + 1] into uint32 track indices, in playlist order
+MAGIC = b"SONGSNAP"
+VERSION = 1
+BYTE_ORDER_MARK = 0x01020304
+_HEADER = struct.Struct("=8sIIIII6Q")
+_TRACK_COLUMNS = ("id", "name", "artist", "album", "isrc", "duration_ms")
+_PLAYLIST_COLUMNS = ("id", "name", "snapshot_id", "total")
+
+
+def _pad(size):
+    return -size % 8
+
+
+class _StringTable:
+    """Assigns each distinct string one index, in first-seen order."""
+
+    def __init__(self):
+        self.index = {}
+        self.blob = bytearray()
+        self.offsets = array("I", [0])
+
+    def add(self, value):
+        if value is None:
+            return -1
+        number = self.index.get(value)
+        if number is None:
+            number = self.index[value] = len(self.index)
+            self.blob += value.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return number
+
+
+def write_snapshot(path, playlists, playlist_tracks):
+    """Writes a library snapshot.
+
+    ``playlists`` are playlist dicts as returned by get_spotify_playlists and
+    ``playlist_tracks`` maps each playlist ID to an iterable of Track records.
+    A track in several playlists is stored once. The file is written to a
+    temporary name and renamed, so readers never see a partial snapshot.
+    """
+    strings = _StringTable()
+    track_index = {}  # Track -> row, so repeats are stored once
+    track_columns = [array("i") for _ in _TRACK_COLUMNS]
+    playlist_columns = [array("i") for _ in _PLAYLIST_COLUMNS]
+    item_offsets = array("I", [0])
+    items = array("I")
+
+    for playlist in playlists:
+        for column, field in zip(playlist_columns, ("id", "name", "snapshot_id")):
+            column.append(strings.add(playlist.get(field)))
+        playlist_columns[3].append(-1 if playlist.get('total') is None else playlist['total'])
+        for track in playlist_tracks.get(playlist['id'], ()):
+            row = track_index.get(track)
+            if row is None:
+                row = track_index[track] = len(track_index)
+                for column, value in zip(track_columns[:5], track[:5]):
+                    column.append(strings.add(value))
+                track_columns[5].append(-1 if track.duration_ms is None else track.duration_ms)
+            items.append(row)
+        item_offsets.append(len(items))
+
+    sections = [strings.offsets.tobytes(), bytes(strings.blob),
+                b"".join(column.tobytes() for column in track_columns),
+                b"".join(column.tobytes() for column in playlist_columns),
+                item_offsets.tobytes() + items.tobytes()]
+    offsets = []
+    position = _HEADER.size + _pad(_HEADER.size)
+    for section in sections[:-1]:
+        offsets.append(position)
+        position += len(section) + _pad(len(section))
+    offsets += [position, position + len(item_offsets) * item_offsets.itemsize]
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, len(strings.index), len(track_index),
+                             len(playlist_columns[0]), *offsets))
+        f.write(b"\0" * _pad(_HEADER.size))
+        for section in sections:
+            f.write(section)
+            f.write(b"\0" * _pad(len(section)))
+    os.replace(temp_path, path)
+
+
+class LibrarySnapshot:
+    """Read-only, memory-mapped view of a library snapshot.
+
+    Opening a snapshot only reads its header and playlist table; strings and
+    tracks are decoded from the mapped file when a playlist is iterated, so even a 100k-track
+    library opens instantly and the OS page cache is shared between runs.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or LIBRARY_SNAPSHOT_PATH
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open_views()
+        except (ValueError, TypeError, struct.error):
+            self.close()
+            raise
+
+    def _open_views(self):
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"'{self.path}' is not a library snapshot.")
+        (magic, version, byte_order, n_strings, n_tracks, n_playlists,
+         strings_at, blob_at, tracks_at, playlists_at, item_offsets_at, items_at) = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{self.path}' is not a version {VERSION} library snapshot.")
+        if byte_order != BYTE_ORDER_MARK:
+            raise ValueError(f"'{self.path}' was written on a platform with a different byte order.")
+
+        view = memoryview(self._map)
+        self._views = [view]
+        self._string_offsets = self._view(view, strings_at, n_strings + 1, "I")
+        self._blob = view[blob_at:tracks_at]
+        self._views.append(self._blob)
+        self._tracks = [self._view(view, tracks_at + 4 * n_tracks * i, n_tracks, "i")
+                        for i in range(len(_TRACK_COLUMNS))]
+        self._playlists = [self._view(view, playlists_at + 4 * n_playlists * i, n_playlists, "i")
+                           for i in range(len(_PLAYLIST_COLUMNS))]
+        self._item_offsets = self._view(view, item_offsets_at, n_playlists + 1, "I")
+        self._items = self._view(view, items_at, self._item_offsets[n_playlists] if n_playlists else 0, "I")
+        self.track_count = n_tracks
+        self._decoded = {}
+        self._positions = {self._string(self._playlists[0][i]): i for i in range(n_playlists)}
+
+    def _view(self, view, start, count, typecode):
+        column = view[start:start + 4 * count].cast(typecode)
+        self._views.append(column)
+        return column
+
+    def _string(self, number):
+        if number < 0:
+            return None
+        value = self._decoded.get(number)
+        if value is None:
+            # Decoded once, so repeated artist and album names share one object.
+            start, end = self._string_offsets[number], self._string_offsets[number + 1]
+            value = self._decoded[number] = self._blob[start:end].tobytes().decode("utf-8")
+        return value
+
+    def _track(self, row):
+        fields = [self._string(column[row]) for column in self._tracks[:5]]
+        duration_ms = self._tracks[5][row]
+        return Track(*fields, None if duration_ms < 0 else duration_ms)
+
+    def playlists(self):
+        """Returns the snapshot's playlists as dicts shaped like get_spotify_playlists' results."""
+        ids, names, snapshot_ids, totals = self._playlists
+        return [{
+            'id': self._string(ids[i]),
+            'name': self._string(names[i]),
+            'snapshot_id': self._string(snapshot_ids[i]),
+            'total': None if totals[i] < 0 else totals[i],
+        } for i in range(len(ids))]
+
+    def snapshot_id(self, playlist_id):
+        """Returns the snapshot_id a playlist was saved at, or None if it isn't in the snapshot."""
+        position = self._positions.get(playlist_id)
+        return None if position is None else self._string(self._playlists[2][position])
+
+    def __contains__(self, playlist_id):
+        return playlist_id in self._positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def playlist_tracks(self, playlist_id):
+        """Yields a saved playlist's tracks as Track records, in order."""
+        position = self._positions[playlist_id]
+        for number in range(self._item_offsets[position], self._item_offsets[position + 1]):
+            yield self._track(self._items[number])
+
+    def close(self):
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        self._views = []
+        self._map.close()
+
+
+def load_snapshot(path=None):
+    """Opens a saved snapshot, or returns None if there is none usable."""
+    path = path or LIBRARY_SNAPSHOT_PATH
+    if not os.path.exists(path):
+        return None
+    try:
+        return LibrarySnapshot(path)
+    except (OSError, ValueError) as e:
+        print(f"  Ignoring library snapshot '{path}': {e}")
+        return None
+
+
+def refresh_snapshot(sp, path=None):
+    """Brings the snapshot up to date with the Spotify library and returns it opened.
+
+    Only the playlist list is fetched every time; a playlist's tracks are
+    fetched again only when its snapshot_id changed since it was saved. If
+    nothing changed the file is not rewritten.
+    """
+    path = path or LIBRARY_SNAPSHOT_PATH
+    playlists = get_spotify_playlists(sp)
+    previous = load_snapshot(path)
+
+    playlist_tracks = {}
+    fetched = 0
+    for playlist in playlists:
+        saved = previous and playlist['id'] in previous and playlist.get('snapshot_id')
+        if saved and previous.snapshot_id(playlist['id']) == playlist['snapshot_id']:
+            playlist_tracks[playlist['id']] = previous.playlist_tracks(playlist['id'])
+        else:
+            playlist_tracks[playlist['id']] = get_spotify_playlist_tracks(sp, playlist['id'])
+            fetched += 1
+
+    if previous and not fetched and previous.playlists() == playlists:
+        print(f"Library snapshot '{path}' is up to date ({len(playlists)} playlists).")
+        return previous
+
+    print(f"Updating library snapshot '{path}': fetching {fetched} of {len(playlists)} playlists from Spotify.")
+    try:
+        write_snapshot(path, playlists, playlist_tracks)
+    finally:
+        if previous:
+            previous.close()
+    return LibrarySnapshot(path)
@@ -1,18 +1,24 @@
-from spotify_api import authenticate_spotify, get_spotify_playlists, get_spotify_playlist_tracks
-from youtube_api import (
-    authenticate_youtube,
-    create_youtube_playlist,
-    search_multiple_tracks_on_youtube,
-    bulk_add_tracks_to_youtube_playlist
+import argparse
+from config import (
+    CATALOG_PATHS,
+    LIBRARY_SNAPSHOT_PATH,
+    METRICS_JSON_PATH,
+    METRICS_PROM_PATH,
+    SHARD_COUNT,
+    SPOTIFY_SOURCES
 )
 
+# Client libraries (spotipy, googleapiclient, SQLAlchemy, numpy, pandas) are
+# imported inside the commands that need them, so `list` and `plan` start
+# without loading the YouTube side and `--help` loads neither.
+
 def print_instructions():
     """Prints setup instructions for the user."""
     print("---------------------------------------------------------------------------")
     print("Spotify to YouTube Music Transfer Script - Setup Instructions")
     print("---------------------------------------------------------------------------")
     print("1.  Ensure you have Python installed.")
-    print("2.  Install required libraries: pip install spotipy google-api-python-client google-auth-oauthlib python-dotenv")
+    print("2.  Install required libraries: pip install -r requirements.txt")
     print("3.  Spotify Setup:")
     print("    a. Go to Spotify Developer Dashboard (https://developer.spotify.com/dashboard/).")
     print("    b. Create an App (or use an existing one).")
@@ -28,7 +34,14 @@ def print_instructions():
     print("    c. Enable the 'YouTube Data API v3'.")
     print("    d. Create OAuth 2.0 Client IDs credentials. Select 'Desktop app' for application type.")
     print("    e. Download the JSON credentials file. Rename it to 'client_secret.json' and place it in the same directory.")
-    print("5.  Run the script: python main.py")
+    print("5.  Run the script: python main.py transfer  (add --resume to continue an interrupted run)")
+    print("    python main.py sync   only adds tracks that are new since the last run")
+    print("    --sources playlists saved top   also transfers your Liked Songs and Top Tracks")
+    print("    python main.py plan   shows the estimated YouTube quota cost and schedule without writing anything")
+    print("    python main.py list   lists your Spotify playlists")
+    print("    python main.py snapshot   saves your Spotify library for fast and --offline runs")
+    print("    --profile   writes per-stage cProfile and memory profiles for finding slow stages")
+    print("    --shards N   splits a transfer over N processes sharing one YouTube quota budget")
     print("    You will be prompted to authenticate via your web browser for both Spotify and Google.")
     print("---------------------------------------------------------------------------")
     print("Important Considerations:")
@@ -37,62 +50,263 @@ def print_instructions():
     print("-   Security: NEVER share your client secrets or API keys publicly.")
     print("---------------------------------------------------------------------------\n")
 
-def main():
-    """Main function to orchestrate the transfer."""
-    print("Starting Spotify to YouTube Music transfer script...")
+def list_playlists():
+    """Lists the current user's Spotify playlists; needs only the Spotify client."""
+    from spotify_api import authenticate_spotify, get_spotify_playlists
 
-    # 1. Authenticate with Spotify
     sp = authenticate_spotify()
     if not sp:
         print("Exiting due to Spotify authentication failure.")
         return
+    playlists = get_spotify_playlists(sp)
+    print(f"\n{len(playlists)} Spotify playlists:")
+    for playlist in playlists:
+        print(f"  {playlist['total'] or 0:>6} tracks  {playlist['name']}  ({playlist['id']})")
+
+def save_snapshot(path):
+    """Saves or refreshes the library snapshot; only changed playlists are fetched."""
+    from spotify_api import authenticate_spotify
+    from library_snapshot import refresh_snapshot
 
-    # 2. Authenticate with YouTube
-    youtube = authenticate_youtube()
-    if not youtube:
-        print("Exiting due to YouTube authentication failure.")
+    sp = authenticate_spotify()
+    if not sp:
+        print("Exiting due to Spotify authentication failure.")
         return
+    library = refresh_snapshot(sp, path)
+    print(f"Snapshot '{path}' holds {len(library)} playlists and {library.track_count} unique tracks.")
+    library.close()
+
+def main(mode="transfer", metrics_json=None, metrics_prom=None, plan_only=False, priority=None, daily_quota=None,
+         catalog_paths=None, snapshot_path=None, offline=False, sources=None, shards=None):
+    """Main function to orchestrate the transfer.
+
+    ``sources`` picks what to transfer: "playlists", "saved" (Liked Songs)
+    and/or "top" (Top Tracks); by default only playlists. With ``shards``
+    above 1 the playlists are transferred by that many worker processes
+    sharing one quota budget (see sharding.run_sharded).
+    """
+    from spotify_api import authenticate_spotify, get_spotify_playlists, get_spotify_sources
+    from library_snapshot import load_snapshot, refresh_snapshot
+    from match_cache import MatchCache
+    from journal import TransferJournal
+    from metrics import metrics
+    from planner import plan_transfer, print_plan
+    from profiler import profiler
+    from quota import QuotaBudget
+
+    print("Starting Spotify to YouTube Music transfer script...")
+    metrics.prometheus_path = metrics_prom
+
+    # 1. Authenticate with Spotify (not needed offline, where the library snapshot is used as saved)
+    sp = None
+    if not offline:
+        sp = authenticate_spotify()
+        if not sp:
+            print("Exiting due to Spotify authentication failure.")
+            return
+
+    # 2. Authenticate with YouTube (not needed to only plan)
+    youtube = None
+    if not plan_only:
+        from youtube_api import authenticate_youtube
+        youtube = authenticate_youtube()
+        if not youtube:
+            print("Exiting due to YouTube authentication failure.")
+            return
 
-    # 3. Get Spotify Playlists
-    print("\nFetching your Spotify playlists...")
-    spotify_playlists = get_spotify_playlists(sp)
+    # 3. Get Spotify Playlists, from the library snapshot when one is used,
+    #    plus Liked Songs and Top Tracks split into playlist-sized parts
+    sources = sources or ["playlists"]
+    library = None
+    spotify_playlists = []
+    with profiler.stage("list"):
+        if "playlists" in sources:
+            if offline:
+                library = load_snapshot(snapshot_path)
+                if not library:
+                    print(f"No library snapshot at '{snapshot_path}'. Run 'python main.py snapshot' first.")
+                    return
+                print(f"\nUsing the saved library snapshot '{snapshot_path}' without contacting Spotify.")
+            elif snapshot_path:
+                print("\nChecking your Spotify playlists for changes...")
+                library = refresh_snapshot(sp, snapshot_path)
+            else:
+                print("\nFetching your Spotify playlists...")
+            spotify_playlists = library.playlists() if library else get_spotify_playlists(sp)
+        library_sources = [source for source in sources if source != "playlists"]
+        if library_sources and offline:
+            print("Liked Songs and Top Tracks are not kept in the snapshot; skipping them offline.")
+        elif library_sources:
+            spotify_playlists += get_spotify_sources(sp, library_sources)
     if not spotify_playlists:
         print("No Spotify playlists found or an error occurred.")
         return
 
-    # 4. Process each Spotify playlist
-    for sp_playlist in spotify_playlists:
-        print(f"\nProcessing Spotify playlist: '{sp_playlist['name']}'")
-
-        # 4a. Get tracks from the current Spotify playlist
-        spotify_tracks = get_spotify_playlist_tracks(sp, sp_playlist['id'])
-        if not spotify_tracks:
-            print(f"  No tracks found in Spotify playlist '{sp_playlist['name']}' or error fetching them.")
-            continue
-
-        print(f"  Found {len(spotify_tracks)} tracks in Spotify playlist '{sp_playlist['name']}'.")
-
-        # 4b. Create a corresponding playlist on YouTube Music
-        yt_playlist_id = create_youtube_playlist(youtube, sp_playlist['name'])
-        if not yt_playlist_id:
-            print(f"  Could not create YouTube playlist for '{sp_playlist['name']}'. Skipping this playlist.")
-            continue
-
-        # 4c. Search for tracks in batches
-        search_results = search_multiple_tracks_on_youtube(youtube, spotify_tracks)
-        
-        # Extract video IDs from search results
-        video_ids = [search_results.get(f"{track['name']} {track['artist']} {track['album']}")
-                    for track in spotify_tracks]
-        
-        # 4d. Bulk add tracks to the playlist
-        tracks_added_count = bulk_add_tracks_to_youtube_playlist(youtube, yt_playlist_id, video_ids)
-
-        print(f"\nFinished processing playlist '{sp_playlist['name']}'.")
-        print(f"  Added {tracks_added_count} out of {len(spotify_tracks)} tracks to YouTube playlist '{sp_playlist['name']}'.")
+    # 4. Open the on-disk match cache shared across runs and the progress journal,
+    #    and index every known match so repeated songs resolve without a search
+    #    (the pandas catalog is only loaded when there is something to index, and
+    #    plan uses the match cache alone unless catalog files are given)
+    cache = MatchCache()
+    journal = TransferJournal()
+    catalog = None
+    if catalog_paths or (not plan_only and cache.has_matches()):
+        from catalog import TrackCatalog
+        catalog = TrackCatalog.load(cache, catalog_paths)
+        print(f"Track catalog holds {len(catalog)} known matches.")
 
+    # 5. Estimate the quota cost and order the work before anything is written; a
+    #    transfer prices playlists from their totals so tracks are only fetched once,
+    #    by the pipeline, unless a priority order asks for the track-level plan
+    budget = QuotaBudget(daily_quota, journal)
+    from_totals = not plan_only and not priority
+    with profiler.stage("plan"):
+        plans = plan_transfer(sp, spotify_playlists, cache=cache, journal=journal, mode=mode,
+                              priority=priority, budget=budget, catalog=catalog, library=library,
+                              from_totals=from_totals)
+    print_plan(plans, budget, from_totals)
+    if plan_only:
+        journal.close()
+        cache.close()
+        if library:
+            library.close()
+        return
+    if mode == "transfer":
+        journal.reset()
+
+    # 6. Fetch, search and insert playlists through an overlapping pipeline,
+    #    pausing whenever the daily YouTube quota is spent; sharded runs
+    #    spread the playlists over worker processes drawing on one budget
+    shards = shards or SHARD_COUNT
+    if shards > 1:
+        from sharding import run_sharded
+        run_sharded(plans, shards, mode=mode, cache_path=cache.path, journal_path=journal.path,
+                    coordinator_path=journal.path, daily_quota=budget.daily_quota, catalog_paths=catalog_paths,
+                    snapshot_path=library.path if library else None, needs_spotify=sp is not None)
+    else:
+        import asyncio
+        from pipeline import run_pipeline
+        from rate_limiter import youtube_limiter
+
+        youtube_limiter.budget = budget
+        ordered_playlists = [plan.playlist for plan in plans]
+        asyncio.run(run_pipeline(sp, youtube, ordered_playlists, cache=cache, journal=journal, mode=mode,
+                                 catalog=catalog, library=library))
+
+    journal.close()
+    cache.close()
+    if library:
+        library.close()
+
+    # 7. Report where the run spent its time and quota
+    metrics.print_summary()
+    if metrics_json:
+        metrics.write_json(metrics_json)
+        print(f"Wrote run report to {metrics_json}")
+    if metrics_prom:
+        metrics.write_prometheus(metrics_prom)
     print("\n--- Transfer Complete ---")
 
+def build_parser():
+    """Builds the command-line parser with list, snapshot, plan, transfer and sync subcommands."""
+    parser = argparse.ArgumentParser(description="Transfer Spotify playlists to YouTube Music.")
+    # Running without a subcommand transfers, as before; --resume/--sync are kept for existing scripts.
+    legacy = parser.add_mutually_exclusive_group()
+    legacy.add_argument("--resume", dest="legacy_mode", action="store_const", const="resume", help=argparse.SUPPRESS)
+    legacy.add_argument("--sync", dest="legacy_mode", action="store_const", const="sync", help=argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    commands.add_parser("list", help="list your Spotify playlists")
+    snapshot = commands.add_parser("snapshot", help="save your Spotify library for fast and --offline runs")
+    plan = commands.add_parser("plan", help="estimate the YouTube quota cost and schedule without writing anything")
+    transfer = commands.add_parser("transfer", help="copy every Spotify playlist into a new YouTube playlist")
+    sync = commands.add_parser("sync", help="add only tracks that are new since the last run")
+
+    plan_modes = plan.add_mutually_exclusive_group()
+    plan_modes.add_argument("--resume", dest="mode", action="store_const", const="resume",
+                            help="plan continuing the last run instead of starting over")
+    plan_modes.add_argument("--sync", dest="mode", action="store_const", const="sync",
+                            help="plan a sync instead of a full transfer")
+    plan.set_defaults(mode="transfer")
+    transfer.add_argument("--resume", dest="mode", action="store_const", const="resume", default="transfer",
+                          help="continue the last run from its journal instead of starting over")
+    sync.set_defaults(mode="sync")
+
+    snapshot.add_argument("--snapshot", default=LIBRARY_SNAPSHOT_PATH, metavar="PATH",
+                          help="snapshot file (default: SONGSHIFT_SNAPSHOT or spotify_library.snap)")
+    for command in (plan, transfer, sync):
+        command.add_argument("--sources", nargs="+", choices=SPOTIFY_SOURCES, default=["playlists"], metavar="SOURCE",
+                             help="what to transfer: playlists, saved (Liked Songs) and/or top (Top Tracks); "
+                                  "Liked Songs and Top Tracks become playlists of up to SONGSHIFT_PART_SIZE "
+                                  "tracks (default: playlists)")
+        # plan reads every track, so it uses the snapshot by default; transfer and sync
+        # stream tracks from Spotify unless asked to keep a snapshot as well.
+        sources = command.add_mutually_exclusive_group()
+        sources.add_argument("--snapshot", nargs="?", const=LIBRARY_SNAPSHOT_PATH,
+                             default=LIBRARY_SNAPSHOT_PATH if command is plan else None, metavar="PATH",
+                             help="read tracks from a library snapshot, refreshing changed playlists first "
+                                  "(PATH default: SONGSHIFT_SNAPSHOT or spotify_library.snap; "
+                                  + ("used by default)" if command is plan else "off by default)"))
+        sources.add_argument("--no-snapshot", dest="snapshot", action="store_const", const=False,
+                             help="fetch every playlist from Spotify")
+        command.add_argument("--offline", action="store_true",
+                             help="use the library snapshot (--snapshot PATH or the default) as saved, "
+                                  "without contacting Spotify")
+        command.add_argument("--priority", nargs="+", metavar="PLAYLIST",
+                             help="playlist names or IDs to transfer first, in order")
+        command.add_argument("--daily-quota", type=int, metavar="UNITS",
+                             help="YouTube quota units available per day (default: SONGSHIFT_DAILY_QUOTA or 10000)")
+        command.add_argument("--catalog", dest="catalog_paths", action="append", metavar="PATH",
+                             help="CSV or Parquet file of known matches (name, artist, video_id[, duration_ms]); "
+                                  "repeatable (default: SONGSHIFT_CATALOG)")
+        command.add_argument("--profile", nargs="?", const="", metavar="DIR",
+                             help="profile each stage (listing, planning, fetch, search, matching, insert) with "
+                                  "cProfile and tracemalloc, writing the results to DIR (default: a new directory "
+                                  "under SONGSHIFT_PROFILE_DIR or songshift_profiles)")
+    for command in (transfer, sync):
+        command.add_argument("--metrics-json", default=METRICS_JSON_PATH, metavar="PATH",
+                             help="write a JSON run report with per-endpoint latency, errors and quota")
+        command.add_argument("--metrics-prom", default=METRICS_PROM_PATH, metavar="PATH",
+                             help="write a Prometheus textfile, refreshed as the run progresses")
+        command.add_argument("--shards", type=int, default=SHARD_COUNT, metavar="N",
+                             help="split the playlists over N worker processes sharing one quota budget and "
+                                  "rate limit; each logs to SONGSHIFT_SHARD_LOGS (default: SONGSHIFT_SHARDS or 1)")
+    return parser
+
+def cli(argv=None):
+    """Runs the command line interface."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "offline", False):
+        if args.snapshot is False:
+            parser.error("--offline reads the library snapshot and can't be combined with --no-snapshot")
+        args.snapshot = args.snapshot or LIBRARY_SNAPSHOT_PATH
+    if getattr(args, "profile", None) is not None:
+        from profiler import profiler
+        profiler.start(args.profile or None)
+        try:
+            run_command(args)
+        finally:
+            profiler.finish()
+    else:
+        run_command(args)
+
+def run_command(args):
+    """Runs the subcommand picked on the command line."""
+    if args.command == "list":
+        list_playlists()
+    elif args.command == "snapshot":
+        save_snapshot(args.snapshot)
+    elif args.command == "plan":
+        main(mode=args.mode, plan_only=True, priority=args.priority, daily_quota=args.daily_quota,
+             catalog_paths=args.catalog_paths or CATALOG_PATHS, snapshot_path=args.snapshot or None,
+             offline=args.offline, sources=args.sources)
+    elif args.command in ("transfer", "sync"):
+        main(mode=args.mode, metrics_json=args.metrics_json, metrics_prom=args.metrics_prom,
+             priority=args.priority, daily_quota=args.daily_quota, catalog_paths=args.catalog_paths or CATALOG_PATHS,
+             snapshot_path=args.snapshot or None, offline=args.offline, sources=args.sources, shards=args.shards)
+    else:
+        print_instructions()
+        main(mode=args.legacy_mode or "transfer", metrics_json=METRICS_JSON_PATH, metrics_prom=METRICS_PROM_PATH)
+
 if __name__ == '__main__':
-    print_instructions()
-    main() 
\ No newline at end of file
+    cli()
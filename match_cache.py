@@ -0,0 +1,231 @@
+import time
+import unicodedata
+from sqlalchemy import (
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    delete,
+    event,
+    func,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from config import (
+    MATCH_CACHE_PATH,
+    MATCH_CACHE_NEGATIVE_TTL,
+    MATCH_CACHE_MAX_AGE,
+    MATCH_CACHE_MAX_ENTRIES
+)
+from journal import enable_wal
+
+metadata = MetaData()
+
+# A NULL video_id is a negative result: the track was searched and not found.
+matches_table = Table(
+    "matches",
+    metadata,
+    Column("track_key", String, primary_key=True),
+    Column("video_id", String, nullable=True),
+    Column("updated_at", Float, nullable=False, index=True),
+)
+
+# Confirmed matches by recording. An ISRC identifies a recording across albums,
+# re-releases and spellings, so one match serves every track with that ISRC.
+isrc_table = Table(
+    "isrc_matches",
+    metadata,
+    Column("isrc", String, primary_key=True),
+    Column("video_id", String, nullable=False),
+    Column("updated_at", Float, nullable=False, index=True),
+)
+
+# The query packer's running hit rate per pack size, carried over to later runs
+# and used by the planner to price searches.
+pack_rates_table = Table(
+    "pack_hit_rates",
+    metadata,
+    Column("size", Integer, primary_key=True),
+    Column("hit_rate", Float, nullable=False),
+)
+
+
+def normalize_text(value):
+    """Normalizes a string for use in cache keys (unicode form, case and whitespace)."""
+    value = unicodedata.normalize("NFKC", value or "")
+    return " ".join(value.casefold().split())
+
+
+def normalize_isrc(isrc):
+    """Normalizes an ISRC (e.g. "us-rc1-76-07839" -> "USRC17607839"), or returns None."""
+    isrc = "".join(ch for ch in (isrc or "") if ch.isalnum()).upper()
+    return isrc or None
+
+
+def make_track_key(track):
+    """Builds the normalized (name, artist, album) cache key for a track."""
+    return "\x1f".join(
+        normalize_text(field) for field in (track.name, track.artist, track.album)
+    )
+
+
+class MatchCache:
+    """On-disk SQLite cache of track -> YouTube videoId search results.
+
+    Besides results keyed by (name, artist, album), duration-checked
+    matches are indexed by ISRC, so the same recording is resolved once even
+    when another playlist, album or user spells it differently.
+    """
+
+    def __init__(self, path=None, negative_ttl=None, max_age=None, max_entries=None):
+        self.path = path or MATCH_CACHE_PATH
+        self.negative_ttl = MATCH_CACHE_NEGATIVE_TTL if negative_ttl is None else negative_ttl
+        self.max_age = MATCH_CACHE_MAX_AGE if max_age is None else max_age
+        self.max_entries = MATCH_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.engine = create_engine(f"sqlite:///{self.path}")
+        # Shards and service workers share the cache file.
+        event.listen(self.engine, "connect", enable_wal)
+        metadata.create_all(self.engine)
+        self.evict()
+
+    def lookup(self, tracks):
+        """Splits tracks into cached results and tracks that still need a search.
+
+        Returns a tuple ``(hits, misses)`` where ``hits`` is a list of
+        ``(track, video_id)`` pairs (video_id is None for a still-valid negative
+        result) and ``misses`` is the list of tracks with no usable cache entry.
+        A track whose ISRC has a confirmed match gets that match first.
+        """
+        keyed = [(make_track_key(track), track) for track in tracks]
+        if not keyed:
+            return [], []
+
+        now = time.time()
+        found = {}
+        unique_keys = list({key for key, _ in keyed})
+        with self.engine.connect() as conn:
+            # Stay well below SQLite's bound-parameter limit.
+            for i in range(0, len(unique_keys), 500):
+                rows = conn.execute(
+                    select(matches_table.c.track_key, matches_table.c.video_id, matches_table.c.updated_at)
+                    .where(matches_table.c.track_key.in_(unique_keys[i:i + 500]))
+                )
+                for track_key, video_id, updated_at in rows:
+                    if video_id is None and now - updated_at > self.negative_ttl:
+                        continue
+                    if now - updated_at > self.max_age:
+                        continue
+                    found[track_key] = video_id
+
+        by_isrc = self.lookup_isrcs(normalize_isrc(track.isrc) for _, track in keyed if track.isrc)
+
+        hits = []
+        misses = []
+        for key, track in keyed:
+            video_id = by_isrc.get(normalize_isrc(track.isrc)) if track.isrc else None
+            if video_id:
+                hits.append((track, video_id))
+            elif key in found:
+                hits.append((track, found[key]))
+            else:
+                misses.append(track)
+        return hits, misses
+
+    def lookup_isrcs(self, isrcs):
+        """Returns ``{isrc: video_id}`` for the given normalized ISRCs with a confirmed match."""
+        unique_isrcs = list(set(isrcs))
+        found = {}
+        cutoff = time.time() - self.max_age
+        with self.engine.connect() as conn:
+            for i in range(0, len(unique_isrcs), 500):
+                rows = conn.execute(
+                    select(isrc_table.c.isrc, isrc_table.c.video_id)
+                    .where(isrc_table.c.isrc.in_(unique_isrcs[i:i + 500]))
+                    .where(isrc_table.c.updated_at >= cutoff)
+                )
+                for isrc, video_id in rows:
+                    found[isrc] = video_id
+        return found
+
+    def store_many(self, results):
+        """Stores ``(track, video_id)`` pairs; a None video_id records a negative result."""
+        now = time.time()
+        rows = {make_track_key(track): video_id for track, video_id in results}
+        if not rows:
+            return
+        stmt = sqlite_insert(matches_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[matches_table.c.track_key],
+            set_={"video_id": stmt.excluded.video_id, "updated_at": stmt.excluded.updated_at},
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt, [
+                {"track_key": key, "video_id": video_id, "updated_at": now}
+                for key, video_id in rows.items()
+            ])
+
+    def index_isrcs(self, matches):
+        """Indexes ``(track, video_id)`` matches by the tracks' ISRCs.
+
+        An ISRC match is reused for every later track of that recording, so
+        only matches whose video duration was checked against the track belong
+        here, not catalog joins or unverified guesses.
+        """
+        now = time.time()
+        rows = {normalize_isrc(track.isrc): video_id for track, video_id in matches if video_id and track.isrc}
+        if not rows:
+            return
+        stmt = sqlite_insert(isrc_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[isrc_table.c.isrc],
+            set_={"video_id": stmt.excluded.video_id, "updated_at": stmt.excluded.updated_at},
+        )
+        with self.engine.begin() as conn:
+            conn.execute(stmt, [{"isrc": isrc, "video_id": video_id, "updated_at": now}
+                                for isrc, video_id in rows.items()])
+
+    def has_matches(self):
+        """Returns True if the cache holds at least one positive match."""
+        with self.engine.connect() as conn:
+            row = conn.execute(select(matches_table.c.track_key)
+                               .where(matches_table.c.video_id.is_not(None)).limit(1)).first()
+        return row is not None
+
+    def get_pack_hit_rates(self):
+        """Returns the query packer's ``{pack size: hit rate}`` saved by earlier runs."""
+        with self.engine.connect() as conn:
+            return dict(conn.execute(select(pack_rates_table.c.size, pack_rates_table.c.hit_rate)).all())
+
+    def store_pack_hit_rates(self, hit_rates):
+        """Saves the query packer's hit rate per pack size for later runs."""
+        if not hit_rates:
+            return
+        stmt = sqlite_insert(pack_rates_table)
+        stmt = stmt.on_conflict_do_update(index_elements=[pack_rates_table.c.size],
+                                          set_={"hit_rate": stmt.excluded.hit_rate})
+        with self.engine.begin() as conn:
+            conn.execute(stmt, [{"size": size, "hit_rate": rate} for size, rate in hit_rates.items()])
+
+    def evict(self):
+        """Drops entries older than max_age and trims each index to max_entries."""
+        cutoff = time.time() - self.max_age
+        with self.engine.begin() as conn:
+            for table, key_column in ((matches_table, matches_table.c.track_key), (isrc_table, isrc_table.c.isrc)):
+                conn.execute(delete(table).where(table.c.updated_at < cutoff))
+                count = conn.execute(select(func.count()).select_from(table)).scalar()
+                excess = count - self.max_entries
+                if excess > 0:
+                    oldest = (
+                        select(key_column)
+                        .order_by(table.c.updated_at)
+                        .limit(excess)
+                    )
+                    conn.execute(delete(table).where(key_column.in_(oldest)))
+
+    def close(self):
+        """Evicts stale entries and releases the database connection pool."""
+        self.evict()
+        self.engine.dispose()
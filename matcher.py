@@ -0,0 +1,41 @@
+import re
+import unicodedata
+
+# Bracketed qualifiers like "(Remastered 2011)", "[Official Video]" or "(feat. X)".
+_BRACKETED = re.compile(r"[\(\[\{][^\)\]\}]*[\)\]\}]")
+# Unbracketed featured-artist credits, up to the next separator.
+_FEATURING = re.compile(r"\b(?:feat|ft|featuring)\b\.?[^\-\|\(\[]*")
+# Trailing " - Remastered 2011", " - Live", " - Radio Edit" style suffixes.
+_DASH_SUFFIX = re.compile(
+    r"\s[-–—]\s(?:\d{4}\s)?(?:remaster(?:ed)?|live|radio edit|single version|"
+    r"mono|stereo|bonus track|acoustic)\b.*$"
+)
+# Auto-generated YouTube Music channels are named "<Artist> - Topic".
+_TOPIC_SUFFIX = re.compile(r"\s*-\s*topic\s*$")
+_TOKEN = re.compile(r"\w+")
+
+# Removed in this order by clean_title.
+TITLE_NOISE = (_BRACKETED, _DASH_SUFFIX, _FEATURING, _TOPIC_SUFFIX)
+# Removed, vectorized, from catalog join keys, which keep version qualifiers
+# like "(Live)" or "- Remix" so different recordings of a song don't join.
+CREDIT_NOISE = (_FEATURING,)
+
+
+def _fold(text):
+    """Casefolds text and strips accents so 'Beyoncé' and 'beyonce' compare equal."""
+    text = unicodedata.normalize("NFKD", (text or "").casefold())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def clean_title(text):
+    """Removes featuring credits, bracketed qualifiers and remaster/live suffixes."""
+    text = _fold(text)
+    for pattern in TITLE_NOISE:
+        text = pattern.sub(" ", text)
+    return text
+
+
+def tokenize(text):
+    """Returns the set of normalized word tokens in a track, artist or video title."""
+    return frozenset(_TOKEN.findall(clean_title(text)))
+
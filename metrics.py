@@ -0,0 +1,266 @@
+import bisect
+import json
+import os
+import threading
+import time
+from config import METRICS_LATENCY_BUCKETS
+
+
+class _EndpointStats:
+    """Counters and a latency histogram for one service endpoint."""
+
+    def __init__(self, buckets):
+        self.calls = 0
+        self.errors = {}  # HTTP status (or exception name) -> count
+        self.retries = 0
+        self.quota_units = 0
+        self.latency_sum = 0.0
+        self.latency_counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.wait_seconds = 0.0
+
+    def as_dict(self, buckets):
+        cumulative = []
+        total = 0
+        for bound, count in zip(list(buckets) + ["+Inf"], self.latency_counts):
+            total += count
+            cumulative.append([bound, total])
+        return {
+            "calls": self.calls,
+            "errors": dict(self.errors),
+            "retries": self.retries,
+            "quota_units": self.quota_units,
+            "latency_seconds_sum": round(self.latency_sum, 6),
+            "latency_seconds_avg": round(self.latency_sum / self.calls, 6) if self.calls else None,
+            "latency_seconds_buckets": cumulative,
+            "rate_limit_wait_seconds": round(self.wait_seconds, 6),
+        }
+
+
+class Metrics:
+    """Per-endpoint call counts, latency histograms, retries, errors and quota for a run.
+
+    RateLimiter.call records every request attempt here, so anything sent
+    through youtube_limiter or spotify_limiter is measured. Progress is
+    tracked in playlist entries, giving a throughput-based ETA. The report
+    can be written as JSON and as a Prometheus textfile; if
+    ``prometheus_path`` is set the textfile is also refreshed on every
+    progress update.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or METRICS_LATENCY_BUCKETS)
+        self.prometheus_path = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self.started = time.time()
+            self._progress_started = None
+            self.total_tracks = 0
+            self.done_tracks = 0
+
+    def _stats(self, service, endpoint):
+        key = (service, endpoint)
+        if key not in self._endpoints:
+            self._endpoints[key] = _EndpointStats(self.buckets)
+        return self._endpoints[key]
+
+    def record_call(self, service, endpoint, seconds, error=None, quota_units=0):
+        """Records one request attempt, its latency and the quota it was charged."""
+        with self._lock:
+            stats = self._stats(service, endpoint)
+            stats.calls += 1
+            stats.quota_units += quota_units
+            stats.latency_sum += seconds
+            stats.latency_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+
+    def record_error(self, service, endpoint, error, count=1):
+        """Records failures that did not come from a whole request, e.g. batch sub-requests."""
+        with self._lock:
+            stats = self._stats(service, endpoint)
+            stats.errors[error] = stats.errors.get(error, 0) + count
+
+    def record_retry(self, service, endpoint, count=1):
+        with self._lock:
+            self._stats(service, endpoint).retries += count
+
+    def record_wait(self, service, endpoint, seconds):
+        """Records time spent waiting on the rate limiter before a request."""
+        with self._lock:
+            self._stats(service, endpoint).wait_seconds += seconds
+
+    def merge(self, report):
+        """Adds the counters and progress of another run's report, e.g. a shard process's, to these."""
+        with self._lock:
+            for name, data in report["endpoints"].items():
+                service, endpoint = name.split(".", 1)
+                stats = self._stats(service, endpoint)
+                stats.calls += data["calls"]
+                for error, count in data["errors"].items():
+                    stats.errors[error] = stats.errors.get(error, 0) + count
+                stats.retries += data["retries"]
+                stats.quota_units += data["quota_units"]
+                stats.latency_sum += data["latency_seconds_sum"]
+                stats.wait_seconds += data["rate_limit_wait_seconds"]
+                previous = 0
+                for index, (_, cumulative) in enumerate(data["latency_seconds_buckets"]):
+                    stats.latency_counts[index] += cumulative - previous
+                    previous = cumulative
+            self.done_tracks += report["tracks_done"]
+            self.total_tracks += report["tracks_total"]
+
+    def quota_used(self, service="youtube"):
+        with self._lock:
+            return sum(stats.quota_units for (name, _), stats in self._endpoints.items() if name == service)
+
+    def start_progress(self, total_tracks):
+        """Starts progress tracking for a run over total_tracks playlist entries."""
+        with self._lock:
+            self._progress_started = time.monotonic()
+            self.total_tracks = total_tracks
+            self.done_tracks = 0
+
+    def skip_progress(self, tracks):
+        """Removes tracks that will not be processed (e.g. skipped playlists) from the total."""
+        with self._lock:
+            self.total_tracks = max(self.done_tracks, self.total_tracks - tracks)
+
+    def advance(self, tracks):
+        with self._lock:
+            self.done_tracks += tracks
+            self.total_tracks = max(self.total_tracks, self.done_tracks)
+        if self.prometheus_path:
+            self.write_prometheus(self.prometheus_path)
+
+    def progress(self):
+        """Returns ``(done, total, tracks_per_sec, eta_seconds)``; rate and ETA are None until measurable."""
+        with self._lock:
+            done, total = self.done_tracks, self.total_tracks
+            elapsed = time.monotonic() - self._progress_started if self._progress_started else 0
+        rate = done / elapsed if done and elapsed > 0 else None
+        eta = (total - done) / rate if rate else None
+        return done, total, rate, eta
+
+    def progress_line(self):
+        done, total, rate, eta = self.progress()
+        line = f"Progress: {done}/{total} tracks"
+        if total:
+            line += f" ({100.0 * done / total:.0f}%)"
+        if rate:
+            line += f", {rate:.1f} tracks/s, ETA {_format_duration(eta)}"
+        return line + f", {self.quota_used()} YouTube quota units used"
+
+    def report(self):
+        """Returns the run report as a JSON-serializable dict."""
+        done, total, rate, eta = self.progress()
+        with self._lock:
+            endpoints = {
+                f"{service}.{endpoint}": stats.as_dict(self.buckets)
+                for (service, endpoint), stats in sorted(self._endpoints.items())
+            }
+        return {
+            "started": self.started,
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "tracks_done": done,
+            "tracks_total": total,
+            "tracks_per_sec": round(rate, 3) if rate else None,
+            "youtube_quota_units": self.quota_used("youtube"),
+            "endpoints": endpoints,
+        }
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.report(), indent=2))
+
+    def prometheus_text(self):
+        """Renders the counters in the Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(self._endpoints.items())
+            lines = [
+                "# HELP songshift_api_calls_total API request attempts.",
+                "# TYPE songshift_api_calls_total counter",
+            ]
+            lines += [f'songshift_api_calls_total{_labels(s, e)} {st.calls}' for (s, e), st in items]
+            lines += [
+                "# HELP songshift_api_retries_total API requests retried.",
+                "# TYPE songshift_api_retries_total counter",
+            ]
+            lines += [f'songshift_api_retries_total{_labels(s, e)} {st.retries}' for (s, e), st in items]
+            lines += [
+                "# HELP songshift_api_errors_total API request failures by status.",
+                "# TYPE songshift_api_errors_total counter",
+            ]
+            for (s, e), st in items:
+                lines += [f'songshift_api_errors_total{_labels(s, e, status=code)} {count}'
+                          for code, count in sorted(st.errors.items(), key=str)]
+            lines += [
+                "# HELP songshift_quota_units_total YouTube Data API quota units charged.",
+                "# TYPE songshift_quota_units_total counter",
+            ]
+            lines += [f'songshift_quota_units_total{_labels(s, e)} {st.quota_units}' for (s, e), st in items]
+            lines += [
+                "# HELP songshift_rate_limit_wait_seconds_total Time spent waiting on the rate limiter.",
+                "# TYPE songshift_rate_limit_wait_seconds_total counter",
+            ]
+            lines += [f'songshift_rate_limit_wait_seconds_total{_labels(s, e)} {st.wait_seconds:.6f}'
+                      for (s, e), st in items]
+            lines += [
+                "# HELP songshift_api_latency_seconds API request latency.",
+                "# TYPE songshift_api_latency_seconds histogram",
+            ]
+            for (s, e), st in items:
+                cumulative = 0
+                for bound, count in zip(list(self.buckets) + ["+Inf"], st.latency_counts):
+                    cumulative += count
+                    lines.append(f'songshift_api_latency_seconds_bucket{_labels(s, e, le=bound)} {cumulative}')
+                lines.append(f'songshift_api_latency_seconds_sum{_labels(s, e)} {st.latency_sum:.6f}')
+                lines.append(f'songshift_api_latency_seconds_count{_labels(s, e)} {st.calls}')
+        done, total, rate, _ = self.progress()
+        lines += [
+            "# HELP songshift_tracks_done Playlist entries processed.",
+            "# TYPE songshift_tracks_done gauge",
+            f"songshift_tracks_done {done}",
+            "# HELP songshift_tracks_total Playlist entries in the run.",
+            "# TYPE songshift_tracks_total gauge",
+            f"songshift_tracks_total {total}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes a textfile for node_exporter's textfile collector."""
+        _write_atomic(path, self.prometheus_text())
+
+    def print_summary(self):
+        report = self.report()
+        print(f"\nAPI usage ({report['elapsed_seconds']:.0f}s, {report['youtube_quota_units']} YouTube quota units):")
+        for name, stats in report["endpoints"].items():
+            errors = sum(stats["errors"].values())
+            avg = stats["latency_seconds_avg"]
+            print(f"  {name}: {stats['calls']} calls, {errors} errors, {stats['retries']} retries, "
+                  f"avg {avg * 1000 if avg else 0:.0f} ms, {stats['quota_units']} quota units")
+
+
+def _labels(service, endpoint, **extra):
+    pairs = [("service", service), ("endpoint", endpoint)] + [(k, v) for k, v in extra.items()]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def _write_atomic(path, text):
+    """Writes via a temporary file so readers never see a partial report."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+metrics = Metrics()
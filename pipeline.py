@@ -0,0 +1,245 @@
+import asyncio
+from collections import Counter
+from itertools import islice
+from config import PIPELINE_QUEUE_SIZE, PIPELINE_CHUNK_SIZE
+from spotify_api import stream_tracks
+from resolver import TrackResolver
+from journal import is_up_to_date
+from metrics import metrics
+from profiler import profiler
+from youtube_api import (
+    create_youtube_playlist,
+    count_youtube_playlist_videos,
+    get_youtube_playlist_video_ids,
+    bulk_add_tracks_to_youtube_playlist,
+    search_executor
+)
+
+# Sentinel passed down the queues once a stage has no more work.
+_DONE = None
+
+
+class _PlaylistJob:
+    """Per-playlist state carried alongside its track chunks through the pipeline."""
+
+    def __init__(self, sp_playlist):
+        self.sp_playlist = sp_playlist
+        self.yt_playlist_id = None
+        self.known = {}  # Track.key -> video_id journaled on a previous run
+        self.inserted = set()  # Positions confirmed inserted on a previous run
+        self.existing = None  # Sync mode: videoIds already in the YouTube playlist
+        self.unjournaled = Counter()  # Resume: videos in the YouTube playlist whose insert was never journaled
+        self.track_count = 0
+        self.expected = 0
+        self.added = 0
+
+    @property
+    def id(self):
+        return self.sp_playlist['id']
+
+    @property
+    def name(self):
+        return self.sp_playlist['name']
+
+
+def _next_chunk(tracks, size):
+    """Pulls the next chunk of up to size tracks from a track stream."""
+    with profiler.stage("fetch"):
+        return list(islice(tracks, size))
+
+
+def _start_playlist(youtube, journal, mode, job):
+    """Creates (or, when resuming or syncing, reuses) the YouTube playlist for a job.
+
+    Returns False if no YouTube playlist could be created, or if the mapped
+    one could not be listed; the journal's mapping is then kept for the next run.
+    """
+    state = journal.get_playlist(job.id) if journal and mode != "transfer" else None
+    try:
+        if state and mode == "sync":
+            job.existing = get_youtube_playlist_video_ids(youtube, state['youtube_playlist_id'])
+            if job.existing is None:
+                print(f"  Mapped YouTube playlist for '{job.name}' no longer exists; creating a new one.")
+                state = None
+
+        if state:
+            job.known = journal.get_matches(job.id)
+            if job.existing is None:
+                inserts = journal.get_inserts(job.id)
+                job.inserted = set(inserts)
+                # A crash after a batch insert but before it was journaled leaves videos the journal doesn't know.
+                present = count_youtube_playlist_videos(youtube, state['youtube_playlist_id'])
+                if present is not None:
+                    job.unjournaled = present - Counter(inserts.values())
+    except Exception:
+        print(f"  Could not list the mapped YouTube playlist for '{job.name}'; leaving it for the next run.")
+        return False
+
+    if state:
+        job.yt_playlist_id = state['youtube_playlist_id']
+        print(f"  Continuing into existing YouTube playlist '{job.name}' (ID: {job.yt_playlist_id}).")
+        return True
+
+    job.yt_playlist_id = create_youtube_playlist(youtube, job.name)
+    if not job.yt_playlist_id:
+        return False
+    if journal:
+        journal.record_playlist(job.id, job.name, job.yt_playlist_id)
+    return True
+
+
+def _resolve_chunk(resolver, journal, job, offset, tracks):
+    """Resolves video IDs for one chunk of a playlist's tracks.
+
+    Returns one entry per track; tracks that are unmatched, already inserted
+    on a previous run or, in sync mode, already in the YouTube playlist are None.
+    """
+    pending = [track for track in tracks if track.key not in job.known]
+    search_results = resolver.resolve(pending)
+    if journal:
+        journal.record_matches(job.id, search_results.items())
+    job.known.update(search_results)
+
+    video_ids = []
+    recovered = []
+    for position, track in enumerate(tracks, start=offset):
+        video_id = job.known.get(track.key)
+        if position in job.inserted:
+            video_id = None
+        elif job.existing is not None:
+            # Sync: only insert videos the YouTube playlist doesn't have yet, each once.
+            if video_id in job.existing:
+                video_id = None
+            elif video_id:
+                job.existing.add(video_id)
+        elif video_id and job.unjournaled[video_id] > 0:
+            # Resume: inserted before a crash, but never journaled.
+            job.unjournaled[video_id] -= 1
+            recovered.append((position, video_id))
+            video_id = None
+        video_ids.append(video_id)
+    if journal and recovered:
+        journal.record_inserts(job.id, recovered)
+
+    job.track_count = offset + len(tracks)
+    job.expected += sum(1 for video_id in video_ids if video_id)
+    return video_ids
+
+
+def _insert_chunk(youtube, journal, progress, job, offset, video_ids):
+    """Inserts one chunk of resolved videos, journaling each confirmed position."""
+    on_added = None
+    if journal:
+        def on_added(inserted):
+            journal.record_inserts(job.id, [(offset + index, video_id) for index, video_id in inserted])
+
+    with profiler.stage("insert"):
+        job.added += bulk_add_tracks_to_youtube_playlist(
+            youtube, job.yt_playlist_id, video_ids, on_added=on_added)
+    progress.advance(len(video_ids))
+    print(f"  {progress.progress_line()}")
+
+
+def _finish_playlist(journal, job):
+    """Marks a playlist completed once every resolved video was inserted."""
+    if journal and job.added >= job.expected:
+        journal.mark_completed(job.id, job.sp_playlist.get('snapshot_id'))
+
+    print(f"\nFinished processing playlist '{job.name}'.")
+    print(f"  Added {job.added} out of {job.track_count} tracks to YouTube playlist '{job.name}'.")
+
+
+async def _fetch_stage(sp, playlists, journal, mode, progress, out_queue, chunk_size, library):
+    """Streams each playlist's tracks from Spotify, or the library snapshot, to the search stage in chunks.
+
+    Liked Songs and Top Tracks parts are streamed page by page like playlists.
+    """
+    for sp_playlist in playlists:
+        if journal and mode != "transfer":
+            state = await asyncio.to_thread(journal.get_playlist, sp_playlist['id'])
+            if is_up_to_date(state, mode, sp_playlist):
+                reason = "unchanged since last sync" if mode == "sync" else "already transferred"
+                print(f"\nSkipping Spotify playlist '{sp_playlist['name']}': {reason}.")
+                progress.skip_progress(sp_playlist.get('total') or 0)
+                continue
+
+        print(f"\nFetching Spotify playlist: '{sp_playlist['name']}'")
+        job = _PlaylistJob(sp_playlist)
+        if library and sp_playlist['id'] in library:
+            tracks = library.playlist_tracks(sp_playlist['id'])
+        else:
+            tracks = stream_tracks(sp, sp_playlist)
+        offset = 0
+        while chunk := await asyncio.to_thread(_next_chunk, tracks, chunk_size):
+            await out_queue.put((job, offset, chunk))
+            offset += len(chunk)
+
+        if not offset:
+            print(f"  No tracks found in Spotify playlist '{sp_playlist['name']}' or error fetching them.")
+            continue
+        print(f"  Fetched all {offset} tracks of Spotify playlist '{sp_playlist['name']}'.")
+        await out_queue.put((job, None, None))
+    await out_queue.put(_DONE)
+
+
+async def _search_stage(youtube, resolver, journal, mode, progress, in_queue, out_queue):
+    """Creates each YouTube playlist and resolves video IDs chunk by chunk."""
+    while (item := await in_queue.get()) is not _DONE:
+        job, offset, tracks = item
+        if offset == 0:
+            started = await asyncio.to_thread(_start_playlist, youtube, journal, mode, job)
+            if not started:
+                print(f"  No YouTube playlist to transfer '{job.name}' into. Skipping this playlist.")
+                progress.skip_progress(job.sp_playlist.get('total') or 0)
+        if not job.yt_playlist_id:
+            continue
+
+        if offset is None:
+            await out_queue.put(item)
+            continue
+
+        video_ids = await asyncio.to_thread(_resolve_chunk, resolver, journal, job, offset, tracks)
+        await out_queue.put((job, offset, video_ids))
+    await out_queue.put(_DONE)
+
+
+async def _insert_stage(youtube, journal, progress, in_queue):
+    """Bulk inserts resolved videos into their YouTube playlists chunk by chunk."""
+    while (item := await in_queue.get()) is not _DONE:
+        job, offset, video_ids = item
+        if offset is None:
+            await asyncio.to_thread(_finish_playlist, journal, job)
+            continue
+
+        await asyncio.to_thread(_insert_chunk, youtube, journal, progress, job, offset, video_ids)
+
+
+async def run_pipeline(sp, youtube, playlists, cache=None, journal=None, mode="transfer",
+                       queue_size=None, chunk_size=None, progress=None, catalog=None, library=None):
+    """Transfers playlists through overlapping fetch, search and insert stages.
+
+    ``mode`` is "transfer" (new YouTube playlists), "resume" (continue from
+    the journal) or "sync" (only playlists whose snapshot_id changed, only
+    videos missing from the mapped playlist). Tracks are read from
+    ``library``, a LibrarySnapshot, when it holds the playlist. Progress
+    goes to ``progress``, by default the run metrics.
+    """
+    queue_size = queue_size or PIPELINE_QUEUE_SIZE
+    chunk_size = chunk_size or PIPELINE_CHUNK_SIZE
+    fetched = asyncio.Queue(maxsize=queue_size)
+    resolved = asyncio.Queue(maxsize=queue_size)
+    progress = progress or metrics
+    progress.start_progress(sum(playlist.get('total') or 0 for playlist in playlists))
+
+    with search_executor() as executor:
+        resolver = TrackResolver(youtube, cache=cache, catalog=catalog, executor=executor)
+        await asyncio.gather(
+            _fetch_stage(sp, playlists, journal, mode, progress, fetched, chunk_size, library),
+            _search_stage(youtube, resolver, journal, mode, progress, fetched, resolved),
+            _insert_stage(youtube, journal, progress, resolved),
+        )
+    if cache:
+        cache.store_pack_hit_rates(resolver.packer.hit_rates)
+    if resolver.requested:
+        print(f"\nResolved {resolver.unique_count} unique tracks for {resolver.requested} playlist entries"
+              f" ({resolver.isrc_hits} by ISRC, {resolver.catalog_hits} from the catalog).")
@@ -0,0 +1,205 @@
+import math
+from itertools import islice
+from config import (
+    SEARCH_FALLBACK_PACK_SIZE,
+    UPLOAD_BATCH_SIZE,
+    YOUTUBE_QUOTA_COSTS,
+    PLAN_MATCH_RATE,
+    PIPELINE_CHUNK_SIZE,
+    YOUTUBE_PAGE_SIZE
+)
+from spotify_api import stream_tracks
+from profiler import profiler
+from journal import is_up_to_date
+from query_packer import QueryPacker
+
+
+class PlaylistPlan:
+    """Estimated YouTube quota cost of transferring one playlist."""
+
+    def __init__(self, playlist):
+        self.playlist = playlist
+        self.skipped = False
+        self.tracks = 0
+        self.new_searches = 0  # Unique tracks neither cached nor seen earlier in the plan
+        self.queries = 0  # Expected search queries for them, first-pass and fallback
+        self.cached = 0  # Entries the match cache or catalog already resolves (found or not found)
+        self.repeats = 0  # Entries of tracks already planned in an earlier playlist
+        self.inserts = 0.0  # Expected inserts; uncached tracks count at PLAN_MATCH_RATE
+        self.creates_playlist = True
+        self.listed = None  # Videos already in the YouTube playlist, listed on sync and resume
+        self.first_day = 0
+        self.last_day = 0
+
+    @property
+    def name(self):
+        return self.playlist['name']
+
+    @property
+    def search_units(self):
+        # Every search is followed by one videos.list duration check.
+        return self.queries * (YOUTUBE_QUOTA_COSTS["search.list"] + YOUTUBE_QUOTA_COSTS["videos.list"])
+
+    @property
+    def list_units(self):
+        if self.listed is None:
+            return 0
+        pages = max(1, math.ceil(self.listed / YOUTUBE_PAGE_SIZE))
+        return pages * YOUTUBE_QUOTA_COSTS["playlistItems.list"]
+
+    @property
+    def insert_units(self):
+        return math.ceil(self.inserts) * YOUTUBE_QUOTA_COSTS["playlistItems.insert"]
+
+    @property
+    def cost(self):
+        create_units = YOUTUBE_QUOTA_COSTS["playlists.insert"] if self.creates_playlist else 0
+        return self.search_units + self.list_units + self.insert_units + create_units
+
+
+def order_playlists(playlists, priority=None):
+    """Orders playlists by a user-given priority list of names or IDs; the rest keep their order."""
+    rank = {value: index for index, value in enumerate(priority or [])}
+
+    def key(playlist):
+        return min(rank.get(playlist['id'], len(rank)), rank.get(playlist['name'], len(rank)))
+
+    return sorted(playlists, key=key)
+
+
+def _add_queries(plan, searches, packer, fallback_size):
+    """Adds the queries the pipeline sends for one chunk's new tracks, which it searches together."""
+    if searches:
+        plan.queries += sum(packer.expected_queries(searches, fallback_size, PLAN_MATCH_RATE))
+
+
+def _plan_playlist(sp, plan, cache, seen, packer, fallback_size, catalog=None, library=None):
+    """Fills in a plan's counts from the playlist's tracks, the match cache and the catalog.
+
+    ``seen`` maps every Track.key planned so far to True (matched), False
+    (known miss) or None (still to be searched), so a track repeated across
+    playlists is only searched once, as the pipeline's TrackResolver does.
+    """
+    if library and plan.playlist['id'] in library:
+        tracks = library.playlist_tracks(plan.playlist['id'])
+    else:
+        tracks = stream_tracks(sp, plan.playlist)
+    while True:
+        with profiler.stage("fetch"):
+            chunk = list(islice(tracks, PIPELINE_CHUNK_SIZE))
+        if not chunk:
+            break
+        plan.tracks += len(chunk)
+        fresh = []
+        for track in chunk:
+            if track.key in seen:
+                plan.repeats += 1
+                outcome = seen[track.key]
+                plan.inserts += PLAN_MATCH_RATE if outcome is None else float(outcome)
+            else:
+                fresh.append(track)
+
+        hits, misses = cache.lookup(fresh) if cache else ([], fresh)
+        if catalog and misses:
+            matches = catalog.match(misses)
+            hits += [(track, matches[track.key]) for track in misses if track.key in matches]
+            misses = [track for track in misses if track.key not in matches]
+        for track, video_id in hits:
+            plan.cached += 1
+            seen[track.key] = bool(video_id)
+            plan.inserts += 1.0 if video_id else 0.0
+        searches = 0
+        for track in misses:
+            if track.key in seen:
+                # Repeated within this chunk.
+                plan.repeats += 1
+            else:
+                searches += 1
+                seen[track.key] = None
+            plan.inserts += PLAN_MATCH_RATE
+        plan.new_searches += searches
+        _add_queries(plan, searches, packer, fallback_size)
+
+
+def _estimate_playlist(plan, packer, fallback_size):
+    """Fills in a plan from the playlist's track total alone, treating every track as a new search."""
+    plan.tracks = plan.playlist.get('total') or 0
+    plan.new_searches = plan.tracks
+    plan.inserts = plan.tracks * PLAN_MATCH_RATE
+    for start in range(0, plan.tracks, PIPELINE_CHUNK_SIZE):
+        _add_queries(plan, min(PIPELINE_CHUNK_SIZE, plan.tracks - start), packer, fallback_size)
+
+
+def plan_transfer(sp, playlists, cache=None, journal=None, mode="transfer", priority=None, budget=None,
+                  catalog=None, library=None, from_totals=False, packer=None, fallback_size=None):
+    """Estimates the quota cost of a transfer before anything is written.
+
+    Reads every playlist's tracks from Spotify or the LibrarySnapshot (no
+    YouTube quota) and checks them against the match cache and optional
+    TrackCatalog. Searches are priced per pipeline chunk at the pack size
+    and hit rate of ``packer`` (by default one primed with the rates the
+    match cache saved from earlier runs), plus fallback queries of
+    ``fallback_size`` tracks for its expected misses; inserts are priced
+    per video. With ``from_totals`` no tracks are read and every playlist is
+    priced from its total as if none of its tracks were known, an upper
+    bound that costs no Spotify calls. Playlists are ordered by ``priority``
+    and, given a QuotaBudget, assigned to the quota days they are expected
+    to run in. Returns a list of PlaylistPlan in transfer order.
+    """
+    if packer is None:
+        packer = QueryPacker(hit_rates=cache.get_pack_hit_rates() if cache else None)
+    fallback_size = SEARCH_FALLBACK_PACK_SIZE if fallback_size is None else fallback_size
+    seen = {}
+    plans = []
+    for playlist in order_playlists(playlists, priority):
+        plan = PlaylistPlan(playlist)
+        plans.append(plan)
+        state = journal.get_playlist(playlist['id']) if journal and mode != "transfer" else None
+        if is_up_to_date(state, mode, playlist):
+            plan.skipped = True
+            plan.creates_playlist = False
+            continue
+        plan.creates_playlist = state is None
+        if from_totals:
+            _estimate_playlist(plan, packer, fallback_size)
+        else:
+            _plan_playlist(sp, plan, cache, seen, packer, fallback_size, catalog, library)
+        if state:
+            # Sync and resume list the videos already in the YouTube playlist and skip them.
+            plan.listed = len(journal.get_inserted_positions(playlist['id']))
+            plan.inserts = max(0.0, plan.inserts - plan.listed)
+
+    if budget:
+        spent = budget.daily_quota - budget.remaining
+        for plan in plans:
+            plan.first_day = spent // budget.daily_quota
+            spent += plan.cost
+            plan.last_day = max(plan.first_day, (spent - 1) // budget.daily_quota)
+    return plans
+
+
+def print_plan(plans, budget=None, from_totals=False):
+    """Prints the per-playlist cost estimate and the resulting multi-day schedule."""
+    print("\nTransfer plan (estimated YouTube quota" + (", upper bound from playlist sizes):" if from_totals else "):"))
+    print(f"  {'#':>3}  {'Playlist':<32} {'Tracks':>7} {'Searches':>9} {'Inserts':>8} {'Units':>8}  Day")
+    total_units = 0
+    total_inserts = 0
+    for number, plan in enumerate(plans, start=1):
+        if plan.skipped:
+            print(f"  {number:>3}  {plan.name[:32]:<32} {'up to date, skipped':>34}")
+            continue
+        days = str(plan.first_day + 1)
+        if plan.last_day != plan.first_day:
+            days += f"-{plan.last_day + 1}"
+        print(f"  {number:>3}  {plan.name[:32]:<32} {plan.tracks:>7} {plan.new_searches:>9} "
+              f"{math.ceil(plan.inserts):>8} {plan.cost:>8}  {days}")
+        total_units += plan.cost
+        total_inserts += math.ceil(plan.inserts)
+
+    print(f"  Total: ~{total_units} units, ~{math.ceil(total_inserts / UPLOAD_BATCH_SIZE)} insert batch requests.")
+    if from_totals:
+        print("  Cached and repeated tracks are not counted out; 'python main.py plan' estimates track by track.")
+    if budget:
+        days = max((plan.last_day for plan in plans), default=0) + 1
+        print(f"  Daily quota {budget.daily_quota} units, {budget.remaining} left today: "
+              f"about {days} quota day(s). The transfer pauses at the quota and resumes after each reset.")
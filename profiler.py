@@ -0,0 +1,229 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from config import PROFILE_DIR, PROFILE_TOP_N, PROFILE_TRACEMALLOC_FRAMES
+
+# Run stages in the order they are reported.
+STAGES = ("list", "plan", "fetch", "search", "match", "insert")
+# A stage's allocation snapshot is retaken only when traced memory grew this much beyond its last one.
+_SNAPSHOT_GROWTH = 1.1
+
+
+class _StageStats:
+    """Time, memory and per-thread cProfile data collected for one stage."""
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = 0  # Most traced memory seen while the stage ran, in bytes
+        self.profiles = []  # One cProfile.Profile per thread that ran the stage
+        self.snapshot = None  # tracemalloc snapshot taken at the stage's highest memory
+        self.snapshot_size = 0
+
+
+class _Frame:
+    """One active stage on a thread's stack; paused while a nested stage runs."""
+
+    def __init__(self, name, profile):
+        self.name = name
+        self.profile = profile
+        self.resume()
+
+    def resume(self):
+        self.wall_started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+        if self.profile:
+            try:
+                self.profile.enable()
+            except ValueError:
+                # Another profiler is already active; only times and memory are kept.
+                self.profile = None
+
+    def pause(self, stats):
+        if self.profile:
+            self.profile.disable()
+        stats.wall += time.perf_counter() - self.wall_started
+        stats.cpu += time.thread_time() - self.cpu_started
+
+
+class StageProfiler:
+    """Profiles a run stage by stage: playlist listing, planning, track fetch, search, matching and insert.
+
+    Code marks its stages with ``with profiler.stage(name):``, which costs
+    nothing unless the profiler was started. Once started, every stage gets
+    its own cProfile stats, wall and CPU time, the most memory traced while
+    it ran and a tracemalloc top-N of the allocations at that point. Stages
+    run concurrently on the pipeline's and the search pool's threads, so
+    each thread profiles into its own cProfile.Profile (merged when written)
+    and times are summed over threads. Tracemalloc is process-wide: a
+    stage's peak is the highest memory seen while it was running, including
+    what stages running alongside it held. A nested stage pauses the one it
+    runs in, so each stage's figures exclude it.
+
+    Deterministic profiling and allocation tracing slow a run down several
+    times, so compare profiled runs with each other rather than with
+    unprofiled ones.
+    """
+
+    def __init__(self):
+        self.run_dir = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+        self._active = {}  # Stage name -> number of threads running it
+        self._started_tracemalloc = False
+
+    @property
+    def enabled(self):
+        return self.run_dir is not None
+
+    def start(self, run_dir=None, top_n=None):
+        """Starts profiling; results are written to ``run_dir`` (by default a new directory under PROFILE_DIR)."""
+        self.run_dir = run_dir or os.path.join(PROFILE_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        self.top_n = top_n or PROFILE_TOP_N
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._stats = {}
+        self._active = {}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        print(f"Profiling stages to '{self.run_dir}'.")
+
+    def _stage_stats(self, name):
+        if name not in self._stats:
+            self._stats[name] = _StageStats()
+        return self._stats[name]
+
+    def _record_memory(self, name=None):
+        """Credits the memory peak since the last stage boundary to every stage running, then resets it.
+
+        Called with the lock held. If ``name`` is given and memory grew well
+        beyond that stage's last snapshot, a new snapshot is taken for it.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        for active in self._active:
+            stats = self._stage_stats(active)
+            stats.peak = max(stats.peak, peak)
+        tracemalloc.reset_peak()
+        if name:
+            stats = self._stage_stats(name)
+            if current > stats.snapshot_size * _SNAPSHOT_GROWTH:
+                stats.snapshot = tracemalloc.take_snapshot()
+                stats.snapshot_size = current
+
+    def _profile_for(self, name):
+        """This thread's cProfile.Profile for a stage, created on first use."""
+        profiles = getattr(self._local, "profiles", None)
+        if profiles is None:
+            profiles = self._local.profiles = {}
+        if name not in profiles:
+            profiles[name] = cProfile.Profile()
+            with self._lock:
+                self._stage_stats(name).profiles.append(profiles[name])
+        return profiles[name]
+
+    @contextmanager
+    def stage(self, name):
+        """Attributes the time, calls and memory of the enclosed block to a stage."""
+        if not self.enabled:
+            yield
+            return
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        with self._lock:
+            self._record_memory()
+            self._active[name] = self._active.get(name, 0) + 1
+            self._stage_stats(name).calls += 1
+            outer_stats = self._stage_stats(stack[-1].name) if stack else None
+        if stack:
+            stack[-1].pause(outer_stats)
+        frame = _Frame(name, self._profile_for(name))
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            with self._lock:
+                stats = self._stage_stats(name)
+            frame.pause(stats)
+            with self._lock:
+                self._record_memory(name)
+                self._active[name] -= 1
+                if not self._active[name]:
+                    del self._active[name]
+            if stack:
+                stack[-1].resume()
+
+    def summary_rows(self):
+        """Returns one dict per profiled stage, in STAGES order."""
+        names = [name for name in STAGES if name in self._stats]
+        names += sorted(name for name in self._stats if name not in STAGES)
+        return [{
+            "stage": name,
+            "calls": self._stats[name].calls,
+            "wall_seconds": round(self._stats[name].wall, 3),
+            "cpu_seconds": round(self._stats[name].cpu, 3),
+            "peak_traced_mb": round(self._stats[name].peak / 2 ** 20, 1),
+        } for name in names]
+
+    def finish(self):
+        """Writes each stage's cProfile stats and allocation top-N plus a summary, and stops profiling.
+
+        For every stage the run directory gets ``<stage>.prof`` (load it with
+        pstats or snakeviz) and ``<stage>.memory.txt``; ``summary.json`` and
+        ``summary.txt`` hold the table printed here.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._record_memory()
+        for name, stats in self._stats.items():
+            profiles = [profile for profile in stats.profiles if profile.getstats()]
+            if profiles:
+                merged = pstats.Stats(*profiles)
+                merged.dump_stats(os.path.join(self.run_dir, f"{name}.prof"))
+            if stats.snapshot:
+                self._write_top_allocations(name, stats)
+
+        rows = self.summary_rows()
+        lines = [f"{'stage':<8} {'calls':>7} {'wall s':>9} {'cpu s':>9} {'peak MB':>9}"]
+        for row in rows:
+            lines.append(f"{row['stage']:<8} {row['calls']:>7} {row['wall_seconds']:>9.2f} "
+                         f"{row['cpu_seconds']:>9.2f} {row['peak_traced_mb']:>9.1f}")
+        table = "\n".join(lines)
+        with open(os.path.join(self.run_dir, "summary.txt"), "w") as f:
+            f.write(table + "\n")
+        with open(os.path.join(self.run_dir, "summary.json"), "w") as f:
+            json.dump({"stages": rows}, f, indent=2)
+
+        print("\n--- Stage Profile (times summed over threads) ---")
+        print(table)
+        print(f"Wrote stage profiles to '{self.run_dir}'.")
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self.run_dir = None
+
+    def _write_top_allocations(self, name, stats):
+        snapshot = stats.snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+        with open(os.path.join(self.run_dir, f"{name}.memory.txt"), "w") as f:
+            f.write(f"Top {self.top_n} allocations by line when stage '{name}' held the most memory "
+                    f"({stats.snapshot_size / 2 ** 20:.1f} MB traced)\n")
+            for number, statistic in enumerate(snapshot.statistics("lineno")[:self.top_n], start=1):
+                f.write(f"{number:>3}. {statistic}\n")
+
+
+# Process-wide profiler; stages are only measured after profiler.start().
+profiler = StageProfiler()
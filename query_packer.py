@@ -0,0 +1,89 @@
+import math
+from config import SEARCH_BATCH_SIZE, SEARCH_MIN_PACK_SIZE, SEARCH_PACK_PROBE_INTERVAL
+
+# Weight of the newest batch in a pack size's running hit rate.
+_HIT_RATE_SMOOTHING = 0.3
+
+
+class QueryPacker:
+    """Chooses how many tracks to OR-pack into one search query.
+
+    A search costs the same quota however many tracks it packs, but packed
+    queries crowd each other out of the results, so the hit rate falls as
+    the pack grows. The packer keeps a running hit rate for each size on a
+    halving ladder (e.g. 50, 25, 12, 6, 3) and packs at the size with the
+    most expected matches per query, i.e. the least quota per matched
+    track. A size is tried when the current one does much better or worse
+    than expected, and every ``probe_interval`` batches a neighbouring size
+    is re-measured so the choice follows the library as it changes.
+    ``hit_rates`` saved by an earlier run (see MatchCache.get_pack_hit_rates)
+    let it start at the size that did best there.
+    """
+
+    def __init__(self, max_size=None, min_size=None, probe_interval=None, hit_rates=None):
+        max_size = max_size or SEARCH_BATCH_SIZE
+        min_size = min(max_size, min_size or SEARCH_MIN_PACK_SIZE)
+        self.sizes = []
+        size = max_size
+        while size >= min_size:
+            self.sizes.append(size)
+            size //= 2
+        self.probe_interval = probe_interval or SEARCH_PACK_PROBE_INTERVAL
+        self.hit_rates = {size: rate for size, rate in (hit_rates or {}).items() if size in self.sizes}
+        self.batches = 0
+        measured = [size for size in self.sizes if size in self.hit_rates]
+        self._best = max(measured, key=self.expected_matches) if measured else max_size
+        self.size = self._best
+
+    def expected_matches(self, size):
+        """Expected matches per query at a pack size, or None if it was never measured."""
+        rate = self.hit_rates.get(size)
+        return None if rate is None else size * rate
+
+    def expected_queries(self, tracks, fallback_size, hit_rate):
+        """Returns the expected (first-pass, fallback) searches for ``tracks`` tracks searched together.
+
+        First-pass queries pack at the current size and find its measured hit
+        rate of their tracks, or ``hit_rate`` if it was never measured; the
+        misses are searched again ``fallback_size`` at a time (0 for none).
+        """
+        rate = self.hit_rates.get(self.size, hit_rate)
+        first_pass = math.ceil(tracks / self.size)
+        fallback = math.ceil(tracks * (1 - rate) / fallback_size) if fallback_size else 0
+        return first_pass, fallback
+
+    def record(self, size, hits):
+        """Records how many tracks of a packed query of ``size`` tracks were matched, and picks the next size."""
+        if size not in self.sizes:
+            return  # A short last batch; its hit rate would not say much about any pack size.
+        rate = hits / size
+        previous = self.hit_rates.get(size)
+        self.hit_rates[size] = rate if previous is None else previous + _HIT_RATE_SMOOTHING * (rate - previous)
+        self.batches += 1
+        self.size = self._choose()
+
+    def _choose(self):
+        measured = [size for size in self.sizes if size in self.hit_rates]
+        self._best = max(measured, key=self.expected_matches)
+        index = self.sizes.index(self._best)
+        larger = self.sizes[index - 1] if index > 0 else None
+        smaller = self.sizes[index + 1] if index + 1 < len(self.sizes) else None
+        rate = self.hit_rates[self._best]
+
+        # Halving the pack can only pay off if fewer than half its tracks are found, and
+        # doubling it only while nearly all are; try an unmeasured neighbour in those cases.
+        if smaller and smaller not in self.hit_rates and rate < 0.5:
+            return smaller
+        if larger and larger not in self.hit_rates and rate > 0.9:
+            return larger
+        if self.batches % self.probe_interval == 0:
+            # Alternate between re-measuring the smaller and the larger neighbour.
+            probe = smaller if (self.batches // self.probe_interval) % 2 else larger
+            if probe:
+                return probe
+        return self._best
+
+    def summary(self):
+        """One-line description of the measured hit rate per pack size."""
+        rates = ", ".join(f"{size}: {self.hit_rates[size]:.0%}" for size in self.sizes if size in self.hit_rates)
+        return f"pack size {self._best} (hit rate by size {rates})" if rates else f"pack size {self.size}"
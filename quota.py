@@ -0,0 +1,90 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from config import YOUTUBE_DAILY_QUOTA, QUOTA_TIMEZONE
+
+_ZONE = ZoneInfo(QUOTA_TIMEZONE)
+
+
+def quota_day(now=None):
+    """Returns the YouTube quota day (a Pacific-time date string) for a timestamp."""
+    return datetime.fromtimestamp(now if now is not None else time.time(), _ZONE).date().isoformat()
+
+
+def next_reset(now=None):
+    """Returns the timestamp of the next daily quota reset (midnight Pacific)."""
+    current = datetime.fromtimestamp(now if now is not None else time.time(), _ZONE)
+    midnight = datetime.combine(current.date() + timedelta(days=1), datetime.min.time(), _ZONE)
+    return midnight.timestamp()
+
+
+class QuotaBudget:
+    """Daily YouTube quota budget that pauses calls until the quota resets.
+
+    ``reserve`` is called before every quota-charged request. Once the day's
+    units are spent it blocks until midnight Pacific, so a long transfer just
+    stalls overnight instead of failing every remaining call. With a journal,
+    spent units are recorded per quota day and survive restarts.
+    """
+
+    def __init__(self, daily_quota=None, journal=None):
+        self.daily_quota = daily_quota or YOUTUBE_DAILY_QUOTA
+        self.journal = journal
+        self._lock = threading.Lock()
+        self._day = None
+        self._used = 0
+        self._roll()
+
+    def _roll(self):
+        """Switches to the current quota day, loading what was already spent on it."""
+        day = quota_day()
+        if day != self._day:
+            self._day = day
+            self._used = self.journal.get_quota_used(day) if self.journal else 0
+
+    @property
+    def used(self):
+        with self._lock:
+            self._roll()
+            return self._used
+
+    @property
+    def remaining(self):
+        return max(0, self.daily_quota - self.used)
+
+    def _charge(self, units):
+        self._used += units
+        if self.journal:
+            self.journal.add_quota_used(self._day, units)
+
+    def _try_charge(self, units):
+        """Charges units if they fit in today's quota and returns None; otherwise returns the units spent."""
+        with self._lock:
+            self._roll()
+            # A single call larger than the whole budget still goes out on a fresh day.
+            if self._used + units <= self.daily_quota or self._used == 0:
+                self._charge(units)
+                return None
+            return self._used
+
+    def reserve(self, units):
+        """Charges units against today's quota, waiting for the reset if they don't fit."""
+        while True:
+            used = self._try_charge(units)
+            if used is None:
+                return
+            reset_at = next_reset()
+            wait = max(1.0, reset_at - time.time())
+            resume_at = datetime.fromtimestamp(reset_at, _ZONE).strftime("%Y-%m-%d %H:%M %Z")
+            print(f"\nDaily YouTube quota spent ({used}/{self.daily_quota} units). "
+                  f"Pausing until it resets at {resume_at} ({wait / 3600:.1f} h).")
+            time.sleep(wait)
+            print("YouTube quota has reset; continuing.")
+
+    def exhaust(self):
+        """Marks today's quota as spent, e.g. after the API answered quotaExceeded."""
+        with self._lock:
+            self._roll()
+            if self._used < self.daily_quota:
+                self._charge(self.daily_quota - self._used)
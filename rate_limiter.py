@@ -0,0 +1,219 @@
+import email.utils
+import random
+import threading
+import time
+from config import (
+    YOUTUBE_RATE_LIMIT,
+    YOUTUBE_RATE_BURST,
+    SPOTIFY_RATE_LIMIT,
+    SPOTIFY_RATE_BURST,
+    RATE_LIMIT_MIN_FRACTION,
+    RATE_LIMIT_MAX_FRACTION,
+    RATE_LIMIT_INCREASE,
+    RATE_LIMIT_DECREASE,
+    RATE_LIMIT_MAX_RETRIES,
+    RATE_LIMIT_BACKOFF_BASE,
+    RATE_LIMIT_BACKOFF_MAX,
+    YOUTUBE_QUOTA_COSTS
+)
+from metrics import metrics
+
+# 403 reasons that mean "slow down", as opposed to quotaExceeded or forbidden.
+_THROTTLE_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+# 403 reasons that mean the daily quota is spent until it resets.
+_QUOTA_REASONS = ("quotaExceeded", "dailyLimitExceeded")
+
+
+def error_status(error):
+    """Returns the HTTP status of a googleapiclient or spotipy error, if any."""
+    resp = getattr(error, "resp", None)
+    if resp is not None and getattr(resp, "status", None) is not None:
+        return int(resp.status)
+    status = getattr(error, "http_status", None)
+    return int(status) if status is not None else None
+
+
+def _error_headers(error):
+    """Returns the response headers of a googleapiclient or spotipy error."""
+    resp = getattr(error, "resp", None)
+    if resp is not None:
+        return resp
+    return getattr(error, "headers", None) or {}
+
+
+def _error_content(error):
+    """Returns the response body of a googleapiclient or spotipy error as text."""
+    content = getattr(error, "content", None) or getattr(error, "msg", "") or ""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    return str(content)
+
+
+def parse_retry_after(headers):
+    """Parses a Retry-After header (delta-seconds or HTTP date) into seconds."""
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def classify_error(error):
+    """Classifies an API error as ``(retryable, throttled, retry_after)``.
+
+    Throttled errors (429, 403 rate limits, 5xx) also shrink the request rate;
+    connection-level errors are retried without touching the rate.
+    """
+    status = error_status(error)
+    if status is None:
+        return isinstance(error, (OSError, TimeoutError)), False, None
+
+    retry_after = parse_retry_after(_error_headers(error))
+    if status == 429 or status >= 500:
+        return True, True, retry_after
+    if status == 403 and any(reason in _error_content(error) for reason in _THROTTLE_REASONS):
+        return True, True, retry_after
+    return False, False, None
+
+
+def is_quota_exceeded(error):
+    """Returns True if an error is YouTube's "daily quota spent" 403."""
+    return error_status(error) == 403 and any(
+        reason in _error_content(error) for reason in _QUOTA_REASONS)
+
+
+class RateLimiter:
+    """Thread-safe token bucket whose rate adapts AIMD-style to API pushback.
+
+    Every call goes through ``call``, which waits for a token, runs the
+    request, and on throttling halves the rate, honours Retry-After and
+    retries with jittered exponential backoff. Successful calls slowly
+    raise the rate back towards its ceiling.
+    """
+
+    def __init__(self, name, rate, burst, min_rate=None, max_rate=None,
+                 increase=None, decrease=None, max_retries=None,
+                 backoff_base=None, backoff_max=None, quota_costs=None):
+        self.name = name
+        self.quota_costs = quota_costs or {}
+        self.budget = None  # Optional QuotaBudget checked before every quota-charged call
+        self.coordinator = None  # Optional QuotaCoordinator whose token bucket replaces the local one
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.min_rate = min_rate if min_rate is not None else rate * RATE_LIMIT_MIN_FRACTION
+        self.max_rate = max_rate if max_rate is not None else rate * RATE_LIMIT_MAX_FRACTION
+        self.increase = RATE_LIMIT_INCREASE if increase is None else increase
+        self.decrease = RATE_LIMIT_DECREASE if decrease is None else decrease
+        self.max_retries = RATE_LIMIT_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = RATE_LIMIT_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = RATE_LIMIT_BACKOFF_MAX if backoff_max is None else backoff_max
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """Blocks until ``tokens`` tokens are available and takes them.
+
+        Requests larger than the burst size are let through once the bucket is
+        full and leave it in debt, so they are paid for by later callers. With
+        a ``coordinator`` set, tokens come from its bucket, which is shared by
+        every process limiting the same service.
+        """
+        while True:
+            coordinator = None
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self.coordinator:
+                    coordinator, rate, burst = self.coordinator, self.rate, self.burst
+                elif self._tokens >= min(tokens, self.burst):
+                    self._tokens -= tokens
+                    return
+                else:
+                    wait = (min(tokens, self.burst) - self._tokens) / self.rate
+            if coordinator:
+                # A database transaction, so it runs outside the lock the other threads need.
+                wait = coordinator.take_tokens(self.name, tokens, rate, burst)
+                if not wait:
+                    return
+            time.sleep(wait)
+
+    def on_success(self):
+        """Additively increases the rate after a request that was not throttled."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        """Multiplicatively decreases the rate and honours any Retry-After delay."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    def backoff(self, attempt):
+        """Returns a full-jitter exponential backoff delay for a retry attempt."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def call(self, func, *args, weight=1, endpoint=None, **kwargs):
+        """Calls func through the limiter, retrying throttled and transient failures.
+
+        ``weight`` is the number of tokens the call costs, e.g. the number of
+        sub-requests in a batch. Each attempt is recorded in the run metrics
+        under ``endpoint`` and charged its quota cost per sub-request. With a
+        ``budget`` set, a call that would overspend the daily quota (or that
+        the API rejects with quotaExceeded) waits for the quota to reset.
+        """
+        service = self.name.lower()
+        endpoint = endpoint or getattr(func, "__name__", "call")
+        quota_units = self.quota_costs.get(endpoint, 0) * weight
+        attempt = 0
+        while True:
+            if self.budget and quota_units:
+                self.budget.reserve(quota_units)
+            waited = time.perf_counter()
+            self.acquire(weight)
+            started = time.perf_counter()
+            metrics.record_wait(service, endpoint, started - waited)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                status = error_status(e)
+                metrics.record_call(service, endpoint, time.perf_counter() - started,
+                                    error=status or e.__class__.__name__, quota_units=quota_units)
+                if self.budget and is_quota_exceeded(e):
+                    self.budget.exhaust()
+                    continue
+                retryable, throttled, retry_after = classify_error(e)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                if throttled:
+                    self.on_throttle(retry_after)
+                delay = retry_after if retry_after is not None else self.backoff(attempt)
+                attempt += 1
+                metrics.record_retry(service, endpoint)
+                reason = f"HTTP {status}" if status else e.__class__.__name__
+                print(f"    {self.name} request failed ({reason}); retry {attempt}/{self.max_retries} "
+                      f"in {delay:.1f}s at {self.rate:.2f} req/s")
+                time.sleep(delay)
+                continue
+            metrics.record_call(service, endpoint, time.perf_counter() - started, quota_units=quota_units)
+            self.on_success()
+            return result
+
+
+youtube_limiter = RateLimiter("YouTube", YOUTUBE_RATE_LIMIT, YOUTUBE_RATE_BURST, quota_costs=YOUTUBE_QUOTA_COSTS)
+spotify_limiter = RateLimiter("Spotify", SPOTIFY_RATE_LIMIT, SPOTIFY_RATE_BURST)
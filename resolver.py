@@ -0,0 +1,134 @@
+from match_cache import normalize_isrc
+from profiler import profiler
+from query_packer import QueryPacker
+from youtube_api import search_multiple_tracks_on_youtube
+
+
+class TrackResolver:
+    """Resolves each unique track to a YouTube videoId at most once per run.
+
+    The same song is often in many playlists. The resolver remembers every
+    Track.key it has already resolved, so only tracks not seen in earlier
+    playlists are looked up. New tracks go through these tiers in order:
+
+      1. ISRC: a recording already matched and duration-checked this run,
+         or confirmed in the match cache's ISRC index, is reused exactly and
+         for free.
+      2. TrackCatalog: tracks are joined against known matches by name and
+         artist.
+      3. search_multiple_tracks_on_youtube, for the rest. Tracks sharing an
+         ISRC are searched once, and results are added back to the catalog
+         for later playlists. One QueryPacker is kept for the whole run and
+         primed with the hit rates the match cache saved, so the pack size
+         learned on earlier playlists and runs carries over. Searches run on
+         the run's ``executor`` (see youtube_api.search_executor).
+    """
+
+    def __init__(self, youtube, cache=None, catalog=None, executor=None):
+        self.youtube = youtube
+        self.cache = cache
+        self.catalog = catalog
+        self.executor = executor
+        self.packer = QueryPacker(hit_rates=cache.get_pack_hit_rates() if cache else None)
+        self._resolved = {}
+        self._by_isrc = {}  # Normalized ISRC -> videoId of a duration-checked search match this run
+        self.requested = 0
+        self.isrc_hits = 0
+        self.catalog_hits = 0
+
+    def _match_isrc(self, tracks):
+        """Resolves tracks whose recording is already matched; returns its matches and the remaining tracks."""
+        isrcs = {normalize_isrc(track.isrc) for track in tracks if track.isrc}
+        known = {isrc: self._by_isrc[isrc] for isrc in isrcs if isrc in self._by_isrc}
+        if self.cache and isrcs - known.keys():
+            known.update(self.cache.lookup_isrcs(isrcs - known.keys()))
+        if not known:
+            return {}, tracks
+        matches = {}
+        remaining = []
+        for track in tracks:
+            video_id = known.get(normalize_isrc(track.isrc)) if track.isrc else None
+            if video_id:
+                matches[track.key] = video_id
+            else:
+                remaining.append(track)
+        self.isrc_hits += len(matches)
+        print(f"  ISRC index: {len(matches)} tracks matched to an already-matched recording.")
+        return matches, remaining
+
+    def _match_catalog(self, tracks):
+        """Resolves what the catalog can; returns its matches and the tracks still to search."""
+        matches = self.catalog.match(tracks)
+        if not matches:
+            return {}, tracks
+        self.catalog_hits += len(matches)
+        print(f"  Catalog: {len(matches)} tracks matched without searching.")
+        if self.cache:
+            self.cache.store_many((track, matches[track.key]) for track in tracks if track.key in matches)
+        return matches, [track for track in tracks if track.key not in matches]
+
+    def _index_isrcs(self, verified):
+        """Indexes duration-checked search matches by ISRC for the rest of the run, as MatchCache.index_isrcs does."""
+        for track, video_id in verified:
+            if track.isrc:
+                self._by_isrc.setdefault(normalize_isrc(track.isrc), video_id)
+
+    def _search(self, tracks):
+        """Searches for tracks, once per recording, and returns ``{track.key: video_id}``."""
+        recordings = {}  # Normalized ISRC -> the track searched for it
+        searched = []
+        for track in tracks:
+            isrc = normalize_isrc(track.isrc)
+            if isrc and isrc in recordings:
+                continue
+            if isrc:
+                recordings[isrc] = track
+            searched.append(track)
+
+        found = search_multiple_tracks_on_youtube(self.youtube, searched, cache=self.cache, packer=self.packer,
+                                                  executor=self.executor, on_verified=self._index_isrcs)
+        if len(searched) < len(tracks):
+            searched_keys = {track.key for track in searched}
+            duplicates = [track for track in tracks if track.key not in searched_keys]
+            for track in duplicates:
+                video_id = found.get(recordings[normalize_isrc(track.isrc)].key)
+                if video_id:
+                    found[track.key] = video_id
+            if self.cache:
+                self.cache.store_many((track, found.get(track.key)) for track in duplicates)
+        return found
+
+    def resolve(self, tracks):
+        """Returns ``{track.key: video_id}`` for every track that has a match."""
+        self.requested += len(tracks)
+        unique = {}
+        for track in tracks:
+            if track.key not in self._resolved and track.key not in unique:
+                unique[track.key] = track
+
+        if unique:
+            print(f"  Resolving {len(unique)} new unique tracks ({len(tracks) - len(unique)} already seen this run).")
+            with profiler.stage("match"):
+                results, pending = self._match_isrc(list(unique.values()))
+                if self.catalog and pending:
+                    matches, pending = self._match_catalog(pending)
+                    results.update(matches)
+            if pending:
+                found = self._search(pending)
+                results.update(found)
+                if self.catalog:
+                    self.catalog.add((track, found[track.key]) for track in pending if track.key in found)
+            for key in unique:
+                self._resolved[key] = results.get(key)
+
+        resolved = {}
+        for track in tracks:
+            video_id = self._resolved[track.key]
+            if video_id:
+                resolved[track.key] = video_id
+        return resolved
+
+    @property
+    def unique_count(self):
+        """Number of unique tracks resolved so far."""
+        return len(self._resolved)
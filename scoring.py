@@ -0,0 +1,100 @@
+import re
+import numpy as np
+from config import MATCH_SCORE_THRESHOLD, MATCH_NAME_WEIGHT, MATCH_DURATION_TOLERANCE
+from matcher import tokenize
+
+_ISO_DURATION = re.compile(r"^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+
+
+def parse_iso_duration(value):
+    """Converts an ISO 8601 duration such as 'PT3M45S' into seconds, or None."""
+    match = _ISO_DURATION.match(value or "")
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def _incidence(token_sets, vocab):
+    """Builds a binary (rows x vocab) matrix marking which vocab tokens each set contains."""
+    matrix = np.zeros((len(token_sets), len(vocab)), dtype=np.float32)
+    for row, tokens in enumerate(token_sets):
+        columns = [vocab[token] for token in tokens if token in vocab]
+        matrix[row, columns] = 1.0
+    return matrix
+
+
+def score_matrix(tracks, videos):
+    """Scores every (track, video) pair of a search batch at once.
+
+    Returns a (tracks x videos) array in [0, 1]: a weighted sum of the share
+    of the track's name tokens found in the video title and the share of its
+    artist tokens found in the title or channel name.
+    """
+    name_sets = [tokenize(track.name) for track in tracks]
+    artist_sets = [tokenize(track.artist) for track in tracks]
+    title_sets = [tokenize(video["snippet"]["title"]) for video in videos]
+    channel_sets = [
+        title | tokenize(video["snippet"].get("channelTitle"))
+        for title, video in zip(title_sets, videos)
+    ]
+
+    vocab = {}
+    for tokens in name_sets + artist_sets:
+        for token in tokens:
+            vocab.setdefault(token, len(vocab))
+
+    names = _incidence(name_sets, vocab)
+    artists = _incidence(artist_sets, vocab)
+    titles = _incidence(title_sets, vocab)
+    channels = _incidence(channel_sets, vocab)
+
+    name_sizes = np.maximum(names.sum(axis=1, keepdims=True), 1.0)
+    artist_sizes = artists.sum(axis=1, keepdims=True)
+    name_score = (names @ titles.T) / name_sizes
+    # Tracks without artist tokens get full artist credit rather than none.
+    artist_score = np.where(artist_sizes > 0, (artists @ channels.T) / np.maximum(artist_sizes, 1.0), 1.0)
+
+    scores = MATCH_NAME_WEIGHT * name_score + (1.0 - MATCH_NAME_WEIGHT) * artist_score
+    scores[names.sum(axis=1) == 0, :] = 0.0
+    return scores
+
+
+def shortlist(scores, threshold=None):
+    """Returns the indexes of videos that score above the threshold for any track."""
+    threshold = MATCH_SCORE_THRESHOLD if threshold is None else threshold
+    if scores.size == 0:
+        return []
+    return np.flatnonzero((scores >= threshold).any(axis=0)).tolist()
+
+
+def _duration_agrees(track, video_id, durations):
+    """Checks a candidate's YouTube duration against the Spotify duration_ms."""
+    video_seconds = durations.get(video_id)
+    if video_seconds is None or not track.duration_ms:
+        return True
+    return abs(video_seconds - track.duration_ms / 1000.0) <= MATCH_DURATION_TOLERANCE
+
+
+def select_matches(tracks, videos, scores, durations=None, threshold=None):
+    """Picks, per track, the best-scoring video that clears the threshold and whose duration agrees.
+
+    Returns ``(track_index, video_index, score)`` triples. Without durations
+    for a candidate (or a Spotify duration_ms) the duration check is skipped.
+    """
+    threshold = MATCH_SCORE_THRESHOLD if threshold is None else threshold
+    durations = durations or {}
+    if scores.size == 0:
+        return []
+
+    ranked = np.argsort(-scores, axis=1, kind="stable")
+    matches = []
+    for track_index, track in enumerate(tracks):
+        for video_index in ranked[track_index]:
+            score = scores[track_index, video_index]
+            if score < threshold:
+                break
+            if _duration_agrees(track, videos[video_index]["id"]["videoId"], durations):
+                matches.append((track_index, int(video_index), float(score)))
+                break
+    return matches
@@ -0,0 +1,152 @@
+import argparse
+import requests
+from flask import Flask, jsonify, request
+from spotipy import SpotifyException
+from catalog import TrackCatalog
+from config import SPOTIFY_SOURCES
+from jobs import JobStore, JobRunner
+from match_cache import MatchCache
+from metrics import metrics
+from quota import QuotaBudget
+from rate_limiter import spotify_limiter, youtube_limiter
+from spotify_api import spotify_from_token
+
+MODES = ("transfer", "resume", "sync")
+GOOGLE_CREDENTIAL_FIELDS = ("refresh_token", "client_id", "client_secret")
+
+
+def _error(message, status):
+    return jsonify({"error": message}), status
+
+
+class SpotifyUnavailable(Exception):
+    """Spotify could not be reached, or kept failing, while checking a token."""
+
+
+def _spotify_user_id(token):
+    """Returns the ID of the Spotify user a token belongs to, or None if Spotify rejects it.
+
+    Raises SpotifyUnavailable if Spotify can't say, e.g. after network errors or 5xx responses.
+    """
+    if not token or not isinstance(token, str):
+        return None
+    try:
+        user = spotify_limiter.call(spotify_from_token(token).current_user, endpoint="me")
+    except SpotifyException as e:
+        if e.http_status == 429 or (e.http_status or 0) >= 500:
+            raise SpotifyUnavailable(f"Spotify answered HTTP {e.http_status}") from e
+        return None
+    except requests.RequestException as e:
+        raise SpotifyUnavailable(str(e)) from e
+    return user["id"] if user else None
+
+
+def _bearer_token():
+    """Returns the token of an ``Authorization: Bearer <token>`` header, or None."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else None
+
+
+def create_app(store=None, runner=None, cache=None, snapshots=False):
+    """Builds the transfer job service.
+
+    Jobs are submitted with credentials the caller obtained through its own
+    OAuth login (a Spotify access token and Google authorized-user
+    credentials), so no browser round trip happens on the server. They run
+    on a JobRunner worker pool; state and progress are kept in the JobStore.
+    All jobs share the match cache, a TrackCatalog built from it, and the
+    service's daily YouTube quota. With ``snapshots`` every user's library is
+    kept in a snapshot between jobs (see JobRunner).
+
+    Jobs belong to the Spotify user their token signs in as; jobs are
+    listed with that token as a bearer token. The service has no login of
+    its own and accepts Google credentials from whoever can reach it, so
+    it must only listen on localhost (the default) or behind a proxy that
+    authenticates callers.
+    """
+    store = store or JobStore()
+    cache = cache or MatchCache()
+    if runner is None:
+        youtube_limiter.budget = QuotaBudget(journal=store)
+        runner = JobRunner(store, cache=cache, catalog=TrackCatalog.load(cache), snapshots=snapshots).start()
+
+    app = Flask(__name__)
+    app.config["JOB_STORE"] = store
+    app.config["JOB_RUNNER"] = runner
+
+    @app.errorhandler(SpotifyUnavailable)
+    def spotify_unavailable(error):
+        return _error(f"Could not check the Spotify token ({error}); try again later.", 502)
+
+    @app.post("/jobs")
+    def submit_job():
+        body = request.get_json(silent=True) or {}
+        mode = body.get("mode", "transfer")
+        google_credentials = body.get("google_credentials") or {}
+        playlists = body.get("playlists")
+        sources = body.get("sources", ["playlists"])
+        if not body.get("spotify_token"):
+            return _error("spotify_token is required.", 400)
+        missing = [field for field in GOOGLE_CREDENTIAL_FIELDS if not google_credentials.get(field)]
+        if missing:
+            return _error(f"google_credentials is missing {', '.join(missing)}.", 400)
+        if mode not in MODES:
+            return _error(f"mode must be one of {', '.join(MODES)}.", 400)
+        if playlists is not None and not (isinstance(playlists, list) and all(isinstance(p, str) for p in playlists)):
+            return _error("playlists must be a list of playlist names or IDs.", 400)
+        if not (isinstance(sources, list) and sources and all(source in SPOTIFY_SOURCES for source in sources)):
+            return _error(f"sources must be a list of {', '.join(SPOTIFY_SOURCES)}.", 400)
+        user_id = _spotify_user_id(body["spotify_token"])
+        if not user_id:
+            return _error("spotify_token was not accepted by Spotify.", 401)
+
+        job_id = runner.submit(user_id, {
+            "spotify_token": body["spotify_token"],
+            "google_credentials": google_credentials,
+            "mode": mode,
+            "playlists": playlists,
+            "sources": sources,
+        })
+        if job_id is None:
+            return _error(f"User {user_id} already has {runner.max_queued_per_user} unfinished jobs.", 429)
+        return jsonify(store.get_job(job_id)), 202
+
+    @app.get("/jobs/<job_id>")
+    def get_job(job_id):
+        job = store.get_job(job_id)
+        if not job:
+            return _error("Job not found.", 404)
+        return jsonify(job)
+
+    @app.get("/jobs")
+    def list_jobs():
+        user_id = _spotify_user_id(_bearer_token())
+        if not user_id:
+            return _error("A Spotify access token is required as 'Authorization: Bearer <token>'.", 401)
+        return jsonify({"jobs": store.list_jobs(user_id)})
+
+    @app.get("/metrics")
+    def service_metrics():
+        return metrics.prometheus_text(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+    @app.get("/health")
+    def health():
+        budget = youtube_limiter.budget
+        return jsonify({
+            "status": "ok",
+            "workers": runner.workers,
+            "youtube_quota_remaining": budget.remaining if budget else None,
+        })
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the Spotify to YouTube Music transfer job service.")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="interface to listen on; anything but localhost needs an authenticating proxy in front")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--snapshots", action="store_true",
+                        help="keep a library snapshot per user so repeat jobs only re-read changed playlists")
+    args = parser.parse_args()
+    create_app(snapshots=args.snapshots).run(host=args.host, port=args.port, threaded=True)
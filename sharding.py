@@ -0,0 +1,135 @@
+import contextlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import SHARD_LOG_DIR
+
+
+def split_shards(plans, shard_count):
+    """Splits PlaylistPlans into at most ``shard_count`` lists of about the same estimated cost.
+
+    Playlists are placed largest first, each on the shard with the least
+    estimated quota so far, so one huge playlist does not leave the other
+    shards idle. Up-to-date (skipped) playlists are left out, and each shard
+    keeps the plans' transfer order, so priority playlists still go first.
+    """
+    shards = [[] for _ in range(shard_count)]
+    loads = [0] * shard_count
+    order = {id(plan): number for number, plan in enumerate(plans)}
+    for plan in sorted((plan for plan in plans if not plan.skipped), key=lambda plan: plan.cost, reverse=True):
+        lightest = loads.index(min(loads))
+        shards[lightest].append(plan)
+        loads[lightest] += plan.cost
+    return [sorted(shard, key=lambda plan: order[id(plan)]) for shard in shards if shard]
+
+
+def _run_shard(number, playlists, options):
+    """Transfers one shard's playlists in a worker process and returns its results.
+
+    The shard signs in with the credentials the parent process saved, draws
+    YouTube quota and Spotify and YouTube rate tokens from the shared
+    QuotaCoordinator, and writes its output to its own log file.
+    """
+    with open(options["log_path"], "w", buffering=1) as log, contextlib.redirect_stdout(log):
+        import asyncio
+        from catalog import TrackCatalog
+        from coordinator import QuotaCoordinator, SharedQuotaBudget
+        from journal import TransferJournal
+        from library_snapshot import load_snapshot
+        from match_cache import MatchCache
+        from metrics import metrics
+        from pipeline import run_pipeline
+        from rate_limiter import spotify_limiter, youtube_limiter
+        from spotify_api import authenticate_spotify
+        from youtube_api import authenticate_youtube
+
+        started = time.time()
+        sp = None
+        if options["needs_spotify"]:
+            sp = authenticate_spotify()
+            if not sp:
+                raise RuntimeError("Spotify authentication failed")
+        youtube = authenticate_youtube()
+        if not youtube:
+            raise RuntimeError("YouTube authentication failed")
+
+        coordinator = QuotaCoordinator(options["coordinator_path"])
+        youtube_limiter.budget = SharedQuotaBudget(coordinator, options["daily_quota"])
+        youtube_limiter.coordinator = coordinator
+        spotify_limiter.coordinator = coordinator
+        cache = MatchCache(options["cache_path"])
+        journal = TransferJournal(options["journal_path"])
+        catalog = TrackCatalog.load(cache, options["catalog_paths"])
+        library = load_snapshot(options["snapshot_path"]) if options["snapshot_path"] else None
+        try:
+            asyncio.run(run_pipeline(sp, youtube, playlists, cache=cache, journal=journal, mode=options["mode"],
+                                     catalog=catalog, library=library))
+        finally:
+            journal.close()
+            cache.close()
+            coordinator.close()
+            if library:
+                library.close()
+        metrics.print_summary()
+    return {"shard": number, "playlists": len(playlists), "seconds": time.time() - started,
+            "report": metrics.report()}
+
+
+def run_sharded(plans, shard_count, mode="transfer", cache_path=None, journal_path=None, coordinator_path=None,
+                daily_quota=None, catalog_paths=None, snapshot_path=None, needs_spotify=True, log_dir=None,
+                progress=None):
+    """Transfers planned playlists over up to ``shard_count`` worker processes.
+
+    Playlists are balanced over the shards by estimated cost (see
+    split_shards). The shards share the match cache, the journal and, through
+    a QuotaCoordinator, one daily YouTube quota and one rate limit per
+    service, so together they never go over the budget. Each shard logs to
+    ``<log_dir>/shard-<n>.log``; its metrics are merged into ``progress``
+    (by default the process-wide run metrics), so the usual summary and
+    reports cover the whole run. Returns one result dict per finished shard.
+    """
+    from coordinator import QuotaCoordinator
+    from metrics import metrics
+
+    progress = progress or metrics
+    log_dir = log_dir or SHARD_LOG_DIR
+    os.makedirs(log_dir, exist_ok=True)
+    shards = split_shards(plans, shard_count)
+    if not shards:
+        print("\nNothing to transfer.")
+        return []
+
+    # Created here so the shards don't race to create its tables.
+    QuotaCoordinator(coordinator_path).close()
+    print(f"\nSplitting the transfer over {len(shards)} processes:")
+    submitted = {}
+    # Spawned rather than forked: the parent holds open database and HTTP connections and threads.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as executor:
+        for number, shard in enumerate(shards, start=1):
+            log_path = os.path.join(log_dir, f"shard-{number}.log")
+            options = {
+                "mode": mode, "cache_path": cache_path, "journal_path": journal_path,
+                "coordinator_path": coordinator_path, "daily_quota": daily_quota, "catalog_paths": catalog_paths,
+                "snapshot_path": snapshot_path, "needs_spotify": needs_spotify, "log_path": log_path,
+            }
+            print(f"  Shard {number}: {len(shard)} playlists, {sum(plan.tracks for plan in shard)} tracks, "
+                  f"~{sum(plan.cost for plan in shard)} units (log: {log_path})")
+            future = executor.submit(_run_shard, number, [plan.playlist for plan in shard], options)
+            submitted[future] = number
+
+        results = []
+        for future in as_completed(submitted):
+            number = submitted[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"  Shard {number} failed: {e}. Run again with --resume to finish its playlists.")
+                continue
+            report = result["report"]
+            progress.merge(report)
+            results.append(result)
+            print(f"  Shard {number} finished {result['playlists']} playlists in {result['seconds']:.0f}s: "
+                  f"{report['tracks_done']} tracks, {report['youtube_quota_units']} quota units.")
+    return sorted(results, key=lambda result: result["shard"])
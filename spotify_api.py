@@ -1,20 +1,78 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import requests
 import spotipy
+import urllib3
+from spotipy.cache_handler import CacheFileHandler
 from spotipy.oauth2 import SpotifyOAuth
-from config import SPOTIPY_CLIENT_ID, SPOTIPY_CLIENT_SECRET, SPOTIPY_REDIRECT_URI
+from config import (
+    SPOTIPY_CLIENT_ID,
+    SPOTIPY_CLIENT_SECRET,
+    SPOTIPY_REDIRECT_URI,
+    SPOTIFY_TOKEN_FILE,
+    SPOTIFY_PAGE_SIZE,
+    SPOTIFY_PAGE_WORKERS,
+    SPOTIFY_LIBRARY_PAGE_SIZE,
+    SOURCE_PART_SIZE,
+    TOP_TRACKS_TIME_RANGE
+)
+from rate_limiter import spotify_limiter
+from track import Track
+
+# Only the fields we use are transferred for playlist items.
+PLAYLIST_TRACK_FIELDS = "total,items(track(id,name,duration_ms,external_ids(isrc),artists(name),album(name)))"
+
+SOURCE_NAMES = {"saved": "Liked Songs", "top": "Top Tracks"}
+
+class _PrivateCacheFileHandler(CacheFileHandler):
+    """CacheFileHandler that keeps the token file, which holds the refresh token, readable only by the current user."""
+
+    def save_token_to_cache(self, token_info):
+        fd = os.open(self.cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(token_info, cls=self.encoder_cls))
+        os.chmod(self.cache_path, 0o600)  # Also tighten a file that already existed
+
+def _build_requests_session():
+    """Builds the HTTP session used by spotipy.
+
+    Connection errors are still retried by urllib3, but HTTP status codes are
+    passed straight through so that 429/5xx responses (with their Retry-After
+    header) reach the shared rate limiter instead of being retried blindly.
+    """
+    session = requests.Session()
+    retry = urllib3.Retry(total=3, connect=3, read=False, status=0, backoff_factor=0.3,
+                          respect_retry_after_header=False, raise_on_status=False)
+    # Enough pooled keep-alive connections for the concurrent page fetchers.
+    adapter = requests.adapters.HTTPAdapter(
+        max_retries=retry, pool_connections=4, pool_maxsize=SPOTIFY_PAGE_WORKERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
 def authenticate_spotify():
-    """Authenticates with the Spotify API using OAuth."""
+    """Authenticates with the Spotify API using OAuth.
+
+    The token is saved to SPOTIFY_TOKEN_FILE and refreshed silently on later
+    runs, so the browser is only needed the first time.
+    """
     print("Authenticating with Spotify...")
     try:
         auth_manager = SpotifyOAuth(
             client_id=SPOTIPY_CLIENT_ID,
             client_secret=SPOTIPY_CLIENT_SECRET,
             redirect_uri=SPOTIPY_REDIRECT_URI,
-            scope="user-library-read playlist-read-private user-top-read"
+            scope="user-library-read playlist-read-private user-top-read",
+            cache_handler=_PrivateCacheFileHandler(cache_path=SPOTIFY_TOKEN_FILE)
         )
-        print("A browser window should open. If it doesn't, please manually visit the URL that will be shown.")
-        sp = spotipy.Spotify(auth_manager=auth_manager)
-        user = sp.current_user()
+        if auth_manager.validate_token(auth_manager.cache_handler.get_cached_token()):
+            print("Using saved Spotify token.")
+        else:
+            print("A browser window should open. If it doesn't, please manually visit the URL that will be shown.")
+        sp = spotipy.Spotify(auth_manager=auth_manager, requests_session=_build_requests_session())
+        user = spotify_limiter.call(sp.current_user, endpoint="me")
         if user:
             print(f"Successfully authenticated with Spotify as {user['display_name']}.")
         else:
@@ -27,38 +85,141 @@ def authenticate_spotify():
         print("Also, make sure the redirect URI is registered in your Spotify Developer Dashboard app.")
         return None
 
+def spotify_from_token(access_token):
+    """Builds a Spotify client from an access token obtained elsewhere, e.g. by a web login."""
+    return spotipy.Spotify(auth=access_token, requests_session=_build_requests_session())
+
 def get_spotify_playlists(sp):
     """Fetches the current user's Spotify playlists."""
     if not sp:
         return []
     playlists_data = []
-    playlists = sp.current_user_playlists(limit=50)
+    playlists = spotify_limiter.call(sp.current_user_playlists, limit=50, endpoint="me.playlists")
     while playlists:
         for i, playlist in enumerate(playlists['items']):
             print(f"  Found Spotify playlist: {playlist['name']} ({len(playlist['tracks']['items'] if 'items' in playlist['tracks'] else [])} tracks initially, will fetch all)")
-            playlists_data.append({'id': playlist['id'], 'name': playlist['name']})
+            playlists_data.append({
+                'id': playlist['id'],
+                'name': playlist['name'],
+                'snapshot_id': playlist.get('snapshot_id'),
+                'total': playlist['tracks'].get('total')
+            })
         if playlists['next']:
-            playlists = sp.next(playlists)
+            playlists = spotify_limiter.call(sp.next, playlists, endpoint="me.playlists")
         else:
             playlists = None
     return playlists_data
 
+def _fetch_playlist_page(sp, playlist_id, offset):
+    """Fetches one page of trimmed playlist items starting at offset."""
+    return spotify_limiter.call(
+        sp.playlist_items, playlist_id, endpoint="playlists.items",
+        fields=PLAYLIST_TRACK_FIELDS, limit=SPOTIFY_PAGE_SIZE, offset=offset,
+        additional_types=("track",)
+    )
+
+def _extract_tracks(page):
+    """Yields Track records for the usable items in a page of playlist or saved-track items."""
+    for item in page.get('items', []):
+        track = Track.from_spotify(item.get('track'))
+        if track:
+            yield track
+
+def _stream_pages(fetch_page, *page_requests):
+    """Yields ``fetch_page(*request)`` for each request, in order.
+
+    Pages are fetched concurrently with at most SPOTIFY_PAGE_WORKERS in
+    flight, so memory stays bounded however many pages there are.
+    """
+    if not page_requests:
+        return
+    with ThreadPoolExecutor(max_workers=min(SPOTIFY_PAGE_WORKERS, len(page_requests))) as executor:
+        in_flight = deque()
+        for request in page_requests:
+            in_flight.append(executor.submit(fetch_page, *request))
+            if len(in_flight) >= SPOTIFY_PAGE_WORKERS:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
 def get_spotify_playlist_tracks(sp, playlist_id):
-    """Fetches all tracks from a specific Spotify playlist."""
+    """Yields the tracks of a specific Spotify playlist as Track records, in order.
+
+    The first page tells us the total, after which the remaining pages are
+    fetched concurrently by offset.
+    """
+    if not sp:
+        return
+    first_page = _fetch_playlist_page(sp, playlist_id, 0)
+    yield from _extract_tracks(first_page)
+
+    offsets = range(SPOTIFY_PAGE_SIZE, first_page.get('total', 0), SPOTIFY_PAGE_SIZE)
+    for page in _stream_pages(_fetch_playlist_page, *((sp, playlist_id, offset) for offset in offsets)):
+        yield from _extract_tracks(page)
+
+def _fetch_library_page(sp, source, offset, limit):
+    """Fetches one page of the user's saved or top tracks."""
+    if source == "saved":
+        return spotify_limiter.call(sp.current_user_saved_tracks, limit=limit, offset=offset, endpoint="me.tracks")
+    return spotify_limiter.call(sp.current_user_top_tracks, limit=limit, offset=offset,
+                                time_range=TOP_TRACKS_TIME_RANGE, endpoint="me.top.tracks")
+
+def get_spotify_sources(sp, sources, part_size=None):
+    """Describes Liked Songs and Top Tracks as playlist-like dicts, split into parts.
+
+    Each part holds at most ``part_size`` tracks and becomes its own YouTube
+    playlist. Liked Songs are numbered oldest first, so songs liked later
+    only ever extend the last part and earlier parts stay stable for resume
+    and sync. A part dict has the usual 'id', 'name', 'snapshot_id' and
+    'total' keys plus the 'source' and Spotify 'offset' it is read from.
+    """
     if not sp:
         return []
-    tracks_data = []
-    results = sp.playlist_items(playlist_id)
-    tracks = results['items']
-    while results['next']:
-        results = sp.next(results)
-        tracks.extend(results['items'])
-
-    for item in tracks:
-        track = item.get('track')
-        if track and track.get('name') and track.get('artists'):
-            track_name = track['name']
-            artist_name = track['artists'][0]['name']  # Taking the primary artist
-            album_name = track.get('album', {}).get('name', 'N/A')
-            tracks_data.append({'name': track_name, 'artist': artist_name, 'album': album_name})
-    return tracks_data 
\ No newline at end of file
+    part_size = part_size or SOURCE_PART_SIZE
+    parts = []
+    for source in sources:
+        first_page = _fetch_library_page(sp, source, 0, 1)
+        total = (first_page or {}).get('total') or 0
+        count = -(-total // part_size)
+        print(f"  Found {SOURCE_NAMES[source]}: {total} tracks"
+              + (f", split into {count} playlists of up to {part_size}" if count > 1 else ""))
+        for number in range(count):
+            size = min(part_size, total - number * part_size)
+            parts.append({
+                'id': f"{source}:{number + 1}",
+                'name': SOURCE_NAMES[source] + (f" ({number + 1})" if count > 1 else ""),
+                'snapshot_id': None,
+                'total': size,
+                'source': source,
+                # Saved tracks come newest first, so the oldest part is at the end.
+                'offset': total - number * part_size - size if source == "saved" else number * part_size,
+            })
+    return parts
+
+def _get_source_tracks(sp, part):
+    """Yields a Liked Songs or Top Tracks part as Track records, streamed page by page."""
+    start, end = part['offset'], part['offset'] + part['total']
+    page_size = SPOTIFY_LIBRARY_PAGE_SIZE
+    if part['source'] == "saved":
+        # Oldest first: pages from the end of the range, each reversed.
+        page_requests = []
+        for stop in range(end, start, -page_size):
+            offset = max(start, stop - page_size)
+            page_requests.append((sp, "saved", offset, stop - offset))
+        for page in _stream_pages(_fetch_library_page, *page_requests):
+            yield from reversed(list(_extract_tracks(page)))
+    else:
+        page_requests = [(sp, "top", offset, min(page_size, end - offset)) for offset in range(start, end, page_size)]
+        for page in _stream_pages(_fetch_library_page, *page_requests):
+            for item in page.get('items', []):
+                track = Track.from_spotify(item)  # Top tracks are track objects, not items
+                if track:
+                    yield track
+
+def stream_tracks(sp, playlist):
+    """Yields the tracks of a playlist, or of a Liked Songs or Top Tracks part, in order."""
+    if not sp:
+        return iter(())
+    if playlist.get('source'):
+        return _get_source_tracks(sp, playlist)
+    return get_spotify_playlist_tracks(sp, playlist['id'])
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules live at the repository root; the benchmarks hold the fake services and budgets.
+for path in (ROOT, os.path.join(ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def unthrottled():
+    """Lets the local stand-ins be called as fast as they answer."""
+    from rate_limiter import spotify_limiter, youtube_limiter
+
+    saved = [(limiter, limiter.rate, limiter.max_rate, limiter.burst, limiter._tokens)
+             for limiter in (youtube_limiter, spotify_limiter)]
+    for limiter, *_ in saved:
+        limiter.rate = limiter.max_rate = limiter.burst = limiter._tokens = 10000.0
+    yield
+    for limiter, rate, max_rate, burst, tokens in saved:
+        limiter.rate, limiter.max_rate, limiter.burst, limiter._tokens = rate, max_rate, burst, tokens
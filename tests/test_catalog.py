@@ -0,0 +1,27 @@
+from catalog import TrackCatalog
+from track import Track
+
+
+def _track(name, duration_ms=None):
+    return Track(name, name, "The Band", "Album", None, duration_ms)
+
+
+def test_versions_of_a_song_do_not_join():
+    catalog = TrackCatalog()
+    catalog.add([(_track("Song"), "studio")])
+    matches = catalog.match([_track("Song (Live)"), _track("Song - Remix"), _track("Song - Remastered 2011")])
+    assert matches == {}
+
+
+def test_featuring_credits_are_ignored():
+    catalog = TrackCatalog()
+    catalog.add([(_track("Song (feat. Someone)"), "video")])
+    assert catalog.match([_track("Song"), _track("Song feat. Someone Else")]) == {
+        _track("Song").key: "video", _track("Song feat. Someone Else").key: "video"}
+
+
+def test_durations_must_agree_when_both_are_known():
+    catalog = TrackCatalog()
+    catalog.add([(_track("Song", 200000), "video")])
+    assert catalog.match([_track("Song", 400000)]) == {}
+    assert catalog.match([_track("Song", 210000)]) == {_track("Song").key: "video"}
@@ -0,0 +1,39 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from coordinator import QuotaCoordinator
+
+DAILY_QUOTA = 10000
+PROCESSES = 8
+
+
+def _reserve_until_refused(path, units):
+    """Reserves ``units`` at a time until the ledger refuses; returns the units this process got."""
+    coordinator = QuotaCoordinator(path)
+    reserved = 0
+    try:
+        while coordinator.reserve_quota("2026-01-01", units, DAILY_QUOTA) is None:
+            reserved += units
+    finally:
+        coordinator.close()
+    return reserved
+
+
+@pytest.mark.parametrize("units", [100, 300])
+def test_processes_never_reserve_more_than_the_daily_quota(tmp_path, units):
+    path = str(tmp_path / "journal.db")
+    # Tables are created up front, as run_sharded does, so the workers don't race to create them.
+    QuotaCoordinator(path).close()
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=PROCESSES, mp_context=context) as executor:
+        reserved = list(executor.map(_reserve_until_refused, [path] * PROCESSES, [units] * PROCESSES))
+
+    total = sum(reserved)
+    assert total == DAILY_QUOTA // units * units
+    coordinator = QuotaCoordinator(path)
+    assert coordinator.get_quota_used("2026-01-01") == total
+    coordinator.close()
+
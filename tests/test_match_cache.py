@@ -0,0 +1,65 @@
+import contextlib
+import io
+import pytest
+from catalog import TrackCatalog
+from fake_services import FakeServices, make_library
+from match_cache import MatchCache
+from resolver import TrackResolver
+from track import Track
+
+
+def _track(track_id, name, isrc=None):
+    return Track(track_id, name, "The Band", "Album", isrc, 200000)
+
+
+def test_stored_results_are_not_indexed_by_isrc(tmp_path):
+    cache = MatchCache(str(tmp_path / "cache.db"))
+    cache.store_many([(_track("a", "Song", "USRC17607839"), "video")])
+    assert cache.lookup_isrcs(["USRC17607839"]) == {}
+
+    cache.index_isrcs([(_track("a", "Song", "us-rc1-76-07839"), "video")])
+    assert cache.lookup_isrcs(["USRC17607839"]) == {"USRC17607839": "video"}
+    cache.close()
+
+
+def test_catalog_joins_are_cached_but_not_indexed_by_isrc(tmp_path):
+    cache = MatchCache(str(tmp_path / "cache.db"))
+    catalog = TrackCatalog()
+    catalog.add([(_track("a", "Song"), "video")])
+    resolver = TrackResolver(youtube=None, cache=cache, catalog=catalog)
+
+    track = _track("b", "Song", "USRC17607839")
+    assert resolver.resolve([track]) == {track.key: "video"}
+    assert cache.lookup([track]) == ([(track, "video")], [])
+    assert cache.lookup_isrcs(["USRC17607839"]) == {}
+    cache.close()
+
+
+def test_catalog_joins_are_not_reused_by_isrc_within_a_run():
+    catalog = TrackCatalog()
+    catalog.add([(_track("a", "Song"), "video")])
+    resolver = TrackResolver(youtube=None, catalog=catalog)
+
+    joined = _track("b", "Song", "USRC17607839")
+    other = _track("c", "Another Song", "USRC17607839")
+    assert resolver.resolve([joined]) == {joined.key: "video"}
+    assert resolver.resolve([other]) == {}
+
+
+@pytest.mark.usefixtures("unthrottled")
+def test_only_duration_checked_search_matches_are_reused_by_isrc_within_a_run():
+    tracks, playlists = make_library(2, playlist_size=2, overlap=0.0)
+    services = FakeServices(tracks, playlists, miss_rate=0.0).start()
+    try:
+        resolver = TrackResolver(services.youtube_client())
+        first, second = (Track.from_spotify(track) for track in tracks.values())
+        # Found by name, but with no duration to check against the video's.
+        unchecked = first._replace(duration_ms=0, isrc="USRC17607839")
+        checked = second._replace(isrc="GBAYE0601498")
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert resolver.resolve([unchecked, checked]).keys() == {unchecked.key, checked.key}
+            # Same recordings under names the search can't find.
+            renamed = [_track("x", "Unknown", "USRC17607839"), _track("y", "Unknown", "GBAYE0601498")]
+            assert resolver.resolve(renamed) == {renamed[1].key: f"v-{second.id}"}
+    finally:
+        services.stop()
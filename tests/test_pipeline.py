@@ -0,0 +1,85 @@
+import asyncio
+import contextlib
+import io
+import pytest
+from fake_services import FakeServices, make_library
+from journal import TransferJournal
+from pipeline import run_pipeline
+from rate_limiter import youtube_limiter
+from spotify_api import get_spotify_playlists
+
+pytestmark = pytest.mark.usefixtures("unthrottled")
+
+
+@pytest.fixture
+def services():
+    tracks, playlists = make_library(60, playlist_size=30, overlap=0.0)
+    services = FakeServices(tracks, playlists, miss_rate=0.0).start()
+    yield services
+    services.stop()
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = TransferJournal(str(tmp_path / "journal.db"))
+    yield journal
+    journal.close()
+
+
+def run(services, journal, mode="transfer"):
+    """Runs the pipeline over the fake library; returns the Spotify playlists it was given."""
+    sp, youtube = services.spotify_client(), services.youtube_client()
+    with contextlib.redirect_stdout(io.StringIO()):
+        spotify_playlists = get_spotify_playlists(sp)
+        asyncio.run(run_pipeline(sp, youtube, spotify_playlists, journal=journal, mode=mode))
+    return spotify_playlists
+
+
+def test_sync_keeps_the_mapping_when_listing_the_playlist_fails(services, journal, monkeypatch):
+    run(services, journal)
+    mapped = journal.get_playlist("pl00000")["youtube_playlist_id"]
+    created = services.stats()["calls"]["playlists.insert"]
+
+    services.playlists["pl00000"]["version"] = 1
+    services.failures["playlistItems.list"] = ["backendError"]
+    monkeypatch.setattr(youtube_limiter, "max_retries", 0)
+    run(services, journal, mode="sync")
+
+    state = journal.get_playlist("pl00000")
+    assert services.stats()["calls"]["playlists.insert"] == created
+    assert state["youtube_playlist_id"] == mapped
+    assert state["snapshot_id"] == "snap-pl00000-0"  # So the next sync tries again
+
+
+def test_sync_recreates_a_deleted_playlist(services, journal):
+    run(services, journal)
+    mapped = journal.get_playlist("pl00000")["youtube_playlist_id"]
+    del services.youtube_playlists[mapped]
+
+    services.playlists["pl00000"]["version"] = 1
+    run(services, journal, mode="sync")
+
+    state = journal.get_playlist("pl00000")
+    assert state["youtube_playlist_id"] != mapped
+    assert len(services.youtube_playlists[state["youtube_playlist_id"]]) == 30
+
+
+def test_resume_after_a_crash_does_not_insert_unjournaled_videos_twice(services, journal, monkeypatch):
+    def crash(playlist_id, inserts):
+        raise RuntimeError("crashed before journaling the inserts")
+
+    # The first batch reaches YouTube, but the process dies before it is journaled.
+    monkeypatch.setattr(journal, "record_inserts", crash)
+    with pytest.raises(RuntimeError):
+        run(services, journal)
+    mapped = journal.get_playlist("pl00000")["youtube_playlist_id"]
+    inserted_before_crash = list(services.youtube_playlists[mapped])
+    assert inserted_before_crash and not journal.get_inserts("pl00000")
+
+    monkeypatch.undo()
+    run(services, journal, mode="resume")
+
+    videos = services.youtube_playlists[mapped]
+    assert len(videos) == len(set(videos)) == 30
+    assert services.insert_requests.most_common(1)[0][1] == 1
+    assert journal.get_playlist("pl00000")["completed"]
@@ -0,0 +1,51 @@
+import asyncio
+import contextlib
+import io
+import pytest
+from fake_services import FakeServices, make_library
+from journal import TransferJournal
+from match_cache import MatchCache
+from pipeline import run_pipeline
+from planner import plan_transfer
+from spotify_api import get_spotify_playlists
+
+pytestmark = pytest.mark.usefixtures("unthrottled")
+
+
+def plan_and_run(tmp_path, seed, crowding, hit_rates=None):
+    """Plans a transfer of a synthetic library, runs it, and returns (planned, spent) search quota and the cache."""
+    tracks, playlists = make_library(2000, playlist_size=250, overlap=0.3, seed=seed)
+    services = FakeServices(tracks, playlists, crowding=crowding).start()
+    sp, youtube = services.spotify_client(), services.youtube_client()
+    cache = MatchCache(str(tmp_path / f"cache-{seed}.db"))
+    journal = TransferJournal(str(tmp_path / f"journal-{seed}.db"))
+    cache.store_pack_hit_rates(hit_rates)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            spotify_playlists = get_spotify_playlists(sp)
+            plans = plan_transfer(sp, spotify_playlists, cache=cache, journal=journal)
+            asyncio.run(run_pipeline(sp, youtube, spotify_playlists, cache=cache, journal=journal))
+    finally:
+        services.stop()
+        journal.close()
+    calls = services.stats()["calls"]
+    spent = calls.get("search.list", 0) * 100 + calls.get("videos.list", 0)
+    return sum(plan.search_units for plan in plans), spent, cache
+
+
+def test_plan_prices_fallback_searches(tmp_path):
+    planned, spent, cache = plan_and_run(tmp_path, seed=7, crowding=0.0)
+    cache.close()
+    assert 0.8 <= spent / planned <= 1.25
+
+
+def test_plan_uses_hit_rates_learned_by_earlier_runs(tmp_path):
+    # Crowded packs miss far more; the first run learns that and saves it in the match cache.
+    _, _, learned = plan_and_run(tmp_path, seed=7, crowding=0.6)
+    hit_rates = learned.get_pack_hit_rates()
+    learned.close()
+    assert hit_rates
+
+    planned, spent, cache = plan_and_run(tmp_path, seed=8, crowding=0.6, hit_rates=hit_rates)
+    cache.close()
+    assert 0.8 <= spent / planned <= 1.25
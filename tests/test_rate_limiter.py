@@ -0,0 +1,169 @@
+import email.utils
+import json
+import googleapiclient.errors
+import httplib2
+import pytest
+import rate_limiter
+from rate_limiter import RateLimiter, classify_error, is_quota_exceeded, parse_retry_after
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping only moves the clock forward."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    monotonic = perf_counter = time
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        # A real sleep always lets some time pass, even when asked for less than the clock resolves.
+        self.now += max(seconds, 1e-6)
+
+
+class RecordingBudget:
+    """Quota budget that never waits and counts reservations and reported exhaustion."""
+
+    def __init__(self):
+        self.reserved = 0
+        self.exhausted = 0
+
+    def reserve(self, units):
+        self.reserved += units
+
+    def exhaust(self):
+        self.exhausted += 1
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def http_error(status, reason=None, retry_after=None):
+    headers = {"status": status}
+    if retry_after is not None:
+        headers["retry-after"] = retry_after
+    body = {"error": {"code": status, "errors": [{"reason": reason}] if reason else []}}
+    return googleapiclient.errors.HttpError(httplib2.Response(headers), json.dumps(body).encode())
+
+
+def failing(*errors):
+    """Returns a function that raises each error in turn, then returns "ok"."""
+    pending = list(errors)
+
+    def func():
+        if pending:
+            raise pending.pop(0)
+        return "ok"
+    return func
+
+
+def limiter(**overrides):
+    options = dict(rate=10, burst=10, min_rate=1, max_rate=12, increase=1, decrease=0.5, max_retries=3,
+                   backoff_base=0.5, backoff_max=4, quota_costs={"search.list": 100})
+    options.update(overrides)
+    return RateLimiter("Test", **options)
+
+
+def test_classify_error():
+    assert classify_error(http_error(429, "rateLimitExceeded", "7")) == (True, True, 7.0)
+    assert classify_error(http_error(503, "backendError")) == (True, True, None)
+    assert classify_error(http_error(403, "rateLimitExceeded")) == (True, True, None)
+    assert classify_error(http_error(403, "userRateLimitExceeded")) == (True, True, None)
+    assert classify_error(http_error(403, "quotaExceeded")) == (False, False, None)
+    assert classify_error(http_error(403, "forbidden")) == (False, False, None)
+    assert classify_error(http_error(404, "videoNotFound")) == (False, False, None)
+    assert classify_error(ConnectionResetError()) == (True, False, None)
+    assert classify_error(ValueError()) == (False, False, None)
+
+    assert is_quota_exceeded(http_error(403, "quotaExceeded"))
+    assert is_quota_exceeded(http_error(403, "dailyLimitExceeded"))
+    assert not is_quota_exceeded(http_error(403, "rateLimitExceeded"))
+
+
+def test_parse_retry_after(clock):
+    assert parse_retry_after({"retry-after": "12"}) == 12.0
+    assert parse_retry_after({"Retry-After": "-3"}) == 0.0
+    assert parse_retry_after({"retry-after": email.utils.formatdate(clock.now + 30, usegmt=True)}) == 30.0
+    assert parse_retry_after({"retry-after": "soon"}) is None
+    assert parse_retry_after({}) is None
+
+
+def test_bucket_paces_calls_at_the_rate(clock):
+    limiter_ = limiter(rate=2, burst=1)
+    started = clock.now
+    for _ in range(5):
+        limiter_.acquire()
+    assert clock.now - started == pytest.approx(2.0)
+
+
+@pytest.mark.parametrize("error", [http_error(429), http_error(403, "rateLimitExceeded")])
+def test_throttling_halves_the_rate_and_successes_restore_it(clock, monkeypatch, error):
+    limiter_ = limiter()
+    monkeypatch.setattr(limiter_, "backoff", lambda attempt: 0.25)
+    assert limiter_.call(failing(error, error)) == "ok"
+    # Halved twice, then one success adds one back.
+    assert limiter_.rate == 10 * 0.5 * 0.5 + 1
+    assert clock.slept[:2] == [0.25, 0.25]
+
+    for _ in range(20):
+        limiter_.call(failing())
+    assert limiter_.rate == limiter_.max_rate
+
+
+def test_rate_never_drops_below_the_floor(clock, monkeypatch):
+    limiter_ = limiter(max_retries=10)
+    monkeypatch.setattr(limiter_, "backoff", lambda attempt: 0)
+    limiter_.call(failing(*[http_error(503)] * 10))
+    assert limiter_.rate == limiter_.min_rate + limiter_.increase
+
+
+def test_retry_after_is_honoured(clock):
+    limiter_ = limiter()
+    started = clock.now
+    assert limiter_.call(failing(http_error(429, "rateLimitExceeded", "7"))) == "ok"
+    assert clock.now - started >= 7
+    assert 7 in clock.slept
+
+
+def test_errors_are_raised_once_retries_run_out(clock, monkeypatch):
+    limiter_ = limiter(max_retries=2)
+    monkeypatch.setattr(limiter_, "backoff", lambda attempt: 0)
+    func = failing(*[http_error(503)] * 3)
+    with pytest.raises(googleapiclient.errors.HttpError):
+        limiter_.call(func)
+    assert func() == "ok"  # Exactly three attempts were made.
+
+
+def test_permanent_errors_are_not_retried(clock):
+    limiter_ = limiter()
+    func = failing(http_error(404, "videoNotFound"))
+    with pytest.raises(googleapiclient.errors.HttpError):
+        limiter_.call(func)
+    assert func() == "ok"
+    assert limiter_.rate == 10
+    assert not clock.slept
+
+
+def test_quota_exceeded_goes_to_the_budget_instead_of_a_retry(clock):
+    limiter_ = limiter()
+    limiter_.budget = RecordingBudget()
+    assert limiter_.call(failing(http_error(403, "quotaExceeded")), endpoint="search.list") == "ok"
+    assert limiter_.budget.exhausted == 1
+    assert limiter_.budget.reserved == 200  # The call is charged again once the budget lets it through
+    assert limiter_.rate == 11  # Not throttled; only the final success counted
+    assert not clock.slept
+
+
+def test_quota_exceeded_without_a_budget_is_raised(clock):
+    limiter_ = limiter()
+    with pytest.raises(googleapiclient.errors.HttpError):
+        limiter_.call(failing(http_error(403, "quotaExceeded")))
+    assert limiter_.rate == 10
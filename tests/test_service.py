@@ -0,0 +1,39 @@
+import pytest
+import requests
+from spotipy import SpotifyException
+import service
+from jobs import JobStore
+from match_cache import MatchCache
+from rate_limiter import spotify_limiter
+
+
+class FakeSpotify:
+    def __init__(self, error=None):
+        self.error = error
+
+    def current_user(self):
+        if self.error:
+            raise self.error
+        return {"id": "listener"}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(spotify_limiter, "max_retries", 0)
+    store = JobStore(str(tmp_path / "jobs.db"))
+    cache = MatchCache(str(tmp_path / "cache.db"))
+    yield service.create_app(store=store, runner=object(), cache=cache).test_client()
+    cache.close()
+
+
+@pytest.mark.parametrize("error, status", [
+    (None, 200),
+    (SpotifyException(401, -1, "The access token expired"), 401),
+    (SpotifyException(503, -1, "Service unavailable"), 502),
+    (requests.ConnectionError("connection refused"), 502),
+    (requests.Timeout("read timed out"), 502),
+])
+def test_token_check_errors(client, monkeypatch, error, status):
+    monkeypatch.setattr(service, "spotify_from_token", lambda token: FakeSpotify(error))
+    response = client.get("/jobs", headers={"Authorization": "Bearer token"})
+    assert response.status_code == status
@@ -0,0 +1,28 @@
+import subprocess
+import sys
+import pytest
+from bench_startup import BUDGETS_MS, COMMANDS, FORBIDDEN, ROOT, best_of, import_times
+
+HEAVY = ("spotipy", "googleapiclient", "google_auth_oauthlib", "sqlalchemy", "numpy", "pandas")
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    return best_of([], 3)[0]
+
+
+@pytest.mark.parametrize("command", list(COMMANDS))
+def test_command_imports_within_budget(command, baseline):
+    total, loaded = best_of(COMMANDS[command], 3)
+    assert (total - baseline) / 1000 <= BUDGETS_MS[command]
+    assert not [lib for lib in FORBIDDEN[command] if lib in loaded]
+
+
+@pytest.mark.parametrize("command", ["list", "snapshot", "plan", "transfer", "sync"])
+def test_subcommand_help_loads_no_client_library(command, baseline):
+    result = subprocess.run([sys.executable, "-X", "importtime", "main.py", command, "--help"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    assert "usage:" in result.stdout
+    total, loaded = import_times(result.stderr)
+    assert (total - baseline) / 1000 <= BUDGETS_MS["--help"]
+    assert not [lib for lib in HEAVY if lib in loaded]
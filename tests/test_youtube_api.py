@@ -0,0 +1,49 @@
+import contextlib
+import io
+import pytest
+from fake_services import FakeServices, make_library
+from rate_limiter import youtube_limiter
+from youtube_api import bulk_add_tracks_to_youtube_playlist
+
+pytestmark = pytest.mark.usefixtures("unthrottled")
+
+
+class RecordingBudget:
+    """Quota budget that never waits and counts how often the quota was reported spent."""
+
+    def __init__(self):
+        self.exhausted = 0
+
+    def reserve(self, units):
+        pass
+
+    def exhaust(self):
+        self.exhausted += 1
+
+
+def test_bulk_add_retries_only_the_failed_inserts(monkeypatch):
+    services = FakeServices(*make_library(1)).start()
+    budget = RecordingBudget()
+    monkeypatch.setattr(youtube_limiter, "budget", budget)
+    monkeypatch.setattr(youtube_limiter, "backoff", lambda attempt: 0)
+    services.failures = {
+        "playlistItems.insert:v-throttled": ["rateLimitExceeded"],
+        "playlistItems.insert:v-missing": ["videoNotFound"],
+        "playlistItems.insert:v-quota": ["quotaExceeded"],
+    }
+    video_ids = ["v-ok", "v-throttled", None, "v-missing", "v-quota", "v-last"]
+    confirmed = []
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            added = bulk_add_tracks_to_youtube_playlist(services.youtube_client(), "PL", video_ids,
+                                                        on_added=confirmed.extend)
+    finally:
+        services.stop()
+
+    assert added == 4
+    assert sorted(confirmed) == [(0, "v-ok"), (1, "v-throttled"), (4, "v-quota"), (5, "v-last")]
+    assert "v-missing" not in services.youtube_playlists["PL"]
+    assert "1 tracks could not be added" in output.getvalue()
+    assert services.insert_requests == {"v-ok": 1, "v-throttled": 2, "v-missing": 1, "v-quota": 2, "v-last": 1}
+    assert budget.exhausted == 1
@@ -0,0 +1,41 @@
+import sys
+from collections import namedtuple
+
+_TrackFields = namedtuple("_TrackFields", "id name artist album isrc duration_ms")
+
+
+def _intern(value):
+    """Interns a string so repeated artist/album names share one object."""
+    return sys.intern(value) if value else value
+
+
+class Track(_TrackFields):
+    """Compact, immutable record of one Spotify track.
+
+    A tuple subclass with empty ``__slots__``, so a record costs no more than
+    the tuple itself. Strings are interned because artist and album names
+    repeat heavily across a library.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_spotify(cls, track):
+        """Builds a Track from a Spotify track object, or returns None if it is unusable."""
+        if not track or not track.get('name') or not track.get('artists'):
+            return None
+        return cls(
+            id=_intern(track.get('id')),
+            name=_intern(track['name']),
+            artist=_intern(track['artists'][0]['name']),  # Taking the primary artist
+            album=_intern((track.get('album') or {}).get('name', 'N/A')),
+            isrc=_intern((track.get('external_ids') or {}).get('isrc')),
+            duration_ms=track.get('duration_ms'),
+        )
+
+    @property
+    def key(self):
+        """Stable identity of the track: its Spotify id, or its metadata for local files."""
+        if self.id:
+            return f"spotify:{self.id}"
+        return f"local:{self.name}\x1f{self.artist}\x1f{self.album}"
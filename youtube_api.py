@@ -1,14 +1,119 @@
 import os
+import threading
 import time
-import google_auth_oauthlib.flow
+import weakref
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import google.auth.exceptions
+import google.auth.transport.requests
+import google.oauth2.credentials
+import google_auth_httplib2
 import googleapiclient.discovery
 import googleapiclient.errors
-from config import GOOGLE_CLIENT_SECRET_FILE, YOUTUBE_SCOPES, SEARCH_BATCH_SIZE, UPLOAD_BATCH_SIZE
+import googleapiclient.http
+from config import (
+    GOOGLE_CLIENT_SECRET_FILE,
+    GOOGLE_TOKEN_FILE,
+    YOUTUBE_SCOPES,
+    YOUTUBE_PAGE_SIZE,
+    SEARCH_WORKERS,
+    SEARCH_MAX_RESULTS,
+    SEARCH_FALLBACK_PACK_SIZE,
+    UPLOAD_BATCH_SIZE,
+    YOUTUBE_QUOTA_COSTS
+)
+from scoring import parse_iso_duration, score_matrix, select_matches, shortlist
+from rate_limiter import error_status, classify_error, is_quota_exceeded, youtube_limiter
+from metrics import metrics
+from profiler import profiler
+from query_packer import QueryPacker
+
+_thread_state = threading.local()
+_client_credentials = weakref.WeakKeyDictionary()  # YouTube client -> the credentials it was built with
+
+def thread_http(youtube):
+    """Returns the calling thread's own HTTP connection for a YouTube client.
+
+    httplib2 connections are not thread-safe, so instead of sharing the
+    client's connection each thread authorizes its own with the credentials
+    the client was built with (see _build_youtube), and requests are sent
+    with ``execute(http=...)``. Clients built without credentials, such as
+    the benchmarks' local stand-ins, get an unauthorized connection.
+    """
+    connections = getattr(_thread_state, "connections", None)
+    if connections is None:
+        connections = _thread_state.connections = weakref.WeakKeyDictionary()
+    http = connections.get(youtube)
+    if http is None:
+        http = googleapiclient.http.build_http()
+        credentials = _client_credentials.get(youtube)
+        if credentials:
+            http = google_auth_httplib2.AuthorizedHttp(credentials, http=http)
+        connections[youtube] = http
+    return http
+
+def _build_youtube(credentials):
+    """Builds the YouTube client from the discovery document bundled with googleapiclient (no network fetch)."""
+    youtube = googleapiclient.discovery.build(
+        "youtube", "v3", credentials=credentials, static_discovery=True, cache_discovery=False)
+    _client_credentials[youtube] = credentials
+    return youtube
+
+def search_executor(workers=None):
+    """Creates the thread pool searches fan out over; one is shared by a whole run."""
+    return ThreadPoolExecutor(max_workers=workers or SEARCH_WORKERS, thread_name_prefix="youtube-search")
+
+def _save_google_credentials(credentials):
+    """Writes refreshable credentials to GOOGLE_TOKEN_FILE, readable only by the current user."""
+    fd = os.open(GOOGLE_TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(credentials.to_json())
+    os.chmod(GOOGLE_TOKEN_FILE, 0o600)  # Also tighten a file that already existed
+
+def _load_google_credentials():
+    """Loads saved Google credentials, refreshing them silently if they have expired.
+
+    Returns None if nothing is saved or the saved credentials can no longer
+    be refreshed (e.g. access was revoked).
+    """
+    if not os.path.exists(GOOGLE_TOKEN_FILE):
+        return None
+    try:
+        credentials = google.oauth2.credentials.Credentials.from_authorized_user_file(
+            GOOGLE_TOKEN_FILE, YOUTUBE_SCOPES)
+    except (ValueError, OSError) as e:
+        print(f"Ignoring unreadable saved Google credentials: {e}")
+        return None
+    if credentials.valid:
+        return credentials
+    if not credentials.refresh_token:
+        return None
+    try:
+        credentials.refresh(google.auth.transport.requests.Request())
+    except google.auth.exceptions.RefreshError as e:
+        print(f"Saved Google credentials could not be refreshed ({e}); signing in again.")
+        return None
+    _save_google_credentials(credentials)
+    return credentials
 
 def authenticate_youtube():
-    """Authenticates with the YouTube Data API using OAuth."""
+    """Authenticates with the YouTube Data API using OAuth.
+
+    Credentials are saved to GOOGLE_TOKEN_FILE and reused (and refreshed)
+    on later runs, so the browser is only needed the first time.
+    """
     print("\nAuthenticating with YouTube Music (Google)...")
     try:
+        credentials = _load_google_credentials()
+        if credentials:
+            youtube = _build_youtube(credentials)
+            print("Successfully authenticated with YouTube using saved credentials.")
+            return youtube
+
+        # Only needed for the browser flow, so not imported on every start.
+        import google_auth_oauthlib.flow
+
         # Disable OAuthlib's HTTPS verification when running locally.
         # *DO NOT* leave this option enabled in production.
         os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
@@ -25,8 +130,8 @@ def authenticate_youtube():
             success_message='The auth flow is complete, you may close this window.',
             open_browser=True
         )
-        youtube = googleapiclient.discovery.build(
-            "youtube", "v3", credentials=credentials)
+        _save_google_credentials(credentials)
+        youtube = _build_youtube(credentials)
         print("Successfully authenticated with YouTube.")
         return youtube
     except FileNotFoundError:
@@ -38,6 +143,15 @@ def authenticate_youtube():
         print("Make sure you've added your email as a test user in Google Cloud Console > OAuth consent screen")
         return None
 
+def youtube_from_credentials(info):
+    """Builds a YouTube client from authorized-user credentials obtained elsewhere.
+
+    ``info`` is the authorized-user dict Google's libraries write out
+    (token, refresh_token, client_id, client_secret).
+    """
+    credentials = google.oauth2.credentials.Credentials.from_authorized_user_info(info, YOUTUBE_SCOPES)
+    return _build_youtube(credentials)
+
 def create_youtube_playlist(youtube, playlist_name):
     """Creates a new playlist on YouTube."""
     if not youtube:
@@ -56,7 +170,7 @@ def create_youtube_playlist(youtube, playlist_name):
                 }
             }
         )
-        response = request.execute()
+        response = youtube_limiter.call(request.execute, http=thread_http(youtube), endpoint="playlists.insert")
         playlist_id = response["id"]
         print(f"    Successfully created YouTube playlist '{playlist_name}' (ID: {playlist_id}).")
         return playlist_id
@@ -67,101 +181,344 @@ def create_youtube_playlist(youtube, playlist_name):
         print(f"    An error occurred while creating playlist: {e}")
         return None
 
-def search_multiple_tracks_on_youtube(youtube, tracks_info, batch_size=None):
-    """Searches for multiple tracks on YouTube Music in a single query."""
-    if not youtube:
+def get_youtube_playlist_video_ids(youtube, playlist_id):
+    """Fetches the set of video IDs already in a YouTube playlist, or None if the playlist no longer exists.
+
+    Any other error is raised: it says nothing about whether the playlist is gone.
+    """
+    video_ids = _list_playlist_video_ids(youtube, playlist_id)
+    return None if video_ids is None else set(video_ids)
+
+def count_youtube_playlist_videos(youtube, playlist_id):
+    """Counts how often each video is in a YouTube playlist; returns a Counter, or None if the playlist no longer exists.
+
+    Any other error is raised.
+    """
+    video_ids = _list_playlist_video_ids(youtube, playlist_id)
+    return None if video_ids is None else Counter(video_ids)
+
+def _is_playlist_not_found(error):
+    """Returns True if an error is YouTube's 404 for a deleted or unknown playlist."""
+    content = error.content.decode("utf-8", errors="replace") if isinstance(error.content, bytes) else str(error.content)
+    return error_status(error) == 404 and "playlistNotFound" in content
+
+def _list_playlist_video_ids(youtube, playlist_id):
+    if not youtube or not playlist_id:
+        return None
+    video_ids = []
+    page_token = None
+    try:
+        while True:
+            response = youtube_limiter.call(youtube.playlistItems().list(
+                part="contentDetails",
+                playlistId=playlist_id,
+                maxResults=YOUTUBE_PAGE_SIZE,
+                pageToken=page_token,
+                fields="items/contentDetails/videoId,nextPageToken"
+            ).execute, http=thread_http(youtube), endpoint="playlistItems.list")
+            for item in response.get("items", []):
+                video_ids.append(item["contentDetails"]["videoId"])
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return video_ids
+    except googleapiclient.errors.HttpError as e:
+        if _is_playlist_not_found(e):
+            return None
+        print(f"    An HTTP error {e.resp.status} occurred while listing playlist items: {e.content}")
+        raise
+    except Exception as e:
+        print(f"    An error occurred while listing playlist items: {e}")
+        raise
+
+def get_youtube_video_durations(youtube, video_ids):
+    """Fetches durations in seconds for up to 50 videos with one videos.list call (1 quota unit)."""
+    if not youtube or not video_ids:
         return {}
+    try:
+        response = youtube_limiter.call(youtube.videos().list(
+            part="contentDetails",
+            id=",".join(video_ids[:50]),
+            maxResults=50,
+            fields="items(id,contentDetails/duration)"
+        ).execute, http=thread_http(youtube), endpoint="videos.list")
+    except googleapiclient.errors.HttpError as e:
+        print(f"    An HTTP error {e.resp.status} occurred while fetching video durations: {e.content}")
+        return {}
+    except Exception as e:
+        print(f"    An error occurred while fetching video durations: {e}")
+        return {}
+    return {
+        item["id"]: parse_iso_duration(item.get("contentDetails", {}).get("duration"))
+        for item in response.get("items", [])
+    }
 
-    batch_size = batch_size or SEARCH_BATCH_SIZE
-    results = {}
+def _batches(iterable, size):
+    """Yields lists of up to size items from any iterable."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
 
-    for i in range(0, len(tracks_info), batch_size):
-        batch = tracks_info[i:i + batch_size]
-        print(f"\nProcessing batch {(i//batch_size) + 1} ({len(batch)} tracks)")
-        
-        combined_query = " OR ".join([
-            f'"{track["name"]}" "{track["artist"]}"'
-            for track in batch
-        ])
-        
-        print(f"  Searching YouTube for batch of {len(batch)} songs")
-        try:
-            search_response = youtube.search().list(
+def _search_batch(youtube, batch, batch_number):
+    """Runs one OR-packed search for a batch of tracks.
+
+    Runs on a search worker thread. Returns ``(track, video, score, verified)``
+    matches, where ``verified`` means the video's duration was checked against
+    the track's, or None if the search failed, in which case nothing should
+    be cached.
+    """
+    try:
+        with profiler.stage("search"):
+            combined_query = " OR ".join([
+                f'"{track.name}" "{track.artist}"'
+                for track in batch
+            ])
+            search_response = youtube_limiter.call(youtube.search().list(
                 q=combined_query,
                 part="id,snippet",
-                maxResults=len(batch),
+                maxResults=SEARCH_MAX_RESULTS,
                 type="video",
                 videoCategoryId="10"
-            ).execute()
-
-            videos = search_response.get("items", [])
-            if not videos:
-                print(f"    No results found for this batch.")
-                continue
-
-            for video in videos:
-                video_title = video["snippet"]["title"].lower()
-                video_id = video["id"]["videoId"]
-                
-                for track in batch:
-                    track_name = track["name"].lower()
-                    artist_name = track["artist"].lower()
-                    
-                    if track_name in video_title and artist_name in video_title:
-                        query = f"{track['name']} {track['artist']} {track['album']}"
-                        if query not in results:
-                            results[query] = video_id
-                            print(f"    Matched: '{track['name']}' by '{track['artist']}' to '{video['snippet']['title']}' (ID: {video_id})")
-
-        except googleapiclient.errors.HttpError as e:
-            print(f"    An HTTP error {e.resp.status} occurred during YouTube search: {e.content}")
-        except Exception as e:
-            print(f"    An error occurred during YouTube search: {e}")
-        
-        time.sleep(1)
-    
+            ).execute, http=thread_http(youtube), endpoint="search.list")
+
+        videos = search_response.get("items", [])
+        if not videos:
+            return []
+
+        with profiler.stage("match"):
+            scores = score_matrix(batch, videos)
+            candidates = [videos[index]["id"]["videoId"] for index in shortlist(scores)]
+
+        durations = {}
+        if candidates and any(track.duration_ms for track in batch):
+            # A videos.list request, so it counts as search time rather than matching.
+            with profiler.stage("search"):
+                durations = get_youtube_video_durations(youtube, candidates)
+
+        with profiler.stage("match"):
+            matches = []
+            for track_index, video_index, score in select_matches(batch, videos, scores, durations):
+                track, video = batch[track_index], videos[video_index]
+                verified = bool(track.duration_ms) and video["id"]["videoId"] in durations
+                matches.append((track, video, score, verified))
+            return matches
+
+    except googleapiclient.errors.HttpError as e:
+        print(f"    An HTTP error {e.resp.status} occurred during YouTube search for batch {batch_number}: {e.content}")
+    except Exception as e:
+        print(f"    An error occurred during YouTube search for batch {batch_number}: {e}")
+    return None
+
+def search_multiple_tracks_on_youtube(youtube, tracks_info, batch_size=None, cache=None, workers=None,
+                                      packer=None, fallback_size=None, executor=None, on_verified=None):
+    """Searches YouTube Music for a stream of Track records; returns ``{track.key: video_id}`` for matches.
+
+    Tracks cached in ``cache`` are not searched. First-pass queries pack as
+    many tracks as ``packer`` (a QueryPacker) finds best; their misses are
+    searched again ``fallback_size`` at a time before being cached as not
+    found. Up to 2 x ``workers`` searches are in flight on ``executor``.
+    ``on_verified`` is called with the ``(track, video_id)`` matches whose
+    duration was checked, the ones indexed by ISRC.
+    """
+    if not youtube:
+        return {}
+
+    packer = packer or QueryPacker(max_size=batch_size)
+    fallback_size = SEARCH_FALLBACK_PACK_SIZE if fallback_size is None else fallback_size
+    workers = workers or SEARCH_WORKERS
+    results = {}
+    misses = []  # First-pass misses waiting for a fallback query
+    cache_hits = 0
+    queries = {True: 0, False: 0}  # First-pass and fallback queries sent
+    matched = 0
+
+    def uncached_batches():
+        nonlocal cache_hits
+        pending = []
+        for chunk in _batches(tracks_info, packer.sizes[0]):
+            if cache:
+                hits, chunk = cache.lookup(chunk)
+                cache_hits += len(hits)
+                for track, video_id in hits:
+                    if video_id:
+                        results[track.key] = video_id
+            pending.extend(chunk)
+            while len(pending) >= packer.size:
+                yield pending[:packer.size], True
+                del pending[:packer.size]
+            while fallback_size and len(misses) >= fallback_size:
+                yield misses[:fallback_size], False
+                del misses[:fallback_size]
+        while pending:
+            yield pending[:packer.size], True
+            del pending[:packer.size]
+
+    def collect(batch, number, first_pass, matches):
+        nonlocal matched
+        if matches is None:
+            return  # The search failed; nothing is cached so the tracks are searched again next time.
+        if not matches:
+            print(f"    No results found for batch {number}.")
+        verified = []
+        for track, video, score, duration_checked in matches:
+            video_id = video["id"]["videoId"]
+            if track.key not in results:
+                results[track.key] = video_id
+                matched += 1
+                if duration_checked:
+                    verified.append((track, video_id))
+                print(f"    Matched: '{track.name}' by '{track.artist}' to '{video['snippet']['title']}' "
+                      f"(ID: {video_id}, score {score:.2f})")
+        unmatched = [track for track in batch if track.key not in results]
+        if first_pass:
+            packer.record(len(batch), len(batch) - len(unmatched))
+        if first_pass and fallback_size:
+            misses.extend(unmatched)
+            if cache:
+                cache.store_many((track, results[track.key]) for track in batch if track.key in results)
+        elif cache:
+            cache.store_many((track, results.get(track.key)) for track in batch)
+        if cache:
+            cache.index_isrcs(verified)
+        if on_verified and verified:
+            on_verified(verified)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = search_executor(workers)
+    try:
+        in_flight = deque()
+
+        def submit(batch, first_pass):
+            queries[first_pass] += 1
+            number = queries[True] + queries[False]
+            kind = "batch" if first_pass else "fallback batch"
+            print(f"  Searching YouTube for {kind} {number} ({len(batch)} songs)")
+            in_flight.append((batch, number, first_pass, executor.submit(_search_batch, youtube, batch, number)))
+
+        def collect_oldest():
+            batch, number, first_pass, future = in_flight.popleft()
+            collect(batch, number, first_pass, future.result())
+
+        for batch, first_pass in uncached_batches():
+            submit(batch, first_pass)
+            # Up to a second round is queued so workers don't idle while the oldest batch is collected.
+            if len(in_flight) >= 2 * workers:
+                collect_oldest()
+        while in_flight:
+            collect_oldest()
+        # Misses of the last first-pass batches.
+        for batch in _batches(misses, fallback_size or 1):
+            submit(batch, False)
+        while in_flight:
+            collect_oldest()
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    if cache_hits:
+        print(f"  Match cache: {cache_hits} tracks resolved without searching.")
+    if queries[True]:
+        units = (queries[True] + queries[False]) * YOUTUBE_QUOTA_COSTS["search.list"]
+        print(f"  Search: {matched} tracks matched with {queries[True]} packed and {queries[False]} fallback "
+              f"queries, ~{units / max(1, matched):.0f} quota units per match; {packer.summary()}.")
     return results
 
-def bulk_add_tracks_to_youtube_playlist(youtube, playlist_id, video_ids, batch_size=None):
-    """Adds multiple videos (tracks) to a YouTube playlist in bulk."""
+def _playlist_item_insert(youtube, playlist_id, video_id):
+    """Builds a playlistItems.insert request for one video."""
+    return youtube.playlistItems().insert(
+        part="snippet",
+        body={
+            "snippet": {
+                "playlistId": playlist_id,
+                "resourceId": {
+                    "kind": "youtube#video",
+                    "videoId": video_id
+                }
+            }
+        }
+    )
+
+def bulk_add_tracks_to_youtube_playlist(youtube, playlist_id, video_ids, batch_size=None, on_added=None):
+    """Adds multiple videos (tracks) to a YouTube playlist in bulk.
+
+    Every insert in a batch reports its own outcome. Inserts that failed with
+    a retryable error (rate limits, 5xx) are re-batched and retried on their
+    own; permanent failures (e.g. videoNotFound) are reported and dropped.
+    ``on_added`` is called with the ``(index, video_id)`` pairs confirmed by
+    each batch, where index is the position in video_ids. Returns the number
+    of videos actually added.
+    """
     if not youtube or not playlist_id or not video_ids:
         return 0
 
     batch_size = batch_size or UPLOAD_BATCH_SIZE
+    pending = [(index, video_id) for index, video_id in enumerate(video_ids) if video_id]
     successful_adds = 0
-    
-    for i in range(0, len(video_ids), batch_size):
-        batch = video_ids[i:i + batch_size]
+    failed_adds = 0
+
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i:i + batch_size]
         print(f"\nAdding batch of {len(batch)} tracks to playlist...")
-        
-        batch_request = youtube.new_batch_http_request()
-        
-        for video_id in batch:
-            if video_id:
-                request = youtube.playlistItems().insert(
-                    part="snippet",
-                    body={
-                        "snippet": {
-                            "playlistId": playlist_id,
-                            "resourceId": {
-                                "kind": "youtube#video",
-                                "videoId": video_id
-                            }
-                        }
-                    }
-                )
-                batch_request.add(request)
-        
-        try:
-            batch_request.execute()
-            successful_adds += len(batch)
-            print(f"  Successfully added {len(batch)} tracks to playlist.")
-        except googleapiclient.errors.HttpError as e:
-            error_content = e.content.decode('utf-8') if isinstance(e.content, bytes) else str(e.content)
-            print(f"  Error adding batch to playlist: {error_content}")
-        except Exception as e:
-            print(f"  An error occurred while adding batch to playlist: {e}")
-        
-        time.sleep(1)
-    
-    return successful_adds 
\ No newline at end of file
+
+        attempt = 0
+        while batch:
+            outcomes = {}
+
+            def record_outcome(request_id, response, exception):
+                outcomes[int(request_id)] = exception
+
+            batch_request = youtube.new_batch_http_request()
+            for index, video_id in batch:
+                batch_request.add(_playlist_item_insert(youtube, playlist_id, video_id),
+                                  callback=record_outcome, request_id=str(index))
+
+            try:
+                youtube_limiter.call(batch_request.execute, http=thread_http(youtube), weight=len(batch),
+                                     endpoint="playlistItems.insert")
+            except googleapiclient.errors.HttpError as e:
+                error_content = e.content.decode('utf-8') if isinstance(e.content, bytes) else str(e.content)
+                print(f"  Error adding batch to playlist: {error_content}")
+            except Exception as e:
+                print(f"  An error occurred while adding batch to playlist: {e}")
+
+            added = []
+            retry = []
+            for index, video_id in batch:
+                if index in outcomes and outcomes[index] is None:
+                    added.append((index, video_id))
+                    continue
+                # A missing outcome means the whole batch failed after the limiter's retries.
+                exception = outcomes.get(index)
+                if exception:
+                    status = error_status(exception) or exception.__class__.__name__
+                    metrics.record_error("youtube", "playlistItems.insert", status)
+                if exception and youtube_limiter.budget and is_quota_exceeded(exception):
+                    # Retried once the daily quota resets; the next batch call waits for it.
+                    youtube_limiter.budget.exhaust()
+                    retry.append((index, video_id))
+                    continue
+                retryable, throttled, retry_after = classify_error(exception) if exception else (False, False, None)
+                if retryable and attempt < youtube_limiter.max_retries:
+                    if throttled:
+                        youtube_limiter.on_throttle(retry_after)
+                    metrics.record_retry("youtube", "playlistItems.insert")
+                    retry.append((index, video_id))
+                else:
+                    failed_adds += 1
+                    reason = getattr(exception, 'reason', None) or "batch request failed"
+                    print(f"    Could not add video ID '{video_id}': {reason}")
+
+            successful_adds += len(added)
+            if added and on_added:
+                on_added(added)
+            print(f"  Added {len(added)} of {len(batch)} tracks"
+                  + (f"; retrying {len(retry)} that failed transiently." if retry else "."))
+
+            batch = retry
+            if batch:
+                time.sleep(youtube_limiter.backoff(attempt))
+                attempt += 1
+
+    if failed_adds:
+        print(f"  {failed_adds} tracks could not be added to the playlist.")
+    return successful_adds